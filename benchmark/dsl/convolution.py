@@ -7,6 +7,7 @@ from bitblas.base.roller.arch import CUDA
 from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
 from bitblas.gpu import Matmul
 from bitblas.base.utils import apply_and_build
+from bitblas.base.measure import measure_latency
 import time
 from tvm import te, tir
 
@@ -100,8 +101,7 @@ for get_prim_func, input_args, d_schedule in benchmark_sets:
                 device=arch.device,
             ))
 
-    timer_cuda_mod = mod_default.time_evaluator(mod_default.entry_name, arch.device, number=5)
-    t = timer_cuda_mod(*profile_tensors).mean
+    t = measure_latency(mod_default, profile_tensors, arch.device).median / 1e3
 
     print("Time cost of Dlight default schedule: {:.3f} ms".format(t * 1e3))
 
@@ -8,6 +8,7 @@ from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
 from bitblas.gpu import Matmul
 from bitblas.utils import auto_detect_nvidia_target
 from bitblas.base.utils import apply_and_build
+from bitblas.base.measure import measure_latency
 from bitblas.ops.impl.matmul_impl import (
     matmul_nn,
     matmul_nt,
@@ -110,8 +111,7 @@ for get_prim_func, input_args, d_schedule in benchmark_sets:
 
     profile_tensors = best.profile_tensors
 
-    timer_cuda_mod = mod_default.time_evaluator(mod_default.entry_name, arch.device, number=5)
-    t = timer_cuda_mod(*profile_tensors).mean
+    t = measure_latency(mod_default, profile_tensors, arch.device).median / 1e3
 
     print("Time cost of Dlight default schedule: {:.3f} ms".format(t * 1e3))
 
@@ -8,6 +8,7 @@ from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
 from bitblas.gpu import Matmul
 from bitblas.utils import auto_detect_nvidia_target
 from bitblas.base.utils import apply_and_build
+from bitblas.base.measure import measure_latency
 from bitblas.ops.impl.matmul_dequantize_impl import (
     matmul_nt_dequantize_b,
     matmul_nt_dequantize_b_propagate_a_propagate_b,
@@ -178,8 +179,7 @@ for get_prim_func, input_args, d_schedule in benchmark_sets:
 
     profile_tensors = best.profile_tensors
     if mod_default is not None:
-        timer_cuda_mod = mod_default.time_evaluator(mod_default.entry_name, arch.device, number=5)
-        t = timer_cuda_mod(*profile_tensors).mean
+        t = measure_latency(mod_default, profile_tensors, arch.device).median / 1e3
     else:
         t = 1e4 - 1
 
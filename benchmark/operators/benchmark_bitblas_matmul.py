@@ -3,6 +3,7 @@
 
 from bitblas.utils.target_detector import auto_detect_nvidia_target
 from bitblas import Matmul, MatmulConfig
+from bitblas.base.measure import MeasureOption
 import argparse
 
   
@@ -74,6 +75,23 @@ parser.add_argument(
     action="store_true",  
     help="Include zeros in the quantization."  
 )  
+parser.add_argument(
+    "--warmup",
+    type=int,
+    default=3,
+    help="Number of untimed runs before the measurement."
+)
+parser.add_argument(
+    "--repeat",
+    type=int,
+    default=10,
+    help="Number of latency samples, the median and the 90th percentile are reported."
+)
+parser.add_argument(
+    "--cold_cache",
+    action="store_true",
+    help="Rotate the inputs over buffers that do not fit in the L2 cache."
+)
 parser.add_argument(  
     "--zeros_mode",  
     type=str,  
@@ -98,6 +116,8 @@ group_size = args.group_size
 with_scaling = args.with_scaling  
 with_zeros = args.with_zeros  
 zeros_mode = args.zeros_mode 
+measure_option = MeasureOption(
+    warmup=args.warmup, repeat=args.repeat, cold_cache=args.cold_cache)
 
 test_shapes = [
     # square test
@@ -146,11 +166,15 @@ benchmark_results = {}
 for config, operator, input_args in benchmark_sets:
     config = config(*input_args)
     matmul = operator(config, target=target, enable_tuning=True)
-    kernel_latency = matmul.profile_latency()
+    result = matmul.measure(measure_option=measure_option)
+    kernel_latency = result.median
+    kernel_p90_latency = result.percentile(90)
     if matmul.input_transform is not None:
-        kernel_latency += matmul.ladder_permutate_a.profile_latency()
+        transform_result = matmul.ladder_permutate_a.measure(measure_option=measure_option)
+        kernel_latency += transform_result.median
+        kernel_p90_latency += transform_result.percentile(90)
     
-    print("Time cost is: {:.3f} ms".format(kernel_latency))
+    print("Time cost is: {:.3f} ms (p90 {:.3f} ms)".format(kernel_latency, kernel_p90_latency))
 
     profile_config = {
         f"{operator.__name__}-{'-'.join([str(i) for i in input_args])}": {
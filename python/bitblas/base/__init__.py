@@ -14,5 +14,12 @@ from .analysis import (
 from .common_schedules import get_block, get_output_blocks, try_inline, try_inline_contiguous_spatial
 from .schedule_rule import ScheduleRule
 from .transform import ApplyDefaultSchedule, ApplyFastTuning
-from .utils import fast_tune, fast_tune_with_dynamic_range
+from .utils import fast_tune, fast_tune_with_dynamic_range, fast_tune_specializations
+from .tuning_log import TuningLog, TuningRecord, get_tuning_log, set_tuning_log_path
+from .tuning_session import TuningSession
+from .cost_model import HintCostModel
+from .build_cache import BuildCache, get_build_cache, set_build_cache_path
+from .measure import MeasureOption, MeasureResult, measure_latency
+from .runner import Runner, LocalRunner, RPCRunner, get_runner, set_runner
+from .bucketing import select_dynamic_buckets
 from .roller import *
@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Selection of the specializations of a dynamic axis (e.g. the M of a linear layer) from the
+observed distribution of its values.
+
+A value is dispatched to the smallest specialization that is not smaller than it, and the
+values beyond the largest specialization are dispatched to the largest one. The selection
+minimizes the expected latency over the observed distribution with a given number of
+specializations, as each specialization is tuned separately.
+"""
+import bisect
+import math
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the number of candidate values that are considered by the dynamic programming
+MAX_BUCKET_CANDIDATES = 128
+
+
+def estimate_bucket_latency(value: int, bucket: int, memory_bound_value: int = 128) -> float:
+    """
+    Relative latency of a value that runs on the kernel specialized for the bucket.
+
+    The kernel of a bucket pays for the rows of the bucket, as its tiles are sized for it,
+    on top of the fixed cost of loading the weight, which dominates until the value is about
+    `memory_bound_value`. A value beyond the bucket runs on tiles that are too small for it.
+    """
+    if value <= bucket:
+        return 1.0 + bucket / memory_bound_value
+    return 2.0 * (1.0 + value / memory_bound_value)
+
+
+def _get_candidates(values: List[int], weights: List[float]) -> List[int]:
+    if len(values) <= MAX_BUCKET_CANDIDATES:
+        return values
+    # the values at evenly spaced quantiles of the distribution, and the powers of two
+    num_quantiles = MAX_BUCKET_CANDIDATES // 2
+    total = sum(weights)
+    candidates = set()
+    cumulative, quantile = 0.0, 1
+    for value, weight in zip(values, weights):
+        cumulative += weight
+        if cumulative >= quantile * total / num_quantiles:
+            candidates.add(value)
+            while quantile * total / num_quantiles <= cumulative:
+                quantile += 1
+    candidates.update(2**i for i in range(int(math.log2(values[-1])) + 1) if 2**i >= values[0])
+    return sorted(candidates)
+
+
+def select_dynamic_buckets(histogram: Dict[int, float],
+                           max_buckets: int = 7,
+                           time_budget: Optional[float] = None,
+                           tuning_time_per_bucket: Optional[float] = None,
+                           latency_fn: Callable[[int, int], float] = estimate_bucket_latency,
+                           candidates: Optional[List[int]] = None) -> List[int]:
+    """
+    Chooses the values of a dynamic axis to specialize and tune.
+
+    Parameters
+    ----------
+    histogram : Dict[int, float]
+        The number of occurrences (or the probability) of each observed value.
+    max_buckets : int
+        The maximum number of specializations.
+    time_budget : Optional[float]
+        The tuning time budget in seconds, which bounds the number of specializations
+        together with the `tuning_time_per_bucket`.
+    tuning_time_per_bucket : Optional[float]
+        The estimated tuning time in seconds of a specialization.
+    latency_fn : Callable[[int, int], float]
+        The latency of a value that runs on the kernel specialized for a bucket, it can be
+        a table of measured latencies instead of the default estimation.
+    candidates : Optional[List[int]]
+        The values that can be specialized, defaults to the observed values.
+
+    Returns
+    -------
+    List[int]
+        The sorted values to specialize, the largest one is always the largest observed value.
+    """
+    histogram = {int(k): float(v) for k, v in histogram.items() if v > 0}
+    if not histogram:
+        raise ValueError("The histogram of the dynamic axis is empty")
+    if time_budget is not None and tuning_time_per_bucket:
+        max_buckets = min(max_buckets, int(time_budget // tuning_time_per_bucket))
+    max_buckets = max(max_buckets, 1)
+
+    values = sorted(histogram)
+    weights = [histogram[v] for v in values]
+    if candidates is None:
+        candidates = _get_candidates(values, weights)
+    candidates = sorted({int(c) for c in candidates if c < values[-1]} | {values[-1]})
+    n = len(candidates)
+
+    # cost[i][j]: the cost of the values in (candidates[i - 1], candidates[j]] that run on
+    # the bucket candidates[j], where candidates[-1] is treated as 0
+    cost = [[math.inf] * n for _ in range(n)]
+    for j, bucket in enumerate(candidates):
+        # prefix sums of the cost of the values on this bucket
+        prefix = [0.0]
+        for v, w in zip(values, weights):
+            prefix.append(prefix[-1] + w * latency_fn(v, bucket))
+        upper = bisect.bisect_right(values, bucket)
+        for i in range(j + 1):
+            lower = bisect.bisect_right(values, candidates[i - 1]) if i > 0 else 0
+            cost[i][j] = prefix[upper] - prefix[lower]
+
+    # best[k][j]: the minimum cost of the values up to candidates[j] with k buckets, the
+    # last of which is candidates[j]
+    best = [[math.inf] * n for _ in range(max_buckets + 1)]
+    choice = [[-1] * n for _ in range(max_buckets + 1)]
+    for j in range(n):
+        best[1][j] = cost[0][j]
+    for k in range(2, max_buckets + 1):
+        for j in range(n):
+            for i in range(j):
+                total = best[k - 1][i] + cost[i + 1][j]
+                if total < best[k][j]:
+                    best[k][j], choice[k][j] = total, i
+
+    num_buckets = min(range(1, max_buckets + 1), key=lambda k: (best[k][n - 1], k))
+    buckets = []
+    j, k = n - 1, num_buckets
+    while j >= 0 and k >= 1:
+        buckets.append(candidates[j])
+        j, k = choice[k][j], k - 1
+    buckets = sorted(buckets)
+    logger.info(f"Select buckets {buckets} with expected latency {best[num_buckets][n - 1]:.3f}")
+    return buckets
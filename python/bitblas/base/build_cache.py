@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Content addressed cache of the built candidates of the fast tuning.
+
+An artifact is keyed by the structural hash of the scheduled module, the target and the
+pass context it is built with, so the same scheduled module of different operators or of
+different tuning runs is only built once. The artifacts are stored on disk and shared by
+processes, an entry is written into a staging directory and renamed into place.
+"""
+import os
+import json
+import shutil
+import tempfile
+from hashlib import sha256
+from typing import Dict, Optional, Tuple
+import tvm
+from tvm import IRModule
+import logging
+
+logger = logging.getLogger(__name__)
+
+BITBLAS_BUILD_CACHE_PATH = os.path.expanduser("~/.cache/bitblas/build_cache")
+
+BUILD_CACHE_ARTIFACT = "mod.tar"
+BUILD_CACHE_SOURCE = "source.cu"
+BUILD_CACHE_META = "meta.json"
+
+
+def get_build_key(mod: IRModule, target, pass_context: Dict) -> str:
+    """
+    The key of the artifact of a scheduled module that is built with the pass context, by
+    the current build (see `bitblas.cache.operator.get_build_fingerprint`).
+    """
+    from bitblas.cache import operator  # pylint: disable=import-outside-toplevel
+    key = json.dumps(
+        {
+            "mod": "{:016x}".format(tvm.ir.structural_hash(mod) & 0xFFFFFFFFFFFFFFFF),
+            "target": str(target),
+            "pass_context": {str(k): str(v) for k, v in pass_context.items()},
+            "fingerprint": operator.get_build_fingerprint(),
+        },
+        sort_keys=True)
+    return sha256(key.encode()).hexdigest()
+
+
+class BuildCache:
+    """
+    On-disk store of the built runtime modules, each entry is a directory of the exported
+    tar artifact, the device source and the build time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key: str) -> Optional[Tuple[str, str, float]]:
+        """Returns the (artifact path, source, build time) of a key, None on a miss."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(os.path.join(entry_path, BUILD_CACHE_META)) as f:
+                meta = json.load(f)
+            with open(os.path.join(entry_path, BUILD_CACHE_SOURCE)) as f:
+                source = f.read()
+        except (OSError, ValueError):
+            return None
+        artifact_path = os.path.join(entry_path, BUILD_CACHE_ARTIFACT)
+        if not os.path.exists(artifact_path):
+            return None
+        return artifact_path, source, meta.get("build_time")
+
+    def put(self, key: str, artifact_path: str, source: str, build_time: float) -> str:
+        """Stores a built artifact, returns the path of the cached artifact."""
+        entry_path = self._entry_path(key)
+        if os.path.exists(os.path.join(entry_path, BUILD_CACHE_META)):
+            return os.path.join(entry_path, BUILD_CACHE_ARTIFACT)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        staging_path = tempfile.mkdtemp(prefix=".staging_", dir=os.path.dirname(entry_path))
+        try:
+            shutil.copyfile(artifact_path, os.path.join(staging_path, BUILD_CACHE_ARTIFACT))
+            with open(os.path.join(staging_path, BUILD_CACHE_SOURCE), "w") as f:
+                f.write(source)
+            # the meta is written last, an entry without it is incomplete
+            with open(os.path.join(staging_path, BUILD_CACHE_META), "w") as f:
+                json.dump({"build_time": build_time}, f)
+            os.rename(staging_path, entry_path)
+        except OSError as e:
+            # another process stored the same key first
+            if not os.path.exists(os.path.join(entry_path, BUILD_CACHE_META)):
+                logger.debug(f"Failed to store the build artifact {key}: {e}")
+                return artifact_path
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+        return os.path.join(entry_path, BUILD_CACHE_ARTIFACT)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+_build_cache: Optional[BuildCache] = BuildCache(BITBLAS_BUILD_CACHE_PATH)
+
+
+def get_build_cache() -> Optional[BuildCache]:
+    return _build_cache
+
+
+def set_build_cache_path(path: Optional[str]) -> Optional[BuildCache]:
+    """Sets the path of the global build cache, the cache is disabled when the path is None."""
+    global _build_cache
+    _build_cache = BuildCache(path) if path is not None else None
+    return _build_cache
@@ -0,0 +1,230 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Learned cost model that re-ranks the candidate hints of the roller policy.
+
+The model is a small gradient boosted regression trees ensemble over the features of a
+serialized hint, trained from the tuning log (see `bitblas.base.tuning_log`). As the
+latency of different workloads are not comparable, it learns the log latency of a hint
+relative to the best measured hint of the same workload, so it is only used to rank the
+candidates of a single workload. It only depends on numpy, and can be trained on CPU.
+"""
+import json
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from .roller.hint import Hint
+from .tuning_log import TuningLog, TuningRecord, TUNING_SUCCESS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# number of the leading dims of the block, thread and rstep that are featurized
+MAX_FEATURE_DIMS = 3
+
+
+def _log2(x: float) -> float:
+    return math.log2(max(x, 1))
+
+
+def _padded_log2(values: Sequence[int]) -> List[float]:
+    values = list(values)[-MAX_FEATURE_DIMS:]
+    return [0.0] * (MAX_FEATURE_DIMS - len(values)) + [_log2(v) for v in values]
+
+
+def extract_hint_features(hint: Union[Hint, Dict]) -> List[float]:
+    """The feature vector of a hint or a serialized hint."""
+    if isinstance(hint, Hint):
+        hint = hint.serialize()
+    block = hint.get("block", [])
+    thread = hint.get("thread", [])
+    warp = hint.get("warp", [])
+    rstep = hint.get("rstep", [])
+    reduce_thread = hint.get("reduce_thread", [])
+    vectorize = hint.get("vectorize", {})
+    num_threads = math.prod(thread) * math.prod(reduce_thread)
+    if hint.get("use_tc", False) and block and warp:
+        # the thread of a tensor core hint is derived from the warps, 32 threads each
+        num_threads = math.prod(block) // max(math.prod(warp), 1) * 32
+    stages = max(hint.get("pipeline_stage", 1), 1)
+    return [
+        float(hint.get("use_tc", False)),
+        _log2(math.prod(block)),
+        *_padded_log2(block),
+        _log2(math.prod(thread)),
+        _log2(num_threads),
+        _log2(math.prod(warp)) if warp else 0.0,
+        _log2(math.prod(rstep)),
+        *_padded_log2(rstep),
+        _log2(math.prod(reduce_thread)),
+        # elements of the shared memory tiles of a matmul like workload
+        _log2(sum(block) * math.prod(rstep) * stages),
+        max(vectorize.values(), default=1),
+        float(stages),
+        float(hint.get("use_async", False)),
+        float(hint.get("rasterization_plan", {}).get("kind", "NoRasterization") !=
+              "NoRasterization"),
+        float(hint.get("shared_scope", "shared") == "shared.dyn"),
+        _log2(math.prod(hint.get("opt_shapes", {}).values())),
+    ]
+
+
+class RegressionTree:
+    """Regression tree of a limited depth, grown by the greedy least squares splits."""
+
+    def __init__(self, max_depth: int = 3, min_samples_leaf: int = 2):
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        # a node is [feature, threshold, left, right] or [value] for a leaf
+        self.nodes: List[List] = []
+
+    def _best_split(self, x: np.ndarray, y: np.ndarray):
+        best = None
+        best_loss = float(np.sum((y - y.mean())**2)) - 1e-12
+        n = len(y)
+        for feature in range(x.shape[1]):
+            order = np.argsort(x[:, feature], kind="stable")
+            xs, ys = x[order, feature], y[order]
+            cumsum, cumsum_sq = np.cumsum(ys), np.cumsum(ys**2)
+            for i in range(self.min_samples_leaf, n - self.min_samples_leaf + 1):
+                if xs[i - 1] == xs[i]:
+                    continue
+                left_loss = cumsum_sq[i - 1] - cumsum[i - 1]**2 / i
+                right_sum = cumsum[-1] - cumsum[i - 1]
+                right_loss = cumsum_sq[-1] - cumsum_sq[i - 1] - right_sum**2 / (n - i)
+                if left_loss + right_loss < best_loss:
+                    best_loss = left_loss + right_loss
+                    best = (feature, float((xs[i - 1] + xs[i]) / 2))
+        return best
+
+    def _grow(self, x: np.ndarray, y: np.ndarray, depth: int) -> int:
+        node_id = len(self.nodes)
+        self.nodes.append([float(y.mean())])
+        if depth >= self.max_depth or len(y) < 2 * self.min_samples_leaf:
+            return node_id
+        split = self._best_split(x, y)
+        if split is None:
+            return node_id
+        feature, threshold = split
+        mask = x[:, feature] <= threshold
+        left = self._grow(x[mask], y[mask], depth + 1)
+        right = self._grow(x[~mask], y[~mask], depth + 1)
+        self.nodes[node_id] = [feature, threshold, left, right]
+        return node_id
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> "RegressionTree":
+        self.nodes = []
+        self._grow(x, y, 0)
+        return self
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        out = np.empty(len(x))
+        for i, row in enumerate(x):
+            node = self.nodes[0]
+            while len(node) == 4:
+                node = self.nodes[node[2] if row[node[0]] <= node[1] else node[3]]
+            out[i] = node[0]
+        return out
+
+
+class HintCostModel:
+    """
+    Gradient boosted trees that predict the relative latency of the hints of a workload,
+    the lower the better.
+    """
+
+    def __init__(self,
+                 num_trees: int = 50,
+                 max_depth: int = 3,
+                 learning_rate: float = 0.1,
+                 min_samples_leaf: int = 2):
+        self.num_trees = num_trees
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.min_samples_leaf = min_samples_leaf
+        self.base_score = 0.0
+        self.trees: List[RegressionTree] = []
+
+    @property
+    def is_fitted(self) -> bool:
+        return len(self.trees) > 0
+
+    def fit(self, features: np.ndarray, targets: np.ndarray) -> "HintCostModel":
+        features = np.asarray(features, dtype="float64")
+        targets = np.asarray(targets, dtype="float64")
+        self.base_score = float(targets.mean())
+        self.trees = []
+        predictions = np.full(len(targets), self.base_score)
+        for _ in range(self.num_trees):
+            tree = RegressionTree(self.max_depth, self.min_samples_leaf).fit(
+                features, targets - predictions)
+            if len(tree.nodes) == 1:
+                # the residuals can not be split anymore
+                break
+            predictions += self.learning_rate * tree.predict(features)
+            self.trees.append(tree)
+        return self
+
+    def fit_records(self, records: List[TuningRecord]) -> "HintCostModel":
+        """Trains the model from the successfully measured records of a tuning log."""
+        best_latency: Dict[tuple, float] = {}
+        measured = [
+            r for r in records if r.status == TUNING_SUCCESS and r.latency and r.latency > 0
+        ]
+        for r in measured:
+            key = (r.workload, r.target)
+            best_latency[key] = min(best_latency.get(key, float("inf")), r.latency)
+        if not measured:
+            logger.warning("No measured record to train the cost model")
+            return self
+        features = np.array([extract_hint_features(r.hint) for r in measured])
+        targets = np.array(
+            [math.log(r.latency / best_latency[(r.workload, r.target)]) for r in measured])
+        return self.fit(features, targets)
+
+    @classmethod
+    def from_tuning_log(cls, tuning_log: TuningLog, target: Optional[str] = None, **kwargs):
+        return cls(**kwargs).fit_records(tuning_log.load(target=target))
+
+    def predict(self, hints: Sequence[Union[Hint, Dict]]) -> np.ndarray:
+        features = np.array([extract_hint_features(hint) for hint in hints], dtype="float64")
+        scores = np.full(len(hints), self.base_score)
+        if len(hints) == 0:
+            return scores
+        for tree in self.trees:
+            scores += self.learning_rate * tree.predict(features)
+        return scores
+
+    def prune(self, configs: List[Hint], topk: int) -> List[Hint]:
+        """Keeps the topk configs with the lowest predicted latency, in the original order."""
+        if not self.is_fitted or len(configs) <= topk:
+            return configs
+        keep = set(np.argsort(self.predict(configs), kind="stable")[:topk].tolist())
+        return [config for i, config in enumerate(configs) if i in keep]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "num_trees": self.num_trees,
+                    "max_depth": self.max_depth,
+                    "learning_rate": self.learning_rate,
+                    "min_samples_leaf": self.min_samples_leaf,
+                    "base_score": self.base_score,
+                    "trees": [tree.nodes for tree in self.trees],
+                }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "HintCostModel":
+        with open(path) as f:
+            data = json.load(f)
+        model = cls(data["num_trees"], data["max_depth"], data["learning_rate"],
+                    data["min_samples_leaf"])
+        model.base_score = data["base_score"]
+        for nodes in data["trees"]:
+            tree = RegressionTree(model.max_depth, model.min_samples_leaf)
+            tree.nodes = nodes
+            model.trees.append(tree)
+        return model
@@ -0,0 +1,162 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Latency measurement of the built runtime modules, shared by the tuning and the profiling of
+the operators.
+
+A measurement runs a few untimed warmup calls, then collects `repeat` samples of `number`
+calls each, and reports the median and the percentiles of the samples. A measurement whose
+samples vary more than `max_cv` (the coefficient of variation) is repeated, up to
+`max_retries` times, and the steadiest one is kept.
+
+With `cold_cache`, the inputs are copied into enough buffer sets to overflow the L2 cache,
+and every call runs on the next set, so small kernels (e.g. a GEMV of a small M) are not
+measured with their weight already resident in the cache.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Union
+import numpy as np
+import tvm
+from tvm.runtime import Module, NDArray
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the upper bound of the number of rotating buffer sets of a cold cache measurement
+MAX_ROTATING_BUFFERS = 64
+# the L2 cache size of an A100, when the size of the device is unknown
+DEFAULT_L2_CACHE_BYTES = 40 * 1024 * 1024
+
+
+@dataclass
+class MeasureOption:
+    """
+    The options of a measurement.
+
+    warmup : the untimed calls before the measurement.
+    number : the calls of a sample, whose mean latency is the sample.
+    repeat : the number of samples.
+    cold_cache : rotate the inputs over buffer sets that do not fit in the L2 cache.
+    l2_cache_bytes : the size of the L2 cache, the rotating buffer sets overflow twice of it,
+        defaults to the L2 cache of the arch when it is measured by an operator or the tuning.
+    max_cv : re-measure if the std of the samples is larger than this ratio of their median.
+    max_retries : the maximum number of re-measurements.
+    """
+    warmup: int = 1
+    number: int = 10
+    repeat: int = 3
+    cold_cache: bool = False
+    l2_cache_bytes: Optional[int] = None
+    max_cv: float = 0.1
+    max_retries: int = 1
+
+
+@dataclass
+class MeasureResult:
+    """The latency samples of a measurement in ms."""
+    samples: List[float] = field(default_factory=list)
+
+    @property
+    def median(self) -> float:
+        return float(np.median(self.samples))
+
+    @property
+    def mean(self) -> float:
+        return float(np.mean(self.samples))
+
+    @property
+    def min(self) -> float:
+        return float(np.min(self.samples))
+
+    @property
+    def cv(self) -> float:
+        """The coefficient of variation of the samples."""
+        if len(self.samples) < 2:
+            return 0.0
+        return float(np.std(self.samples, ddof=1)) / max(self.median, 1e-12)
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self.samples, q))
+
+
+def _get_nbytes(array: NDArray) -> int:
+    dtype = tvm.runtime.DataType(array.dtype)
+    return math.prod(array.shape) * dtype.bits * dtype.lanes // 8
+
+
+def get_num_rotating_buffers(args: Sequence[NDArray], l2_cache_bytes: Optional[int] = None) -> int:
+    """The number of buffer sets whose total size is at least twice of the L2 cache."""
+    if l2_cache_bytes is None:
+        l2_cache_bytes = DEFAULT_L2_CACHE_BYTES
+    nbytes = sum(_get_nbytes(arg) for arg in args if isinstance(arg, NDArray))
+    if nbytes == 0:
+        return 1
+    return min(max(math.ceil(2 * l2_cache_bytes / nbytes), 1), MAX_ROTATING_BUFFERS)
+
+
+def get_rotating_buffers(args: Sequence[NDArray], num_buffers: int) -> List[List[NDArray]]:
+    """Copies the args into `num_buffers` sets, the first set is the args themselves."""
+    buffers = [list(args)]
+    for _ in range(num_buffers - 1):
+        buffers.append([
+            tvm.nd.empty(arg.shape, arg.dtype, arg.device).copyfrom(arg)
+            if isinstance(arg, NDArray) else arg for arg in args
+        ])
+    return buffers
+
+
+def _collect_samples(rt_mod: Module, buffers: List[List[NDArray]], device,
+                     option: MeasureOption) -> List[float]:
+    if len(buffers) == 1:
+        evaluator = rt_mod.time_evaluator(
+            rt_mod.entry_name, device, number=option.number, repeat=option.repeat)
+        return [t * 1e3 for t in evaluator(*buffers[0]).results]
+    # every call runs on the next buffer set, so a sample is the mean of single runs
+    evaluator = rt_mod.time_evaluator(rt_mod.entry_name, device, number=1, repeat=1)
+    samples = []
+    step = 0
+    for _ in range(option.repeat):
+        total = 0.0
+        for _ in range(option.number):
+            total += evaluator(*buffers[step % len(buffers)]).mean
+            step += 1
+        samples.append(total / option.number * 1e3)
+    return samples
+
+
+def measure_latency(rt_mod: Module,
+                    args: Union[Sequence[NDArray], Sequence[Sequence[NDArray]]],
+                    device,
+                    option: Optional[MeasureOption] = None) -> MeasureResult:
+    """
+    Measures the latency of the entry function of a runtime module.
+
+    The `args` are the arguments of a call, or the buffer sets to rotate over, which are
+    created from the arguments if `option.cold_cache` is set.
+    """
+    if option is None:
+        option = MeasureOption()
+    if len(args) > 0 and isinstance(args[0], (list, tuple)):
+        buffers = [list(arg) for arg in args]
+    elif option.cold_cache:
+        buffers = get_rotating_buffers(
+            args, get_num_rotating_buffers(args, option.l2_cache_bytes))
+    else:
+        buffers = [list(args)]
+
+    if option.warmup > 0:
+        entry = rt_mod.get_function(rt_mod.entry_name)
+        for i in range(option.warmup):
+            entry(*buffers[i % len(buffers)])
+        device.sync()
+
+    result = MeasureResult(_collect_samples(rt_mod, buffers, device, option))
+    for _ in range(option.max_retries):
+        if result.cv <= option.max_cv:
+            break
+        logger.debug(f"Re-measure the noisy samples with cv {result.cv:.3f}")
+        retry = MeasureResult(_collect_samples(rt_mod, buffers, device, option))
+        if retry.cv < result.cv:
+            result = retry
+    return result
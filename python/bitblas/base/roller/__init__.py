@@ -4,3 +4,7 @@ from .node import PrimFuncNode  # noqa: F401
 from .hint import Hint  # noqa: F401
 from .policy import DefaultPolicy, TensorCorePolicy  # noqa: F401
 from .arch import TileDevice, CUDA  # noqa: F401
+from .latency_model import (  # noqa: F401
+    KernelCost, LatencyModel, LatencyModelParams, calibrate_latency_model, get_latency_model,
+    set_latency_model,
+)
@@ -1,13 +1,20 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+from typing import Optional
 from .arch_base import TileDevice
 from .cuda import *
 from .cpu import *
+from .device_profile import (
+    DeviceProfile,
+    DEVICE_PROFILES,
+    get_device_profile,
+    register_device_profile,
+)
 
 
-def get_arch(target: tvm.target.Target) -> TileDevice:
+def get_arch(target: tvm.target.Target, profile: Optional[DeviceProfile] = None) -> TileDevice:
     if target.kind.name == "cuda":
-        return CUDA(target)
+        return CUDA(target, profile=profile)
     elif target.kind.name == "llvm":
         return CPU(target)
     else:
@@ -1,10 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import json
 import tvm
 from tvm.target import Target
 from .arch_base import TileDevice
-from typing import List, Dict
+from .device_profile import DeviceProfile, get_device_profile, BITBLAS_DEVICE_PROFILE_ENV
+from typing import List, Dict, Optional, Union
 
 
 def check_sm_version(arch: str) -> int:
@@ -27,34 +29,76 @@ class TensorInstruction(object):
 
 
 class CUDA(TileDevice):
+    """
+    The CUDA arch of a target. The specifications are queried from the device 0 when it
+    exists, otherwise they are taken from the `profile` or the known profile of the target
+    (see `device_profile`), so that the configs can be emitted and the sources generated on
+    a host without a GPU. The `device` of an arch without a GPU is None.
+    """
 
-    def __init__(self, target: Target):
+    def __init__(self, target: Union[Target, str], profile: Optional[DeviceProfile] = None):
+        if isinstance(target, str):
+            target = Target(target)
         self.target = target
-        self.sm_version = check_sm_version(self.target.arch)
+        self.sm_version = check_sm_version(self.target.arch) if self.target.arch else -1
         device = tvm.runtime.cuda(0)
-        if not device.exist:
-            raise RuntimeError("Cannot find cuda device 0.")
-        self.device: tvm.runtime.Device = device
+        if profile is None and not device.exist:
+            profile = get_device_profile(target, self.sm_version)
+            if profile is None:
+                raise RuntimeError(
+                    f"Cannot find cuda device 0 nor a device profile of the target {target}, "
+                    f"please set {BITBLAS_DEVICE_PROFILE_ENV} to the JSON spec of the device.")
         self.platform: str = "CUDA"
-        self.smem_cap = device.max_shared_memory_per_block
-        self.compute_max_core = device.multi_processor_count
-        self.warp_size = device.warp_size
-        self.compute_capability = device.compute_version.replace(".", "")
-        self.reg_cap: int = 65536
+        if profile is not None:
+            self.device = device if device.exist else None
+            if self.sm_version < 0:
+                self.sm_version = profile.sm_version
+            self.smem_cap = profile.smem_cap
+            self.compute_max_core = profile.compute_max_core
+            self.warp_size = profile.warp_size
+            self.compute_capability = str(profile.sm_version)
+            self.reg_cap: int = profile.reg_cap
+            self.sm_partition: int = profile.sm_partition
+            self.l2_cache_size_bytes: int = profile.l2_cache_size_bytes
+            self.bandwidth: List[int] = list(profile.bandwidth)
+            self.memory_bandwidth_gbps: Optional[float] = profile.memory_bandwidth_gbps
+        else:
+            self.device: tvm.runtime.Device = device
+            self.smem_cap = device.max_shared_memory_per_block
+            self.compute_max_core = device.multi_processor_count
+            self.warp_size = device.warp_size
+            self.compute_capability = device.compute_version.replace(".", "")
+            self.reg_cap: int = 65536
+            self.sm_partition: int = 4
+            self.l2_cache_size_bytes: int = target.l2_cache_size_bytes
+            # bandwidth in MB/s, will be used for recommend basic tile size
+            # TODO(lei): find some way to get the real bandwidth
+            # However, the ratio of bandwidth between different devices can
+            # be similar. The bandwidth can work for another devices as well.
+            self.bandwidth: List[int] = [750, 12080]
+            known_profile = get_device_profile(target, self.sm_version)
+            self.memory_bandwidth_gbps: Optional[float] = (
+                known_profile.memory_bandwidth_gbps if known_profile is not None else None)
         self.max_smem_usage: int = 2 * self.smem_cap
-        self.sm_partition: int = 4
-        self.l2_cache_size_bytes: int = target.l2_cache_size_bytes
         # the number of transaction size in bytes
         self.transaction_size: List[int] = [32, 128]  # in bytes
-        # bandwidth in MB/s, will be used for recommend basic tile size
-        # TODO(lei): find some way to get the real bandwidth
-        # However, the ratio of bandwidth between different devices can
-        # be similar. The bandwidth can work for another devices as well.
-        self.bandwidth: List[int] = [750, 12080]
         # get the available tensor instructions during runtime to avoid
         # the dependency of the tensor intrinsics registration
         self.available_tensor_instructions: List[TensorInstruction] = None
 
+    @classmethod
+    def from_json(cls, path: str, target: Union[Target, str, None] = None) -> "CUDA":
+        """
+        Creates the arch from a JSON spec of `DeviceProfile`, the target defaults to the
+        "target" of the spec, or the cuda target of the SM version of the spec.
+        """
+        with open(path) as f:
+            spec = json.load(f)
+        profile = DeviceProfile.from_dict(spec)
+        if target is None:
+            target = spec.get("target", f"cuda -arch=sm_{profile.sm_version}")
+        return cls(target, profile=profile)
+
     def get_avaliable_tensorintrin_shapes(self):
         from tvm.tir.tensor_intrin.cuda import get_wmma_intrin_group, get_mma_intrin_group
 
@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Profiles of the known CUDA devices, so that the roller can emit configs and the sources
+can be generated on a host without a GPU, and only the measurement needs the device.
+
+A profile is found by the tag of the target (e.g. nvidia/nvidia-a100), or by its SM
+version, or loaded from a JSON spec, e.g.
+
+    {"name": "my-a100", "sm_version": 80, "compute_max_core": 108,
+     "l2_cache_size_bytes": 41943040, "memory_bandwidth_gbps": 1555}
+
+The spec of the environment variable `BITBLAS_DEVICE_PROFILE` is used by every CUDA arch
+that is created without a device.
+"""
+import os
+import json
+from dataclasses import dataclass, field, asdict, fields
+from typing import Dict, List, Optional, Union
+from tvm.target import Target
+
+BITBLAS_DEVICE_PROFILE_ENV = "BITBLAS_DEVICE_PROFILE"
+
+_MB = 1024 * 1024
+
+
+@dataclass
+class DeviceProfile:
+    """The hardware specifications of a CUDA device that the roller plans with."""
+    name: str
+    sm_version: int
+    # the number of streaming multiprocessors
+    compute_max_core: int
+    l2_cache_size_bytes: int
+    # the peak bandwidth of the device memory
+    memory_bandwidth_gbps: float
+    # the shared memory of a block without the dynamic opt-in
+    smem_cap: int = 48 * 1024
+    warp_size: int = 32
+    reg_cap: int = 65536
+    sm_partition: int = 4
+    # the relative bandwidth of the global and the shared memory of the roller
+    bandwidth: List[int] = field(default_factory=lambda: [750, 12080])
+
+    @classmethod
+    def from_dict(cls, spec: Dict) -> "DeviceProfile":
+        names = {f.name for f in fields(cls)}
+        unknown = set(spec) - names - {"target"}
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} of the device profile")
+        return cls(**{k: v for k, v in spec.items() if k in names})
+
+    @classmethod
+    def from_json(cls, path: str) -> "DeviceProfile":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+
+
+DEVICE_PROFILES: Dict[str, DeviceProfile] = {
+    profile.name: profile for profile in [
+        DeviceProfile("nvidia/tesla-v100", 70, 80, 6 * _MB, 900),
+        DeviceProfile("nvidia/tesla-t4", 75, 40, 4 * _MB, 320),
+        DeviceProfile("nvidia/geforce-rtx-2080-ti", 75, 68, 5632 * 1024, 616),
+        DeviceProfile("nvidia/nvidia-a100", 80, 108, 40 * _MB, 1555),
+        DeviceProfile("nvidia/nvidia-a10", 86, 72, 6 * _MB, 600),
+        DeviceProfile("nvidia/geforce-rtx-3090", 86, 82, 6 * _MB, 936),
+        DeviceProfile("nvidia/rtx-a6000", 86, 84, 6 * _MB, 768),
+        DeviceProfile("nvidia/geforce-rtx-4090", 89, 128, 72 * _MB, 1008),
+        DeviceProfile("nvidia/nvidia-h100", 90, 132, 50 * _MB, 3350),
+    ]
+}
+
+# the representative device of an SM version, for the targets without a known tag
+SM_VERSION_PROFILES: Dict[int, str] = {
+    70: "nvidia/tesla-v100",
+    75: "nvidia/tesla-t4",
+    80: "nvidia/nvidia-a100",
+    86: "nvidia/geforce-rtx-3090",
+    89: "nvidia/geforce-rtx-4090",
+    90: "nvidia/nvidia-h100",
+}
+
+
+def register_device_profile(profile: DeviceProfile, override: bool = False):
+    if profile.name in DEVICE_PROFILES and not override:
+        raise ValueError(f"Device profile {profile.name} is already registered")
+    DEVICE_PROFILES[profile.name] = profile
+
+
+def get_device_profile(target: Union[str, Target],
+                       sm_version: Optional[int] = None) -> Optional[DeviceProfile]:
+    """
+    The profile of the spec of `BITBLAS_DEVICE_PROFILE`, or of the tag of the target, or
+    of the representative device of its SM version, None if none is known.
+    """
+    if os.environ.get(BITBLAS_DEVICE_PROFILE_ENV):
+        return DeviceProfile.from_json(os.environ[BITBLAS_DEVICE_PROFILE_ENV])
+    tag = target.tag if isinstance(target, Target) else target
+    if tag in DEVICE_PROFILES:
+        return DEVICE_PROFILES[tag]
+    if sm_version in SM_VERSION_PROFILES:
+        return DEVICE_PROFILES[SM_VERSION_PROFILES[sm_version]]
+    return None
@@ -161,6 +161,8 @@ class Hint(object):
         # reduce axes tiling info
         self.rstep = []
         self.reduce_thread = []
+        # the number of slices that the reduction is partitioned into across the blocks (split-k)
+        self.split_k_factor = 1
         self.rasterization_plan = NoRasterization()
         self.cached_tensors = []
         self.output_strides = {}
@@ -187,6 +189,8 @@ class Hint(object):
         dic["rstep"] = self.rstep
         if np.prod(self.reduce_thread) > 1:
             dic["reduce_thread"] = self.reduce_thread
+        if self.split_k_factor > 1:
+            dic["split_k_factor"] = self.split_k_factor
         if self.use_tc:
             dic["use_tc"] = self.use_tc
         if self.output_strides:
@@ -210,6 +214,81 @@ class Hint(object):
             setattr(self, k, v)
         return self
 
+    def serialize(self) -> Dict:
+        """
+        Serializes the schedule related fields into a json compatible dict, which can be
+        restored with `Hint.deserialize`. The arch is not serialized and should be attached
+        again when the hint is applied.
+        """
+        rasterization_plan = {"kind": type(self.rasterization_plan).__name__}
+        if hasattr(self.rasterization_plan, "panel_width_"):
+            rasterization_plan["panel_width"] = int(self.rasterization_plan.panel_width_)
+        dic = {
+            "use_tc": bool(self.use_tc),
+            "block": [int(x) for x in self.block],
+            "thread": [int(x) for x in self.thread],
+            "warp": [int(x) for x in self.warp],
+            "rstep": [int(x) for x in self.rstep],
+            "reduce_thread": [int(x) for x in self.reduce_thread],
+            "rasterization_plan": rasterization_plan,
+            "cached_tensors": [str(x) for x in self.cached_tensors],
+            "output_strides": {
+                str(k): [stride.ax, stride.stride] for k, stride in self.output_strides.items()
+            },
+            "raxis_order": [int(x) for x in self._raxis_order],
+            "step": [int(x) for x in self._step],
+            "vectorize": {str(k): int(v) for k, v in self.vectorize.items()},
+            "pipeline_stage": int(self.pipeline_stage),
+            "use_async": bool(self.use_async),
+            "opt_shapes": {str(k): int(v) for k, v in (self.opt_shapes or {}).items()},
+            "intrin_info": {
+                "in_dtype": self.intrin_info.in_dtype,
+                "out_dtype": self.intrin_info.out_dtype,
+                "trans_b": bool(self.intrin_info.trans_b),
+                "input_transform_kind": int(self.intrin_info.input_transform_kind),
+                "weight_transform_kind": int(self.intrin_info.weight_transform_kind),
+            },
+            "shared_scope": self.shared_scope,
+            "pass_context": dict(self.pass_context),
+        }
+        # only the split-k hints have the field, the keys of the other hints are unchanged
+        if self.split_k_factor > 1:
+            dic["split_k_factor"] = int(self.split_k_factor)
+        return dic
+
+    @classmethod
+    def deserialize(cls, dic: Dict, arch=None) -> "Hint":
+        hint = cls()
+        hint.arch = arch
+        hint.use_tc = dic.get("use_tc", False)
+        hint.block = list(dic.get("block", []))
+        hint.thread = list(dic.get("thread", []))
+        hint.warp = list(dic.get("warp", []))
+        hint.rstep = list(dic.get("rstep", []))
+        hint.reduce_thread = list(dic.get("reduce_thread", []))
+        hint.split_k_factor = dic.get("split_k_factor", 1)
+        rasterization_plan = dic.get("rasterization_plan", {"kind": "NoRasterization"})
+        if rasterization_plan["kind"] == "Rasterization2DColumn":
+            hint.rasterization_plan = Rasterization2DColumn(rasterization_plan["panel_width"])
+        elif rasterization_plan["kind"] == "Rasterization2DRow":
+            hint.rasterization_plan = Rasterization2DRow(rasterization_plan["panel_width"])
+        hint.cached_tensors = list(dic.get("cached_tensors", []))
+        hint.output_strides = {
+            k: Stride(stride=stride, ax=ax)
+            for k, (ax, stride) in dic.get("output_strides", {}).items()
+        }
+        hint._raxis_order = list(dic.get("raxis_order", []))
+        hint._step = list(dic.get("step", []))
+        hint.vectorize = dict(dic.get("vectorize", {}))
+        hint.pipeline_stage = dic.get("pipeline_stage", 1)
+        hint.use_async = dic.get("use_async", False)
+        hint.opt_shapes = dict(dic.get("opt_shapes", {}))
+        if "intrin_info" in dic:
+            hint.intrin_info = IntrinInfo(**dic["intrin_info"])
+        hint.shared_scope = dic.get("shared_scope", "shared")
+        hint.pass_context = dict(dic.get("pass_context", {}))
+        return hint
+
     @property
     def raxis_order(self) -> List[int]:
         if self._raxis_order != []:
@@ -0,0 +1,343 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Analytic latency model of the candidate tiles of the roller, a roofline of the device that is
+quantized by the waves of the blocks.
+
+A kernel is summarized by its `KernelCost`: the grid, the occupancy, and the flops, global
+memory traffic and decoded elements (e.g. the int4 weights that are dequantized to float16)
+of a block. A wave of blocks is bound by the slower of the memory and the compute (CUDA or
+tensor cores), and the faster one is hidden by the software pipeline and the other resident
+blocks of an SM. The redundant traffic of the blocks, that exceeds the unique bytes of the
+buffers, partially hits in the L2 cache. A split-k kernel, whose blocks compute the partial
+sums of slices of the reduction, pays for the fixup pass that sums them up.
+
+The constants of a device are derived from its SM version and memory bandwidth, and can be
+calibrated by a small set of microbenchmarks on the device (see `calibrate_latency_model`).
+The calibrated constants are stored per device in `BITBLAS_LATENCY_MODEL_PATH`, and are used
+by every policy that is created for the device afterwards.
+"""
+import os
+import json
+import math
+from dataclasses import dataclass, asdict, fields, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+BITBLAS_LATENCY_MODEL_PATH = os.path.expanduser("~/.cache/bitblas/latency_model")
+
+# the dense float16 flops per cycle of an SM, and the boost clock, of each SM version
+TENSOR_CORE_FLOPS_PER_CYCLE = {70: 1024, 75: 1024, 80: 2048, 86: 1024, 89: 1024, 90: 4096}
+CUDA_CORE_FLOPS_PER_CYCLE = {70: 128, 75: 128, 80: 128, 86: 256, 89: 256, 90: 256}
+BOOST_CLOCK_GHZ = {70: 1.53, 75: 1.59, 80: 1.41, 86: 1.70, 89: 2.52, 90: 1.755}
+DEFAULT_SM_VERSION = 80
+DEFAULT_MEMORY_BANDWIDTH_GBPS = 900.0
+# the instructions to decode an element of a low bit weight
+DECODE_OPS_PER_ELEMENT = 8
+
+
+@dataclass
+class KernelCost:
+    """The work of a kernel that the latency is predicted from."""
+    grid_size: int
+    block_per_SM: int
+    # the flops, the global memory traffic and the decoded elements of a block
+    flops: float
+    traffic_bytes: float
+    decode_elements: float = 0.0
+    # the total bytes of the buffers of the kernel
+    unique_bytes: float = 0.0
+    pipeline_stage: int = 1
+    use_tc: bool = False
+    # the reduction slices of a split-k kernel, and the bytes of its fixup pass that sums up
+    # the partial sums of the slices
+    split_k_factor: int = 1
+    fixup_bytes: float = 0.0
+
+
+@dataclass
+class LatencyModelParams:
+    """The constants of a device, the sustained throughputs rather than the peak ones."""
+    memory_bandwidth_gbps: float
+    tensor_core_tflops: float
+    cuda_core_tflops: float
+    # giga decoded elements per second
+    decode_gelems: float
+    launch_overhead_us: float = 4.0
+    # the fraction of the redundant traffic of the blocks that hits in the L2 cache
+    l2_hit_rate: float = 0.5
+    # the fraction of the SMs that saturates the memory bandwidth
+    bandwidth_saturation: float = 0.5
+
+    @classmethod
+    def from_arch(cls, arch) -> "LatencyModelParams":
+        sm_version = getattr(arch, "sm_version", -1)
+        if sm_version not in BOOST_CLOCK_GHZ:
+            sm_version = max((v for v in BOOST_CLOCK_GHZ if v <= sm_version),
+                             default=DEFAULT_SM_VERSION)
+        num_sm = max(getattr(arch, "compute_max_core", 0), 1)
+        clock = BOOST_CLOCK_GHZ[sm_version] * 1e9
+        tensor_core_tflops = num_sm * clock * TENSOR_CORE_FLOPS_PER_CYCLE[sm_version] / 1e12
+        cuda_core_tflops = num_sm * clock * CUDA_CORE_FLOPS_PER_CYCLE[sm_version] / 1e12
+        bandwidth = getattr(arch, "memory_bandwidth_gbps", None) or DEFAULT_MEMORY_BANDWIDTH_GBPS
+        return cls(
+            memory_bandwidth_gbps=0.8 * bandwidth,
+            tensor_core_tflops=0.7 * tensor_core_tflops,
+            cuda_core_tflops=0.7 * cuda_core_tflops,
+            decode_gelems=0.7 * cuda_core_tflops * 1e3 / DECODE_OPS_PER_ELEMENT,
+        )
+
+
+def get_device_key(arch) -> str:
+    """The key of the calibrated constants of a device, its SM version and SM count."""
+    return f"sm_{getattr(arch, 'sm_version', -1)}_x{getattr(arch, 'compute_max_core', 0)}"
+
+
+def _get_nbytes(node, buffer) -> float:
+    try:
+        numel = math.prod(int(node.extent_wrapper(axis)) for axis in buffer.shape)
+    except (TypeError, ValueError):
+        # the extent is an expression of a dynamic symbolic without an opt shape
+        return 0.0
+    return numel * node.get_buffer_dtype(buffer).bits / 8
+
+
+def get_kernel_cost(node, td, use_tc: bool = False, pipeline_stage: int = 1) -> KernelCost:
+    """The `KernelCost` of the tile of a PrimFuncNode, whose traffic and occupancy are known."""
+    tile = td.get_tile(node)
+    reduce_extent = math.prod(int(node.extent_wrapper(ax.dom.extent)) for ax in node.raxis)
+    flops = (2 if node.raxis else 1) * math.prod(tile) * reduce_extent
+    # the inputs of the reduction that are not the args are computed by the block, e.g. the
+    # decoded weights of a dequantize matmul
+    arg_names = {buffer.name for buffer in node.args}
+    decode_elements = sum(
+        math.prod(shape)
+        for name, shape in node.propagate_reduction_inputs(tile).items()
+        if name not in arg_names)
+    return KernelCost(
+        grid_size=td.grid_size,
+        block_per_SM=td.block_per_SM,
+        flops=float(flops),
+        traffic_bytes=float(td.traffic),
+        decode_elements=float(decode_elements),
+        unique_bytes=float(sum(_get_nbytes(node, buffer) for buffer in node.args)),
+        pipeline_stage=max(int(pipeline_stage), 1),
+        use_tc=bool(use_tc),
+    )
+
+
+def get_split_k_cost(cost: KernelCost, split_k_factor: int, tile_output_bytes: float,
+                     tile_partial_bytes: float) -> KernelCost:
+    """
+    The cost of a kernel whose reduction is partitioned into `split_k_factor` slices: every
+    block reads a slice of the inputs of the tile and writes its partial sums to a workspace,
+    which are read again by the fixup pass that writes the output.
+    """
+    input_bytes = max(cost.traffic_bytes - tile_output_bytes, 0.0)
+    partial_bytes = cost.grid_size * split_k_factor * tile_partial_bytes
+    return replace(
+        cost,
+        grid_size=cost.grid_size * split_k_factor,
+        flops=cost.flops / split_k_factor,
+        traffic_bytes=input_bytes / split_k_factor + tile_partial_bytes,
+        decode_elements=cost.decode_elements / split_k_factor,
+        unique_bytes=cost.unique_bytes + partial_bytes,
+        split_k_factor=split_k_factor,
+        fixup_bytes=partial_bytes + cost.grid_size * tile_output_bytes,
+    )
+
+
+class LatencyModel:
+    """Predicts the latency of a `KernelCost` in microseconds."""
+
+    def __init__(self, arch, params: Optional[LatencyModelParams] = None):
+        self.arch = arch
+        self.params = params if params is not None else LatencyModelParams.from_arch(arch)
+        self.num_sm = max(getattr(arch, "compute_max_core", 0), 1)
+
+    def _get_dram_bytes(self, cost: KernelCost) -> float:
+        """The global memory traffic of a block that misses the L2 cache."""
+        total = cost.traffic_bytes * cost.grid_size
+        if cost.unique_bytes <= 0 or total <= cost.unique_bytes:
+            return cost.traffic_bytes
+        dram = cost.unique_bytes + (total - cost.unique_bytes) * (1 - self.params.l2_hit_rate)
+        return dram / cost.grid_size
+
+    def _get_wave_latency(self, cost: KernelCost, num_blocks: int) -> float:
+        params = self.params
+        block_per_SM = max(cost.block_per_SM, 1)
+        sm_fraction = min(math.ceil(num_blocks / block_per_SM), self.num_sm) / self.num_sm
+        # GB/s and TFLOPS in bytes and flops per microsecond
+        bandwidth = params.memory_bandwidth_gbps * 1e3 * min(
+            sm_fraction / params.bandwidth_saturation, 1.0)
+        memory = num_blocks * self._get_dram_bytes(cost) / bandwidth
+        tflops = params.tensor_core_tflops if cost.use_tc else params.cuda_core_tflops
+        compute = num_blocks * cost.flops / (tflops * 1e6 * sm_fraction)
+        compute += num_blocks * cost.decode_elements / (params.decode_gelems * 1e3 * sm_fraction)
+        # the shorter one is hidden by the stages of the pipeline and the resident blocks
+        exposed = 1.0 / (cost.pipeline_stage * min(block_per_SM, num_blocks))
+        return max(memory, compute) + exposed * min(memory, compute)
+
+    def predict(self, cost: KernelCost) -> float:
+        blocks_per_wave = max(cost.block_per_SM, 1) * self.num_sm
+        full_waves, tail = divmod(max(cost.grid_size, 1), blocks_per_wave)
+        latency = self.params.launch_overhead_us
+        if full_waves > 0:
+            latency += full_waves * self._get_wave_latency(cost, blocks_per_wave)
+        if tail > 0:
+            latency += self._get_wave_latency(cost, tail)
+        if cost.split_k_factor > 1:
+            # the fixup pass is another memory bound kernel
+            latency += self.params.launch_overhead_us + cost.fixup_bytes / (
+                self.params.memory_bandwidth_gbps * 1e3)
+        return latency
+
+    def fit(self,
+            samples: Sequence[Tuple[KernelCost, float]],
+            num_rounds: int = 6) -> "LatencyModel":
+        """
+        Calibrates the constants to the measured latencies (in microseconds) of the costs, by
+        a coordinate search that minimizes the squared log error of the predictions.
+        """
+        samples = [(cost, latency) for cost, latency in samples if latency > 0]
+        if not samples:
+            logger.warning("No measured sample to calibrate the latency model")
+            return self
+        measured = np.log([latency for _, latency in samples])
+
+        def _loss(params: LatencyModelParams) -> float:
+            self.params = params
+            predicted = np.log([self.predict(cost) for cost, _ in samples])
+            return float(np.mean((predicted - measured)**2))
+
+        best = self.params
+        best_loss = _loss(best)
+        scale = 4.0
+        for _ in range(num_rounds):
+            for f in fields(LatencyModelParams):
+                value = getattr(best, f.name)
+                for factor in np.geomspace(1 / scale, scale, 9):
+                    candidate_value = value * factor
+                    if f.name in ("l2_hit_rate", "bandwidth_saturation"):
+                        candidate_value = min(candidate_value, 1.0)
+                    candidate = replace(best, **{f.name: float(candidate_value)})
+                    loss = _loss(candidate)
+                    if loss < best_loss:
+                        best, best_loss = candidate, loss
+            scale = math.sqrt(scale)
+        self.params = best
+        logger.info(f"Calibrated the latency model with {len(samples)} samples, "
+                    f"rms log error {math.sqrt(best_loss):.3f}")
+        return self
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"device": get_device_key(self.arch), "params": asdict(self.params)}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, arch) -> "LatencyModel":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(arch, LatencyModelParams(**data["params"]))
+
+
+_latency_models: Dict[str, LatencyModel] = {}
+
+
+def get_latency_model_path(arch) -> str:
+    return os.path.join(BITBLAS_LATENCY_MODEL_PATH, f"{get_device_key(arch)}.json")
+
+
+def get_latency_model(arch) -> LatencyModel:
+    """The calibrated latency model of the device of the arch, or the default one."""
+    key = get_device_key(arch)
+    if key not in _latency_models:
+        path = get_latency_model_path(arch)
+        model = None
+        if os.path.exists(path):
+            try:
+                model = LatencyModel.load(path, arch)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Failed to load the latency model {path}: {e}")
+        _latency_models[key] = model if model is not None else LatencyModel(arch)
+    return _latency_models[key]
+
+
+def set_latency_model(arch, model: Optional[LatencyModel]) -> Optional[LatencyModel]:
+    """Sets the latency model of the device of the arch, None to reload the stored one."""
+    key = get_device_key(arch)
+    if model is None:
+        _latency_models.pop(key, None)
+    else:
+        _latency_models[key] = model
+    return model
+
+
+# the microbenchmarks of the calibration, a memory bound, a decode bound, a launch bound and
+# a compute bound matmul, and a balanced one in between
+CALIBRATION_WORKLOADS: List[Dict] = [
+    {"M": 1, "N": 16384, "K": 16384},
+    {"M": 1, "N": 16384, "K": 16384, "bit": 4},
+    {"M": 16, "N": 1024, "K": 1024},
+    {"M": 4096, "N": 4096, "K": 4096},
+    {"M": 256, "N": 8192, "K": 8192},
+]
+
+
+def _get_calibration_func(workload: Dict):
+    from bitblas.ops.impl.matmul_impl import matmul_nt  # pylint: disable=import-outside-toplevel
+    from bitblas.ops.impl.matmul_dequantize_impl import (  # pylint: disable=import-outside-toplevel
+        matmul_nt_dequantize_b,)
+
+    if "bit" in workload:
+        return matmul_nt_dequantize_b(**workload)["main"]
+    return matmul_nt(**workload)["main"]
+
+
+def calibrate_latency_model(target,
+                            workloads: Optional[List[Dict]] = None,
+                            topk: int = 10,
+                            save: bool = True) -> LatencyModel:
+    """
+    Tunes the microbenchmark workloads (the kwargs of `matmul_nt`, or `matmul_nt_dequantize_b`
+    with a "bit") on the device of the target, fits the latency model of the device to the
+    measured candidates, and stores it for the policies of the device.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tvm.target import Target
+    from bitblas.base.utils import fast_tune
+    from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
+    from .arch import CUDA
+    from .policy import DefaultPolicy, TensorCorePolicy
+
+    if isinstance(target, str):
+        target = Target(target)
+    arch = CUDA(target)
+    samples = []
+    for workload in workloads if workloads is not None else CALIBRATION_WORKLOADS:
+        func = _get_calibration_func(workload)
+        cpresults, _ = fast_tune(func, target, topk=topk)
+        policy = DefaultPolicy(func=func, arch=arch)
+        try:
+            tensorized_func, tags = get_tensorized_func_and_tags(func, arch.target)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug(f"Get tensorized func and tags failed: {e}")
+            tags = None
+        if tags:
+            policy = TensorCorePolicy(func=tensorized_func, arch=arch, tags=tags)
+        for cpresult in cpresults or []:
+            cost = policy.get_hint_cost(cpresult.config)
+            if cost is not None and cpresult.latency < 1e9:
+                samples.append((cost, cpresult.latency * 1e3))
+        logger.info(f"Measured {len(cpresults or [])} candidates of the workload {workload}")
+
+    model = LatencyModel(arch).fit(samples)
+    if save:
+        model.save(get_latency_model_path(arch))
+    return set_latency_model(arch, model)
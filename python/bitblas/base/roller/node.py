@@ -121,6 +121,9 @@ class PrimFuncNode(Node):
         self.output_buffers = []
         self.buffers = []
         self.args = []
+        # the shape inference is pure, the results are memoized by their arguments
+        self._propagate_cache: Dict[Tuple, Tuple[Dict, Dict]] = {}
+        self._footprint_cache: Dict[Tuple, Tuple[int, List[str]]] = {}
         self._analysis_funcinfo()
         self.ana = get_analyzer_by_tir(self.block_analyzer, self.blocks)
 
@@ -231,11 +234,21 @@ class PrimFuncNode(Node):
     def propagate(self, tile, rstep: Optional[Dict] = None, targets=None):
         if rstep is None:
             rstep = {}
-        shape = {
-            self.block_analyzer.get_output_buffers(block)[0].name:
-            [tvm.arith.ConstIntBound(0, val - 1) for val in tile] for block in self.schedule_stages
-        }
-        return self.ana.infer(shape, rstep, targets)
+        key = (
+            tuple(int(t) for t in tile),
+            tuple(sorted((k, int(v)) for k, v in rstep.items())),
+            tuple(targets) if targets is not None else None,
+        )
+        if key not in self._propagate_cache:
+            shape = {
+                self.block_analyzer.get_output_buffers(block)[0].name:
+                [tvm.arith.ConstIntBound(0, val - 1) for val in tile]
+                for block in self.schedule_stages
+            }
+            self._propagate_cache[key] = self.ana.infer(shape, rstep, targets)
+        shapes, intermediate_bind = self._propagate_cache[key]
+        # the callers may modify the returned shapes
+        return {k: list(v) for k, v in shapes.items()}, dict(intermediate_bind)
 
     def propagate_inputs(self, tile, rstep: Optional[Dict] = None) -> List[List[int]]:
         if rstep is None:
@@ -358,6 +371,17 @@ class PrimFuncNode(Node):
     def footprint(self, shape, rstep, stride_map: Optional[Dict] = None) -> int:
         if stride_map is None:
             stride_map = {}
+        key = (
+            tuple(int(s) for s in shape),
+            tuple(sorted((k, int(v)) for k, v in rstep.items())),
+            tuple(sorted((k, s.ax, s.stride) for k, s in stride_map.items())),
+        )
+        if key not in self._footprint_cache:
+            self._footprint_cache[key] = self._footprint(shape, rstep, stride_map)
+        result, cached_tensor = self._footprint_cache[key]
+        return result, list(cached_tensor)
+
+    def _footprint(self, shape, rstep, stride_map: Dict) -> int:
         result = 0
         shapes, _ = self.propagate(shape, rstep)
 
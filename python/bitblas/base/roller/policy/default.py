@@ -2,8 +2,9 @@
 # Licensed under the MIT License.
 """Policy for cuda core schedule"""
 import functools
+import heapq
 import math
-from queue import PriorityQueue
+from dataclasses import replace
 from typing import Iterable, Dict, List, Optional
 
 import numpy as np
@@ -12,6 +13,7 @@ import tvm
 from ..arch import TileDevice
 from ..bestfit import BestFit
 from ..hint import Hint, Stride, TileDict
+from ..latency_model import KernelCost, get_kernel_cost, get_latency_model
 from .common import coalesced_factor, coalesced_tensor_shape, factorize, get_all_factors
 from ..node import PrimFuncNode
 from ..rasterization import NoRasterization
@@ -33,6 +35,7 @@ class DefaultPolicy:
         self.prim_func_node = PrimFuncNode(func, tags)
         self.ordered_nodes = [self.prim_func_node]
         self.output_nodes = [self.prim_func_node]
+        self.latency_model = get_latency_model(arch)
 
     def emit_config(self, topk: int) -> List[Hint]:
         base_tile = self.get_base_tile()
@@ -55,6 +58,78 @@ class DefaultPolicy:
                 break
         return results
 
+    def legalize_configs(self, configs: List[Hint], topk: int = 10) -> List[Hint]:
+        """
+        Re-legalizes hints that were tuned for another shape or arch against this func and
+        arch, the hints that exceed the shared memory, register or thread limits are dropped
+        and the others are ranked with the same cost model as the emitted configs.
+
+        Parameters
+        ----------
+        configs : List[Hint]
+            The hints to be legalized, they are updated in place.
+        topk : int
+            The number of hints to keep.
+
+        Returns
+        -------
+        List[Hint]
+            The legal hints, the most promising first.
+        """
+        raxis = self.prim_func_node.raxis
+        candidates = []
+        for config in configs:
+            if len(config.block) != len(self.prim_func_node.get_space_dim()) or len(
+                    config.rstep) != len(raxis):
+                continue
+            rstep_map = {ax.var.name: int(step) for ax, step in zip(raxis, config.rstep)}
+            td = self.compute_tile_dict(list(config.block), rstep_map)
+            if not td.valid or not self.check_tile_shape_isvalid(td):
+                continue
+            config = self._legalize_config(config, td)
+            if config is None:
+                continue
+            candidates.append((self.get_tile_priority(td), config))
+        candidates.sort(key=lambda item: item[0])
+        return [config for _, config in candidates[:topk]]
+
+    def _legalize_config(self, config: Hint, td: TileDict) -> Optional[Hint]:
+        # the tensor core hints can only be scheduled by the TensorCorePolicy
+        if config.use_tc:
+            return None
+        num_threads = int(np.prod(config.thread) * np.prod(config.reduce_thread))
+        if num_threads > 1024:
+            return None
+        config.cached_tensors = td.cached_tensors_map[self.prim_func_node]
+        return config
+
+    def get_tile_priority(self, td: TileDict):
+        """The predicted latency of a tile in microseconds, small is better."""
+        return self.latency_model.predict(self.get_tile_cost(td))
+
+    def get_tile_cost(self, td: TileDict) -> KernelCost:
+        return get_kernel_cost(self.prim_func_node, td)
+
+    def get_hint_cost(self, config: Hint) -> Optional[KernelCost]:
+        """The cost of the tile of a hint, None if the tile is not valid for the func."""
+        raxis = self.prim_func_node.raxis
+        if len(config.block) != len(self.prim_func_node.get_space_dim()) or len(
+                config.rstep) != len(raxis):
+            return None
+        rstep_map = {ax.var.name: int(step) for ax, step in zip(raxis, config.rstep)}
+        td = self.compute_tile_dict(list(config.block), rstep_map)
+        if not td.valid:
+            return None
+        return replace(
+            self.get_tile_cost(td),
+            use_tc=bool(config.use_tc),
+            pipeline_stage=max(int(config.pipeline_stage), 1))
+
+    def estimate_latency(self, config: Hint) -> float:
+        """The predicted latency of a hint in microseconds, inf if it is not valid."""
+        cost = self.get_hint_cost(config)
+        return self.latency_model.predict(cost) if cost is not None else float("inf")
+
     def dfs_smem_tile(self, init_tile, rstep_map) -> Iterable[TileDict]:
         _steps = [get_all_factors(n) for n in self.prim_func_node.get_space_dim()]
         steps = [step[step.index(t):] for step, t in zip(_steps, init_tile)]
@@ -67,28 +142,29 @@ class DefaultPolicy:
             steps[i].extend(added)
             steps[i] = sorted(steps[i])
         visited_tiles = {}
-        queue = PriorityQueue()
-
-        def prio(td: TileDict):
-            return (td.traffic + 1) * td.num_wave
-
-        def add_to_queue(tile):
-            if tuple(tile) in visited_tiles:
-                return
-            td = self.compute_tile_dict(tile, rstep_map)
-            visited_tiles[tuple(tile)] = td
-            if td.valid:
-                queue.put([prio(td), tile])
-
-        add_to_queue(init_tile)
-        while not (queue.empty() or len(visited_tiles) > 2000):
-            _, tile = queue.get()
+        queue = []
+
+        prio = self.get_tile_priority
+
+        def add_to_queue(tiles):
+            tiles = [tile for tile in tiles if tuple(tile) not in visited_tiles]
+            # the neighbors of a tile are evaluated as a batch
+            for tile, td in zip(tiles, self.compute_tile_dicts(tiles, rstep_map)):
+                visited_tiles[tuple(tile)] = td
+                if td.valid:
+                    heapq.heappush(queue, (prio(td), tile))
+
+        add_to_queue([init_tile])
+        while queue and len(visited_tiles) <= 2000:
+            _, tile = heapq.heappop(queue)
             dim_ids = [step.index(t) for step, t in zip(steps, tile)]
+            new_tiles = []
             for i in reversed(range(len(dim_ids))):
                 if dim_ids[i] + 1 < len(steps[i]):
                     new_tile = tile.copy()
                     new_tile[i] = steps[i][dim_ids[i] + 1]
-                    add_to_queue(new_tile)
+                    new_tiles.append(new_tile)
+            add_to_queue(new_tiles)
 
         visited_tiles = filter(lambda td: td.valid, visited_tiles.values())
         sorted_tiles = sorted(visited_tiles, key=lambda td: prio(td))
@@ -477,29 +553,67 @@ class DefaultPolicy:
             A TileDict object containing the computed tile configuration, memory traffic, shared memory cost,
             grid size, and other related parameters.
         """
-        td = TileDict(output_tile)
-        td.rstep_map = rstep_map
-        td.traffic, td.tile_map = self._compute_memory_traffic(output_tile)
-        td.smem_cost, td.cached_tensors_map = self._compute_shared_memory_usage(td)
-        if td.smem_cost > self.arch.smem_cap:
-            td.valid = False
-            return td
-        output_shape = self.output_nodes[0].get_space_dim()
-        td.grid_size = int(np.prod([(y + x - 1) // x for x, y in zip(output_tile, output_shape)]))
+        return self.compute_tile_dicts([output_tile], rstep_map)[0]
+
+    def compute_tile_dicts(self, output_tiles: List[List[int]], rstep_map) -> List[TileDict]:
+        """
+        Computes the TileDicts of a batch of output tiles with the same reduction step map.
+
+        The grid size, register usage and occupancy of the whole batch are evaluated with
+        numpy, and the memory traffic and shared memory usage (whose shape inference is
+        memoized by the nodes) are only analyzed for the tiles within the register limit.
+
+        Parameters
+        ----------
+        output_tiles : List[List[int]]
+            The output tile configurations.
+        rstep_map : Dict
+            The reduction step map.
+
+        Returns
+        -------
+        List[TileDict]
+            The TileDict of each output tile, in the same order.
+        """
+        tds = [TileDict(output_tile) for output_tile in output_tiles]
+        if len(tds) == 0:
+            return tds
+        tiles = np.array(output_tiles, dtype="int64")
+        output_shape = np.array(self.output_nodes[0].get_space_dim(), dtype="int64")
+        grid_sizes = np.prod((output_shape + tiles - 1) // tiles, axis=1)
         # estimated reg usage
-        reg_usage = int(2 * max([
-            np.prod(td.get_tile(node)) * node.get_dtype().bits / 32 for node in self.ordered_nodes
-        ]))
-        if reg_usage > self.arch.reg_cap:
-            td.valid = False
-            return td
-        td.block_per_SM = min(
-            self.arch.max_smem_usage // max(td.smem_cost, 1),
-            self.arch.reg_cap // max(reg_usage, 1),
+        reg_usages = np.zeros(len(tds))
+        for node in self.ordered_nodes:
+            node_tiles = tiles * np.array(node.get_space_dim(), dtype="int64") // output_shape
+            reg_usages = np.maximum(reg_usages,
+                                    np.prod(node_tiles, axis=1) * node.get_dtype().bits / 32)
+        reg_usages = (2 * reg_usages).astype("int64")
+
+        smem_costs = np.zeros(len(tds), dtype="int64")
+        valid = reg_usages <= self.arch.reg_cap
+        for i, td in enumerate(tds):
+            td.rstep_map = rstep_map
+            if not valid[i]:
+                td.valid = False
+                continue
+            td.traffic, td.tile_map = self._compute_memory_traffic(td.output_tile)
+            td.smem_cost, td.cached_tensors_map = self._compute_shared_memory_usage(td)
+            if td.smem_cost > self.arch.smem_cap:
+                td.valid = valid[i] = False
+                continue
+            smem_costs[i] = td.smem_cost
+
+        block_per_SM = np.minimum(
+            np.minimum(self.arch.max_smem_usage // np.maximum(smem_costs, 1),
+                       self.arch.reg_cap // np.maximum(reg_usages, 1)),
             self.arch.sm_partition,
         )
-        td.num_wave = int(np.ceil(td.grid_size / int(td.block_per_SM * self.arch.compute_max_core)))
-        return td
+        num_waves = np.ceil(grid_sizes / np.maximum(block_per_SM * self.arch.compute_max_core, 1))
+        for i in np.flatnonzero(valid):
+            tds[i].grid_size = int(grid_sizes[i])
+            tds[i].block_per_SM = int(block_per_SM[i])
+            tds[i].num_wave = int(num_waves[i])
+        return tds
 
     def check_tile_shape_isvalid(self, td: TileDict) -> bool:
         """
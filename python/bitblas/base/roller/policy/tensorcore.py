@@ -1,17 +1,23 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 """Policy for tensorcore schedule"""
+import copy
+import math
 import tvm
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 
 from ..arch import TileDevice
 from ..hint import Hint, Stride, TileDict, IntrinInfo
+from ..latency_model import KernelCost, get_kernel_cost, get_split_k_cost
 from ..node import PrimFuncNode
 from .common import coalesced_factor, factorize, get_all_factors
 from .default import DefaultPolicy
 from ..rasterization import NoRasterization, Rasterization2DColumn
 
+# the maximum number of slices of the reduction of a split-k hint
+MAX_SPLIT_K_FACTOR = 16
+
 
 class TensorCorePolicy(DefaultPolicy):
 
@@ -25,6 +31,8 @@ class TensorCorePolicy(DefaultPolicy):
         self.wmma_k = 16
         self.pipeline_stage: int = 1
         self.use_async_copy: bool = False
+        # 1 disables the split-k hints, e.g. for the operators whose C wrapper launches one kernel
+        self.max_split_k_factor: int = MAX_SPLIT_K_FACTOR
         self._legalize_info()
 
     def _legalize_info(self):
@@ -76,6 +84,81 @@ class TensorCorePolicy(DefaultPolicy):
         value *= self.pipeline_stage
         return value, cached_tensors
 
+    def get_tile_cost(self, td: TileDict) -> KernelCost:
+        return get_kernel_cost(
+            self.prim_func_node, td, use_tc=True, pipeline_stage=self.pipeline_stage)
+
+    def get_hint_cost(self, config: Hint) -> Optional[KernelCost]:
+        cost = super().get_hint_cost(config)
+        if cost is None or config.split_k_factor <= 1:
+            return cost
+        node = self.prim_func_node
+        num_elements = math.prod(config.block)
+        output_bits = node.get_buffer_dtype(node.output_buffers[0]).bits
+        # the partial sums are stored in the accumulation dtype of the reduction
+        partial_bits = tvm.DataType(
+            node.block_analyzer.get_output_buffers(node.reduction_block)[0].dtype).bits
+        return get_split_k_cost(cost, config.split_k_factor, num_elements * output_bits / 8,
+                                num_elements * partial_bits / 8)
+
+    def get_split_k_factors(self, config: Hint) -> List[int]:
+        """
+        The factors that the reduction of a tensor core hint can be partitioned by, every
+        slice is a whole number of reduction steps that fills the software pipeline.
+        """
+        node = self.prim_func_node
+        # the split-k schedule is only implemented by the MMA schedule of static shapes
+        if (not config.use_tc or self.arch.sm_version < 80 or len(node.raxis) != 1 or
+                node.get_tag("opt_shapes")):
+            return []
+        extent = node.extent_wrapper(node.raxis[0].dom.extent)
+        if not isinstance(extent, int) or extent % config.rstep[0] != 0:
+            return []
+        num_steps = extent // config.rstep[0]
+        max_factor = min(num_steps // max(self.pipeline_stage, 1), self.max_split_k_factor)
+        return [f for f in range(2, max_factor + 1) if num_steps % f == 0]
+
+    def _emit_split_k_configs(self, config: Hint) -> List[Hint]:
+        """
+        The split-k variants of a hint whose blocks can not occupy all the SMs, e.g. a GEMV
+        with a large K: the powers of two, and the factor whose blocks fill the waves best,
+        which balances the reduction over the SMs like stream-k. Only the variants that are
+        predicted to pay off their fixup pass are emitted.
+        """
+        factors = self.get_split_k_factors(config)
+        cost = self.get_hint_cost(config)
+        if not factors or cost is None or cost.grid_size >= self.arch.compute_max_core:
+            return []
+        slots = self.arch.compute_max_core * max(cost.block_per_SM, 1)
+
+        def _wave_efficiency(factor: int) -> float:
+            num_blocks = cost.grid_size * factor
+            return num_blocks / (math.ceil(num_blocks / slots) * slots)
+
+        balanced = max(factors, key=_wave_efficiency)
+        latency = self.latency_model.predict(cost)
+        results = []
+        for factor in sorted({f for f in factors if f & (f - 1) == 0} | {balanced}):
+            split_k_config = copy.copy(config)
+            split_k_config.split_k_factor = factor
+            if self.estimate_latency(split_k_config) < latency:
+                results.append(split_k_config)
+        return results
+
+    def emit_config(self, topk: int) -> List[Hint]:
+        configs = super().emit_config(topk)
+        split_k_configs = [
+            split_k_config for config in configs
+            for split_k_config in self._emit_split_k_configs(config)
+        ]
+        if not split_k_configs:
+            return configs
+        # the spatial and the split-k candidates are ranked together by the predicted latency
+        candidates = configs + split_k_configs
+        latencies = [self.estimate_latency(config) for config in candidates]
+        order = sorted(range(len(candidates)), key=lambda i: latencies[i])
+        return [candidates[i] for i in order[:topk]]
+
     def _assign_reduce_step(self, node):
         if not node.get_tag("tensorcore_config"):
             return super()._assign_reduce_step(node)
@@ -308,6 +391,24 @@ class TensorCorePolicy(DefaultPolicy):
         codegen_dict.opt_shapes = self.prim_func_node.get_tag("opt_shapes")
         return codegen_dict
 
+    def _legalize_config(self, config: Hint, td: TileDict) -> Optional[Hint]:
+        if config.split_k_factor > 1 and config.split_k_factor not in self.get_split_k_factors(
+                config):
+            return None
+        if not config.use_tc:
+            return super()._legalize_config(config, td)
+        num_warps = int(np.prod(config.block) // np.prod(config.warp))
+        if num_warps * self.arch.warp_size > 1024:
+            return None
+        node = self.prim_func_node
+        config.cached_tensors = td.cached_tensors_map[node]
+        # the pipeline and the async copy depend on the arch
+        config.pipeline_stage = self.pipeline_stage
+        config.use_async = self.use_async_copy
+        config.shared_scope = "shared.dyn" if td.smem_cost > self.arch.smem_cap else "shared"
+        config.complete_config(node)
+        return config
+
     def plan_rasterization(self, td: TileDict):
         conditions = []
         # only support single node for now
@@ -0,0 +1,125 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Runners that load the built candidates of the fast tuning onto a device to measure them.
+
+The candidates are always built on the tuning host, which does not need a GPU (see
+`bitblas.base.roller.arch.device_profile`). The `LocalRunner` measures them on the device
+of the host, the `RPCRunner` uploads them to a tvm RPC server on a GPU node, e.g.
+
+    python -m tvm.exec.rpc_server --tracker=HOST:9190 --key=a100
+
+and measures them on its device, so a CPU host can tune for a remote GPU, and the GPU is
+only occupied by the measurement. Tests can replace the server with `tvm.rpc.LocalSession`.
+"""
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+import tvm
+from tvm import rpc
+from tvm.runtime import Module
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Runner(ABC):
+    """Loads the built artifacts onto the `device` the candidates are measured on."""
+
+    @property
+    @abstractmethod
+    def device(self) -> Optional[tvm.runtime.Device]:
+        pass
+
+    @abstractmethod
+    def load_module(self, artifact_path: str) -> Module:
+        pass
+
+
+class LocalRunner(Runner):
+
+    def __init__(self, device: tvm.runtime.Device):
+        self._device = device
+
+    @property
+    def device(self) -> Optional[tvm.runtime.Device]:
+        return self._device
+
+    def load_module(self, artifact_path: str) -> Module:
+        return tvm.runtime.load_module(artifact_path)
+
+
+class RPCRunner(Runner):
+    """
+    Measures on the device of a tvm RPC server. The server is requested from the tracker at
+    `host:port` by its `key`, or connected directly at `host:port` without a key. An existing
+    `session` (e.g. `tvm.rpc.LocalSession()`) can be given instead.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 9190,
+                 key: Optional[str] = None,
+                 priority: int = 1,
+                 session_timeout: int = 0,
+                 device_type: str = "cuda",
+                 device_id: int = 0,
+                 session: Optional[rpc.RPCSession] = None):
+        self.host = host
+        self.port = port
+        self.key = key
+        self.priority = priority
+        self.session_timeout = session_timeout
+        self.device_type = device_type
+        self.device_id = device_id
+        self._session = session
+        self._device = None
+
+    @property
+    def session(self) -> rpc.RPCSession:
+        if self._session is None:
+            if self.key is not None:
+                tracker = rpc.connect_tracker(self.host, self.port)
+                self._session = tracker.request(
+                    self.key, priority=self.priority, session_timeout=self.session_timeout)
+            else:
+                self._session = rpc.connect(
+                    self.host, self.port, session_timeout=self.session_timeout)
+            logger.info(f"Connected to the RPC server {self.key or ''}@{self.host}:{self.port}")
+        return self._session
+
+    @property
+    def device(self) -> Optional[tvm.runtime.Device]:
+        if self._device is None:
+            self._device = self.session.device(self.device_type, self.device_id)
+        return self._device
+
+    def load_module(self, artifact_path: str) -> Module:
+        # the artifacts of the build cache share their file name
+        remote_path = f"{uuid.uuid4().hex}_{os.path.basename(artifact_path)}"
+        self.session.upload(artifact_path, target=remote_path)
+        try:
+            return self.session.load_module(remote_path)
+        finally:
+            # the loaded module does not need the artifact, which would otherwise fill up
+            # the disk of the remote node over a long tuning run
+            self.session.remove(remote_path)
+
+    def close(self):
+        self._session = None
+        self._device = None
+
+
+_runner: Optional[Runner] = None
+
+
+def get_runner() -> Optional[Runner]:
+    """The runner of the fast tuning, None to measure on the local device of the arch."""
+    return _runner
+
+
+def set_runner(runner: Optional[Runner]) -> Optional[Runner]:
+    global _runner
+    _runner = runner
+    return _runner
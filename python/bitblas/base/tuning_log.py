@@ -0,0 +1,241 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Tuning log of every candidate measured by the fast tuning.
+
+Each line of the log is a json record of a candidate hint of a workload, with its build
+time and latency, or the reason why it failed. The log is used to warm start the later
+tuning of the same workload, and to skip the candidates that are known to fail with the
+current build. The log is indexed in memory and only the lines appended since the last
+query are parsed. When it grows over its size cap, it is compacted to the latest record of
+every candidate.
+"""
+import os
+import json
+import time
+import fcntl
+from dataclasses import dataclass, field, asdict
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+import tvm
+from tvm import tir
+import logging
+
+logger = logging.getLogger(__name__)
+
+BITBLAS_TUNING_LOG_PATH = os.path.expanduser("~/.cache/bitblas/tuning_log.jsonl")
+# the log is compacted when it grows over this size
+BITBLAS_TUNING_LOG_MAX_BYTES = 64 * 1024 * 1024
+
+# status of a record
+TUNING_SUCCESS = "success"
+TUNING_APPLY_ERROR = "apply_error"
+TUNING_BUILD_ERROR = "build_error"
+TUNING_BUILD_TIMEOUT = "build_timeout"
+TUNING_RUNTIME_ERROR = "runtime_error"
+
+
+def get_workload_key(func: tir.PrimFunc) -> str:
+    """The structural hash of the (specialized) func, which identifies a tuning workload."""
+    return "{:016x}".format(tvm.ir.structural_hash(func) & 0xFFFFFFFFFFFFFFFF)
+
+
+def get_hint_key(hint: Dict) -> str:
+    """Canonical representation of a serialized hint, used to compare candidates."""
+    return json.dumps(hint, sort_keys=True)
+
+
+def _get_build_fingerprint() -> Dict[str, str]:
+    from bitblas.cache import operator  # pylint: disable=import-outside-toplevel
+    return operator.get_build_fingerprint()
+
+
+@dataclass
+class TuningRecord:
+    workload: str
+    target: str
+    hint: Dict
+    status: str = TUNING_SUCCESS
+    latency: Optional[float] = None
+    build_time: Optional[float] = None
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+    # the build fingerprint (see `bitblas.cache.operator.get_build_fingerprint`) of the record
+    fingerprint: Optional[Dict[str, str]] = None
+
+
+class TuningLog:
+    """
+    Append-only json lines log of tuning records, which can be shared by processes.
+
+    The records are indexed by workload and target in memory, a query only parses the lines
+    that are appended since the previous one. The log is compacted when it grows over
+    `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = BITBLAS_TUNING_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._index: Dict[Tuple[str, str], List[TuningRecord]] = {}
+        # the inode of the indexed log and the offset of its first line that is not indexed
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    def append(self, records: List[TuningRecord]):
+        if not records:
+            return
+        fingerprint = _get_build_fingerprint()
+        for record in records:
+            if record.fingerprint is None:
+                record.fingerprint = fingerprint
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lines = "".join(json.dumps(asdict(record)) + "\n" for record in records)
+        while True:
+            with open(self.path, "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    if not self._is_current(f):
+                        # the log is replaced by a compaction while waiting for the lock
+                        continue
+                    f.write(lines)
+                    f.flush()
+                    if self.max_bytes is not None and f.tell() > self.max_bytes:
+                        self._compact_locked()
+                    return
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _is_current(self, f) -> bool:
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino
+        except OSError:
+            return False
+
+    def compact(self):
+        """Rewrites the log with the latest record of every candidate."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                self._compact_locked()
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _compact_locked(self):
+        latest: Dict[Tuple[str, str, str], TuningRecord] = {}
+        with open(self.path) as f:
+            for record in self._parse_lines(f.readlines()):
+                latest[(record.workload, record.target, get_hint_key(record.hint))] = record
+        records = sorted(latest.values(), key=lambda record: record.timestamp)
+        lines = [json.dumps(asdict(record)) + "\n" for record in records]
+        if self.max_bytes is not None:
+            # drop the oldest records, and leave room to append before the next compaction
+            budget, num_bytes = self.max_bytes // 2, sum(len(line) for line in lines)
+            while lines and num_bytes > budget:
+                num_bytes -= len(lines.pop(0))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".staging_", dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.writelines(lines)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Compacted the tuning log {self.path} to {len(lines)} records")
+
+    @staticmethod
+    def _parse_lines(lines) -> List[TuningRecord]:
+        records = []
+        for line in lines:
+            try:
+                records.append(TuningRecord(**json.loads(line)))
+            except (ValueError, TypeError):
+                # skip the lines that are truncated by an interrupted writer
+                continue
+        return records
+
+    def _refresh(self):
+        """Indexes the lines that are appended since the last refresh."""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            self._index, self._inode, self._offset = {}, None, 0
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # the log is new, or it is replaced by a compaction
+                self._index, self._inode, self._offset = {}, stat.st_ino, 0
+            f.seek(self._offset)
+            data = f.read()
+        # a line without its newline is still being written, it is parsed by a later refresh
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        lines = data[:end].decode(errors="replace").splitlines()
+        for record in self._parse_lines(lines):
+            self._index.setdefault((record.workload, record.target), []).append(record)
+
+    def load(self,
+             workload: Optional[str] = None,
+             target: Optional[str] = None) -> List[TuningRecord]:
+        self._refresh()
+        records = []
+        for (record_workload, record_target), indexed in self._index.items():
+            if workload is not None and record_workload != workload:
+                continue
+            if target is not None and record_target != target:
+                continue
+            records.extend(indexed)
+        return records
+
+    def get_failed_hints(self, workload: str, target: str) -> Set[str]:
+        """
+        The keys of the hints that failed to be applied or built for the workload with the
+        current build, the hints that failed with another build are tried again.
+        """
+        fingerprint = _get_build_fingerprint()
+        return {
+            get_hint_key(record.hint)
+            for record in self._get_latest_records(workload, target).values()
+            if record.status in (TUNING_APPLY_ERROR, TUNING_BUILD_ERROR) and
+            record.fingerprint == fingerprint
+        }
+
+    def _get_latest_records(self, workload: str, target: str) -> Dict[str, TuningRecord]:
+        # a candidate that is re-measured is recorded again, the latest record is kept
+        latest: Dict[str, TuningRecord] = {}
+        for record in self.load(workload, target):
+            latest[get_hint_key(record.hint)] = record
+        return latest
+
+    def get_measured_hints(self, workload: str, target: str) -> Set[str]:
+        """The keys of the hints of the workload that are measured successfully."""
+        return {
+            key for key, record in self._get_latest_records(workload, target).items()
+            if record.status == TUNING_SUCCESS and record.latency is not None
+        }
+
+    def get_best_hints(self, workload: str, target: str, topk: int = 3) -> List[Dict]:
+        """The measured hints of the workload with the lowest latency first."""
+        measured = [
+            record for record in self._get_latest_records(workload, target).values()
+            if record.status == TUNING_SUCCESS and record.latency is not None
+        ]
+        measured.sort(key=lambda record: record.latency)
+        return [record.hint for record in measured[:topk]]
+
+
+_tuning_log: Optional[TuningLog] = TuningLog(BITBLAS_TUNING_LOG_PATH)
+
+
+def get_tuning_log() -> Optional[TuningLog]:
+    return _tuning_log
+
+
+def set_tuning_log_path(path: Optional[str]) -> Optional[TuningLog]:
+    """Sets the path of the global tuning log, the log is disabled when the path is None."""
+    global _tuning_log
+    _tuning_log = TuningLog(path) if path is not None else None
+    return _tuning_log
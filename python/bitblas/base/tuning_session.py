@@ -0,0 +1,270 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Tuning session of many workloads, e.g. all the matmuls of a model.
+
+The workloads of a session share one persistent build pool, so that the worker processes
+are only forked once, and are measured one after another on the device, so that the
+measurements of different workloads never overlap. Identical workloads are only tuned once.
+
+A session can be bounded by a wall clock and a candidate budget, which are distributed to
+the workloads by their expected benefit, and can be resumed from a checkpoint: the
+finished workloads are stored in the checkpoint, and every measured candidate of the
+unfinished ones is in the tuning log (see `bitblas.base.tuning_log`).
+"""
+import os
+import json
+import time
+from hashlib import sha256
+from typing import Dict, List, Optional, Tuple, Union
+from tqdm import tqdm
+from tvm import tir
+from tvm.target import Target
+from tvm.contrib.popen_pool import PopenPoolExecutor
+from .utils import fast_tune, CompileResult
+from .tuning_log import get_workload_key, get_tuning_log
+from .roller.hint import Hint
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TuningSession:
+    """
+    Tunes a list of PrimFuncs or operator configs (e.g. `MatmulConfig`) with a shared
+    build pool.
+
+    Usage:
+
+        with TuningSession(target, topk=20, time_budget=600,
+                           checkpoint_path="tuning_session.json") as session:
+            for config in configs:
+                session.add(config)
+            results = session.run()
+
+    The result of a PrimFunc is the best `CompileResult` of its candidates, the result of
+    an operator config is the tuned operator.
+    """
+
+    def __init__(self,
+                 target: Union[str, Target],
+                 topk: int = 20,
+                 max_workers: int = 10,
+                 show_progress: bool = True,
+                 time_budget: Optional[float] = None,
+                 candidate_budget: Optional[int] = None,
+                 checkpoint_path: Optional[str] = None):
+        # the arch of a target string is used by the database, as by `bitblas.Linear`
+        self.database_target = target if isinstance(target, str) else None
+        if isinstance(target, str):
+            target = Target(target)
+        self.target = target
+        self.topk = topk
+        self.max_workers = max_workers
+        self.show_progress = show_progress
+        # the wall clock budget in seconds and the number of candidates of the session
+        self.time_budget = time_budget
+        self.candidate_budget = candidate_budget
+        self.checkpoint_path = checkpoint_path
+        self._builder: Optional[PopenPoolExecutor] = None
+        # the unique workloads of the session, and the task of every added workload
+        self._tasks: Dict[Tuple[str, str], object] = {}
+        self._weights: Dict[Tuple[str, str], float] = {}
+        self._workloads: List[Tuple[str, str]] = []
+        self._results: Dict[Tuple[str, str], object] = {}
+        # the state of the session that is restored from the checkpoint
+        self._finished: Dict[str, Dict[str, Dict]] = {}
+        self._elapsed = 0.0
+        self._used_candidates = 0
+        self._load_checkpoint()
+
+    @property
+    def builder(self) -> PopenPoolExecutor:
+        if self._builder is None:
+            self._builder = PopenPoolExecutor(max_workers=self.max_workers)
+        return self._builder
+
+    @staticmethod
+    def _get_task_key(task) -> Tuple[str, str]:
+        if isinstance(task, tir.PrimFunc):
+            return ("func", get_workload_key(task))
+        # operator configs are dataclasses, equal configs have the same repr
+        return (type(task).__name__, repr(task))
+
+    @staticmethod
+    def _get_checkpoint_key(key: Tuple[str, str]) -> str:
+        return f"{key[0]}:{sha256(key[1].encode()).hexdigest()[:16]}"
+
+    @staticmethod
+    def _estimate_weight(task) -> float:
+        """The expected benefit of tuning a workload, the flops of a matmul config."""
+        if all(hasattr(task, axis) for axis in ("M", "N", "K")):
+            M = max(task.M) if isinstance(task.M, (list, tuple)) else task.M
+            return float(2 * M * task.N * task.K)
+        return 1.0
+
+    def add(self, task, weight: Optional[float] = None) -> int:
+        """
+        Adds a PrimFunc or an operator config, returns its index in the results. The
+        `weight` is the expected benefit of tuning it, e.g. its share of the model latency,
+        which defaults to the flops of a matmul config.
+        """
+        key = self._get_task_key(task)
+        if key not in self._tasks:
+            self._tasks[key] = task
+            self._weights[key] = weight if weight is not None else self._estimate_weight(task)
+        else:
+            logger.debug(f"Skip the tuning of a duplicated workload {key[0]}")
+        self._workloads.append(key)
+        return len(self._workloads) - 1
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load the tuning checkpoint {self.checkpoint_path}: {e}")
+            return
+        self._finished = checkpoint.get("finished", {})
+        self._elapsed = checkpoint.get("elapsed", 0.0)
+        self._used_candidates = checkpoint.get("used_candidates", 0)
+        logger.info(f"Resume the tuning session with {len(self._finished)} finished workloads")
+
+    def _save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        checkpoint = {
+            "finished": self._finished,
+            "elapsed": self._elapsed,
+            "used_candidates": self._used_candidates,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _get_budget(self, key: Tuple[str, str], todo: List[Tuple[str, str]],
+                    start: float) -> Tuple[int, Optional[float]]:
+        """The topk and the deadline of a workload, its share of the remaining budget."""
+        share = self._weights[key] / (sum(self._weights[k] for k in todo) or 1.0)
+        topk = self.topk
+        if self.candidate_budget is not None:
+            remaining = self.candidate_budget - self._used_candidates
+            topk = min(topk, max(int(round(remaining * share)), 1))
+        deadline = None
+        if self.time_budget is not None:
+            remaining = self.time_budget - self._elapsed - (time.time() - start)
+            deadline = time.time() + max(remaining, 0.0) * share
+        return topk, deadline
+
+    def _tune_func(self, func: tir.PrimFunc, topk: int, deadline: Optional[float],
+                   configs: Optional[Dict[str, List[Hint]]]) -> Optional[CompileResult]:
+        _, best = fast_tune(
+            func,
+            self.target,
+            topk=topk,
+            configs=configs.get("") if configs is not None else None,
+            builder=self.builder,
+            skip_measured=True,
+            deadline=deadline)
+        return best
+
+    def _tune_config(self, config, topk: int, deadline: Optional[float],
+                     configs: Optional[Dict[str, List[Hint]]]):
+        from bitblas.cache import (  # pylint: disable=import-outside-toplevel
+            global_operator_cache, get_database_path,
+        )
+        from bitblas.ops.general_matmul import (  # pylint: disable=import-outside-toplevel
+            MatmulConfig, Matmul,
+        )
+
+        if not isinstance(config, MatmulConfig):
+            raise ValueError(f"Unsupported workload {type(config).__name__} of a tuning session")
+        # operators that are already tuned in the global cache or the database are reused
+        if global_operator_cache.size() == 0:
+            global_operator_cache.load_from_database(get_database_path(), self.database_target)
+        cached = global_operator_cache.get(config)
+        if cached is not None:
+            return cached
+        operator = Matmul(config, target=self.target, enable_tuning=False)
+        operator.hardware_aware_finetune(
+            topk=topk,
+            target=self.target,
+            configs=configs,
+            builder=self.builder,
+            skip_measured=True,
+            deadline=deadline)
+        if operator.optimized_func is not None:
+            # the tuned operator is reused by the later sessions and by `bitblas.Linear`
+            global_operator_cache.add(config, operator)
+            global_operator_cache.flush(get_database_path(), self.database_target)
+        return operator
+
+    def run(self) -> List:
+        """
+        Tunes the workloads that are not tuned yet, returns the results in the order of `add`.
+
+        The workloads that are finished in the checkpoint only build their tuned hints again.
+        """
+        if self.checkpoint_path is not None and get_tuning_log() is None:
+            logger.warning("The tuning log is disabled, an unfinished workload can not resume")
+        todo = [key for key in self._tasks if key not in self._results]
+        start = time.time()
+        progress = tqdm(total=len(todo), desc="Tuning session", disable=not self.show_progress)
+        try:
+            for key in list(todo):
+                task = self._tasks[key]
+                checkpoint_key = self._get_checkpoint_key(key)
+                configs = None
+                if self._finished.get(checkpoint_key):
+                    topk, deadline = 1, None
+                    configs = {
+                        k: [Hint.deserialize(hint)]
+                        for k, hint in self._finished[checkpoint_key].items()
+                    }
+                else:
+                    topk, deadline = self._get_budget(key, todo, start)
+                progress.set_postfix_str(key[0])
+                try:
+                    if isinstance(task, tir.PrimFunc):
+                        result = self._tune_func(task, topk, deadline, configs)
+                        tuned_configs = {"": result.config} if result is not None else {}
+                    else:
+                        result = self._tune_config(task, topk, deadline, configs)
+                        tuned_configs = result.tuned_configs
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(f"Failed to tune the workload {key[0]}: {e}")
+                    result, tuned_configs = None, {}
+                self._results[key] = result
+                todo.remove(key)
+                if not configs:
+                    # the measured candidates of a workload are already in the tuning log,
+                    # a failed workload is not finished and is tuned again with its budget
+                    if tuned_configs:
+                        self._used_candidates += topk
+                        self._finished[checkpoint_key] = {
+                            k: hint.serialize() for k, hint in tuned_configs.items()
+                        }
+                    self._elapsed += time.time() - start
+                    start = time.time()
+                    self._save_checkpoint()
+                progress.update(1)
+        finally:
+            progress.close()
+        return [self._results.get(key) for key in self._workloads]
+
+    def close(self):
+        # the workers of the pool are killed when it is released
+        self._builder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,10 +3,11 @@
 
 import tvm
 import os
-from tvm.contrib.popen_pool import PopenPoolExecutor, StatusKind
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from tvm.contrib.popen_pool import PopenPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from collections import deque
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Union, Literal
+from typing import List, Tuple, Optional, Dict, Union, Literal, Deque
 from tvm import tir, IRModule
 from tvm.runtime import Module
 from tvm.tir import Schedule
@@ -15,9 +16,28 @@ import bitblas
 from .analysis import get_root_block, get_reduction_blocks, find_var_from_func
 from bitblas.base.roller.arch import CUDA
 from bitblas.base.roller.policy import TensorCorePolicy, DefaultPolicy
+from bitblas.base.roller.hint import Hint
+from .cost_model import HintCostModel
+from .build_cache import BuildCache, get_build_cache, get_build_key
+from .runner import Runner, LocalRunner, get_runner
+from .measure import MeasureOption, measure_latency, get_rotating_buffers, get_num_rotating_buffers
+from .tuning_log import (
+    TuningLog,
+    TuningRecord,
+    get_tuning_log,
+    get_workload_key,
+    get_hint_key,
+    TUNING_SUCCESS,
+    TUNING_APPLY_ERROR,
+    TUNING_BUILD_ERROR,
+    TUNING_BUILD_TIMEOUT,
+    TUNING_RUNTIME_ERROR,
+)
 from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
 import tempfile
 import itertools
+import time
+from dataclasses import replace
 from tvm.ir.supply import GlobalVarSupply
 from bitblas.utils import tensor_replace_dp4a
 import logging
@@ -51,12 +71,76 @@ class CompileResult:
         self.mod = mod
         self.code = mod.imported_modules[0].get_source() if mod else None
         self.latency = 1e9
+        self.build_time = None
         self.profile_tensors = []
         self.time_evaluator = None
+        self.device = None
+        self.measure_option: Optional[MeasureOption] = None
+
+    def profile(self, measure_option: Optional[MeasureOption] = None) -> float:
+        """The median latency in ms."""
+        if self.device is None:
+            return self.time_evaluator(*self.profile_tensors).mean * 1e3
+        return measure_latency(self.mod, self.profile_tensors, self.device, measure_option or
+                               self.measure_option).median
+
+    def profile_samples(self, repeat: int, device) -> List[float]:
+        """Runs the kernel `repeat` times, returns the latency of each run in ms."""
+        option = replace(self.measure_option or MeasureOption(), number=1, repeat=repeat,
+                         warmup=0, max_retries=0)
+        return measure_latency(self.mod, self.profile_tensors, device, option).samples
+
+
+def _confidence_interval(samples: List[float], z: float = 1.96) -> Tuple[float, float]:
+    """The (lower, upper) bound of the confidence interval of the mean latency."""
+    mean = float(np.mean(samples))
+    if len(samples) < 2:
+        return mean, float("inf")
+    half_width = z * float(np.std(samples, ddof=1)) / np.sqrt(len(samples))
+    return mean - half_width, mean + half_width
+
+
+def successive_halving(cpresults: List[CompileResult],
+                       device,
+                       num_repeats: int = 3,
+                       max_rounds: int = 4,
+                       z: float = 1.96) -> List[CompileResult]:
+    """
+    Re-measures the leaders of the candidates that were measured with a single run.
+
+    Every round keeps the faster half of the candidates (at least two of them), measures
+    them with twice the repeats of the last round, and drops the ones whose confidence
+    interval is above the interval of the best one. It stops once the interval of the best
+    candidate is separated from all the others, or after `max_rounds`. The latency of the
+    re-measured candidates is the mean of all their samples.
 
-    def profile(self):
-        profile_tensors = self.profile_tensors
-        return self.time_evaluator(*profile_tensors).mean * 1e3
+    Returns the candidates that survived the last round, the fastest first.
+    """
+    samples: Dict[CompileResult, List[float]] = {}
+    candidates = sorted((c for c in cpresults if c.latency < 1e9), key=lambda c: c.latency)
+    repeat = num_repeats
+    for _ in range(max_rounds):
+        # the last two candidates are only separated by their confidence intervals
+        candidates = candidates[:max(2, (len(candidates) + 1) // 2)]
+        for cpresult in list(candidates):
+            try:
+                samples.setdefault(cpresult, []).extend(cpresult.profile_samples(repeat, device))
+            except Exception as e_mesg:  # pylint: disable=broad-except
+                logger.debug(f"Re-measurement of config {cpresult.config} failed: {e_mesg}")
+                cpresult.latency = 1e9
+                candidates.remove(cpresult)
+                continue
+            cpresult.latency = float(np.mean(samples[cpresult]))
+        candidates.sort(key=lambda c: c.latency)
+        if len(candidates) <= 1:
+            break
+        intervals = {c: _confidence_interval(samples[c], z) for c in candidates}
+        best_upper = intervals[candidates[0]][1]
+        candidates = [candidates[0]] + [c for c in candidates[1:] if intervals[c][0] <= best_upper]
+        if len(candidates) == 1:
+            break
+        repeat *= 2
+    return candidates
 
 
 def _apply_config(
@@ -157,35 +241,94 @@ def apply_and_build_parallel(func,
                              arch,
                              num_repeats=3,
                              max_workers=10,
-                             data_distribution="uniform") -> CompileResult:
-    cpresults = []
+                             data_distribution="uniform",
+                             tuning_log: Optional[TuningLog] = None,
+                             builder: Optional[PopenPoolExecutor] = None,
+                             early_stop: bool = True,
+                             build_cache: Optional[BuildCache] = None,
+                             deadline: Optional[float] = None,
+                             measure_option: Optional[MeasureOption] = None,
+                             runner: Optional[Runner] = None) -> CompileResult:
+    """
+    Applies, builds and measures the configs in a streaming pipeline: a config is built
+    as soon as its schedule is applied, and measured as soon as it is built, so that the
+    measurement on the device overlaps with the compilation of the other configs.
+
+    The number of configs in flight between the stages is bounded by `2 * max_workers`.
+    A `builder` pool can be shared by the tuning of many funcs (see `TuningSession`),
+    otherwise a pool is created for this call.
+
+    With `early_stop`, every candidate is measured with a single run when it is built,
+    and only the leaders are re-measured with more repeats by `successive_halving`,
+    instead of measuring every candidate with `num_repeats` runs.
+
+    The scheduled modules that are found in the `build_cache` are not built again, and
+    the newly built ones are stored into it by the build workers.
+
+    The record of a candidate is appended to the `tuning_log` as soon as it is measured
+    (or fails), so an interrupted tuning can resume from the log. Once the `deadline`
+    (in seconds since the epoch) is passed and a candidate has been measured, no new
+    candidate is started.
+
+    The candidates are measured by `measure_latency` with the `measure_option`, whose
+    `number` is overridden by the single run of `early_stop` or by `num_repeats`. With
+    `cold_cache`, the rotating buffer sets are created once and shared by the candidates.
 
-    profile_tensors = get_dummy_input_arrays(func, arch.device, distribution=data_distribution)
+    The built candidates are loaded and measured by the `runner`, e.g. on a remote GPU
+    (see `bitblas.base.runner`), by default on the device of the arch.
+    """
+    if runner is None:
+        runner = LocalRunner(arch.device)
+    device = runner.device
+    if device is None:
+        raise RuntimeError(f"Cannot measure the candidates without a device of {arch.target}")
+    cpresults = []
+    # the index of the config of every compile result
+    cpresult_indices: Dict[CompileResult, int] = {}
+
+    profile_tensors = get_dummy_input_arrays(func, device, distribution=data_distribution)
+    measure_option = replace(
+        measure_option or MeasureOption(), number=1 if early_stop else num_repeats, repeat=1)
+    if measure_option.l2_cache_bytes is None:
+        measure_option.l2_cache_bytes = getattr(arch, "l2_cache_size_bytes", None)
+    if measure_option.cold_cache:
+        profile_tensors = get_rotating_buffers(
+            profile_tensors,
+            get_num_rotating_buffers(profile_tensors, measure_option.l2_cache_bytes))
     max_workers = min(len(configs), os.cpu_count(), max_workers)
+    queue_size = 2 * max_workers
 
-    # apply config in thread parallel
-    _sched: List[Schedule] = []
+    # one record of every candidate config, persisted into the tuning log
+    workload = get_workload_key(func) if tuning_log is not None else None
+    records: List[TuningRecord] = [
+        TuningRecord(workload=workload, target=str(arch.target), hint=config.serialize())
+        for config in configs
+    ]
 
-    def _apply_schedule(f, c):
+    # apply config in thread parallel
+    def _apply_schedule(idx, f, c):
         try:
             sch = _apply_config(f, c)
+            if sch is None:
+                records[idx].error = "No schedule rule can be applied"
         except Exception as apply_schedule_error:
             logger.debug("Apply schedule failed: {}".format(apply_schedule_error))
+            records[idx].error = str(apply_schedule_error)
             sch = None
+        if sch is None:
+            records[idx].status = TUNING_APPLY_ERROR
         return sch
 
-    with ThreadPoolExecutor(max_workers=4) as scheduler:
-        futures = {scheduler.submit(_apply_schedule, func, config) for config in configs}
-        for future in as_completed(futures):
-            _sched.append(future.result())
+    build_cache_path = build_cache.path if build_cache is not None else None
 
-    builder = PopenPoolExecutor(max_workers=max_workers)
+    def _get_pass_context(config):
+        return {"tir.use_async_copy": True, **config.pass_context}
 
     # build in process parallel
-    def _build(context) -> str:
-        idx, mod, arch = context
+    def _build(context) -> Tuple[int, Optional[str], Optional[str], Optional[float]]:
+        idx, mod, arch, key = context
         if mod is None:
-            return idx, None, None
+            return idx, None, None, None
         # TODO(lei):
         # this is a trick to implement rasteration, will be removed in the future
         config = configs[idx]
@@ -195,63 +338,139 @@ def apply_and_build_parallel(func,
             code = tensor_replace_dp4a(code)
             return code
 
-        with tvm.transform.PassContext(config={"tir.use_async_copy": True, **config.pass_context}):
+        start = time.time()
+        with tvm.transform.PassContext(config=_get_pass_context(config)):
             rt_mod = tvm.build(mod, target=arch.target)
+        build_time = time.time() - start
 
         from tvm.contrib.tar import tar  # pylint: disable=import-outside-toplevel
 
         artifact_path = os.path.join(tempfile.mkdtemp(), "tvm_tmp_mod." + tar.output_format)
         code = rt_mod.imported_modules[0].get_source()
         rt_mod.export_library(artifact_path, fcompile=tar)
-        return idx, code, artifact_path
+        if key is not None:
+            artifact_path = BuildCache(build_cache_path).put(key, artifact_path, code, build_time)
+        return idx, code, artifact_path, build_time
+
+    def _checkpoint(idx):
+        if tuning_log is None:
+            return
+        try:
+            tuning_log.append([records[idx]])
+        except OSError as e:
+            logger.warning(f"Failed to write the tuning log {tuning_log.path}: {e}")
 
-    _mods = [sch.mod if sch is not None else None for sch in _sched]
+    # measure on the device in the main thread, while the other configs are built
+    def _load_and_measure(idx, sch, build_future):
+        _measure_candidate(idx, sch, build_future)
+        _checkpoint(idx)
 
-    for map_result in builder.map_with_error_catching(
-            _build,
-        [(i, mod, arch) for i, mod in enumerate(_mods)],
-    ):
-        if map_result.status == StatusKind.TIMEOUT:
+    def _measure_candidate(idx, sch, build_future):
+        try:
+            idx, code, artifact_path, build_time = build_future.result()
+        except TimeoutError:
             logger.debug("LocalBuilder: Timeout")
-        elif map_result.status == StatusKind.EXCEPTION:
+            records[idx].status = TUNING_BUILD_TIMEOUT
+            return
+        except Exception as build_error:  # pylint: disable=broad-except
             # TODO(lei): redirect the exception to file if needed
-            logger.debug("LocalBuilder: An exception occurred {}".format(map_result.value))
-            continue
-        elif map_result.status == StatusKind.COMPLETE:
-            idx, code, artifact_path = map_result.value
-            if artifact_path is None:
-                logger.debug("Artifact path is None")
-                continue
-            sch = _sched[idx]
-            config = configs[idx]
-            rt_mod = tvm.runtime.load_module(artifact_path)
-            cpresult = CompileResult(config, sch, rt_mod)
-            timer_cuda_mod = rt_mod.time_evaluator(
-                rt_mod.entry_name, arch.device, number=num_repeats)
-            cpresult.profile_tensors = profile_tensors
-            cpresult.time_evaluator = timer_cuda_mod
-            cpresult.code = code
-            cpresults.append(cpresult)
-        else:
-            raise ValueError(f"Unreachable: unexpected result: {map_result}")
-
-    del builder
-
-    best = None
-    best_latency = 1e9
-    for cpresult in cpresults:
-        config = cpresult.config
+            logger.debug("LocalBuilder: An exception occurred {}".format(build_error))
+            records[idx].status = TUNING_BUILD_ERROR
+            records[idx].error = str(build_error)
+            return
+        if artifact_path is None:
+            logger.debug("Artifact path is None")
+            return
+        records[idx].build_time = build_time
+        config = configs[idx]
+        rt_mod = runner.load_module(artifact_path)
+        cpresult = CompileResult(config, sch, rt_mod)
+        timer_cuda_mod = rt_mod.time_evaluator(
+            rt_mod.entry_name, device, number=1 if early_stop else num_repeats)
+        cpresult.profile_tensors = profile_tensors
+        cpresult.time_evaluator = timer_cuda_mod
+        cpresult.device = device
+        cpresult.measure_option = measure_option
+        cpresult.code = code
+        cpresult.build_time = build_time
+        cpresults.append(cpresult)
+        cpresult_indices[cpresult] = idx
         try:
             latency = cpresult.profile()
         except Exception as e_mesg:
             logger.debug("Evaluation with config failed: ", e_mesg)
-            continue
+            records[idx].status = TUNING_RUNTIME_ERROR
+            records[idx].error = str(e_mesg)
+            return
         logger.info("Evaluation with config {}".format(config))
         logger.info("Time cost of this config: {:.3f} ms".format(latency))
-
         cpresult.latency = latency
-        if latency < best_latency:
-            best_latency = latency
+        records[idx].latency = latency
+
+    owns_builder = builder is None
+    if owns_builder:
+        builder = PopenPoolExecutor(max_workers=max_workers)
+    pending: Deque[int] = deque(range(len(configs)))
+    # configs whose schedule is applied, waiting for a build worker
+    scheduled: Deque[Tuple[int, Schedule]] = deque()
+    applying: Dict[Future, int] = {}
+    building: Dict[Future, Tuple[int, Schedule]] = {}
+    with ThreadPoolExecutor(max_workers=4) as scheduler:
+        while pending or scheduled or applying or building:
+            if (deadline is not None and pending and time.time() > deadline and
+                    any(cpresult.latency < 1e9 for cpresult in cpresults)):
+                logger.info(f"Tuning deadline is reached, skip {len(pending)} configs")
+                pending.clear()
+            while pending and len(applying) + len(scheduled) < queue_size:
+                idx = pending.popleft()
+                applying[scheduler.submit(_apply_schedule, idx, func, configs[idx])] = idx
+            while scheduled and len(building) < queue_size:
+                idx, sch = scheduled.popleft()
+                key, cached = None, None
+                if build_cache is not None:
+                    key = get_build_key(sch.mod, arch.target, _get_pass_context(configs[idx]))
+                    cached = build_cache.get(key)
+                if cached is not None:
+                    artifact_path, code, build_time = cached
+                    future = Future()
+                    future.set_result((idx, code, artifact_path, build_time))
+                else:
+                    future = builder.submit(_build, (idx, sch.mod, arch, key))
+                building[future] = (idx, sch)
+            done, _ = wait(list(applying) + list(building), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in applying:
+                    idx = applying.pop(future)
+                    sch = future.result()
+                    if sch is not None:
+                        scheduled.append((idx, sch))
+                    else:
+                        _checkpoint(idx)
+                else:
+                    idx, sch = building.pop(future)
+                    _load_and_measure(idx, sch, future)
+
+    if owns_builder:
+        del builder
+
+    if early_stop:
+        single_run_latencies = {cpresult: cpresult.latency for cpresult in cpresults}
+        successive_halving(cpresults, device, num_repeats)
+        for cpresult, idx in cpresult_indices.items():
+            if cpresult.latency == single_run_latencies[cpresult]:
+                continue
+            # the re-measured candidates are recorded again with their final latency
+            if cpresult.latency >= 1e9 and records[idx].status == TUNING_SUCCESS:
+                records[idx].status = TUNING_RUNTIME_ERROR
+            records[idx].latency = cpresult.latency if cpresult.latency < 1e9 else None
+            records[idx].timestamp = time.time()
+            _checkpoint(idx)
+
+    best = None
+    best_latency = 1e9
+    for cpresult in cpresults:
+        if cpresult.latency < best_latency:
+            best_latency = cpresult.latency
             best = cpresult
 
     return cpresults, best
@@ -263,10 +482,26 @@ def apply_and_build(
     arch,
     parallel_build=False,
     data_distribution="uniform",
+    tuning_log: Optional[TuningLog] = None,
+    builder: Optional[PopenPoolExecutor] = None,
+    build_cache: Optional[BuildCache] = None,
+    deadline: Optional[float] = None,
+    measure_option: Optional[MeasureOption] = None,
+    runner: Optional[Runner] = None,
 ) -> Tuple[List[CompileResult], CompileResult]:
     max_workers = 10 if parallel_build else 1
     return apply_and_build_parallel(
-        func, configs, arch, max_workers=max_workers, data_distribution=data_distribution)
+        func,
+        configs,
+        arch,
+        max_workers=max_workers,
+        data_distribution=data_distribution,
+        tuning_log=tuning_log,
+        builder=builder,
+        build_cache=build_cache,
+        deadline=deadline,
+        measure_option=measure_option,
+        runner=runner)
 
 
 def fast_tune(
@@ -275,7 +510,40 @@ def fast_tune(
     topk: int = 10,
     parallel_build: bool = True,
     data_distribution: Literal["uniform", "onefill"] = "uniform",
+    configs: Optional[List[Hint]] = None,
+    builder: Optional[PopenPoolExecutor] = None,
+    cost_model: Optional[HintCostModel] = None,
+    cost_model_topk: int = 5,
+    skip_measured: bool = False,
+    deadline: Optional[float] = None,
+    measure_option: Optional[MeasureOption] = None,
+    runner: Optional[Runner] = None,
+    allow_split_k: bool = True,
 ):
+    """
+    Tunes the func with the topk configs emitted by the roller policy. When `configs` is
+    given (e.g. the tuned hints of similar operators or of another arch), they are
+    legalized and ranked by the policy instead, and only the topk legal ones are measured.
+
+    Every candidate is recorded into the global tuning log (see `bitblas.base.tuning_log`),
+    the best logged hints of the same workload are measured again together with the
+    candidates of the policy, and the candidates that failed to build before are skipped.
+
+    The built candidates are shared by the tunings through the global build cache (see
+    `bitblas.base.build_cache`). With a trained `cost_model`, only the `cost_model_topk`
+    candidates with the lowest predicted latency are built and measured.
+
+    With `skip_measured`, the candidates that are already measured in the tuning log are
+    not measured again except the best ones, which resumes an interrupted tuning. No new
+    candidate is started after the `deadline` (see `apply_and_build_parallel`). The
+    candidates are measured with the `measure_option`, e.g. with a cold L2 cache, by the
+    `runner`, which defaults to the global runner (see `bitblas.base.runner.set_runner`),
+    so a host without a GPU can tune for the GPU of a remote runner.
+
+    A split-k hint lowers to two kernels, the partial matmul and its fixup, which can only
+    run through the runtime module. `allow_split_k=False` drops them for the operators that
+    are launched by the single kernel C wrapper (see `bitblas.wrapper.CUDASourceWrapper`).
+    """
     # check the function is a primfunc
     if not isinstance(func, tir.PrimFunc):
         raise ValueError("Only support func is PrimFunc") # pragma: no cover
@@ -291,25 +559,24 @@ def fast_tune(
         if not all([isinstance(v.value, int) for v in opt_shapes.values()]):
             logger.error("The opt_shapes should be int value")
             return None, None
-        # currently only support one dynamic range
-        if len(opt_shapes) > 1:
-            logger.error("Currently only support one dynamic range")
-            return None, None
-
         for buffer in func.buffer_map.values():
             for axis in buffer.shape:
                 if isinstance(axis, tvm.tir.Var) and axis.name not in opt_shapes:
                     raise NotImplementedError(
                         "Currently do not support fast tune with none-dynamic range set")
         if opt_shapes:
+            specialize_map = {}
             for name, shape in opt_shapes.items():
                 var = find_var_from_func(func, name)
-                specilized_func = func.specialize({
-                    var: shape.astype(var.dtype)
-                }).with_attr("is_specialized")
+                specialize_map[var] = shape.astype(var.dtype)
+            specilized_func = func.specialize(specialize_map).with_attr("is_specialized")
 
     arch = CUDA(target)
 
+    tuning_log = get_tuning_log()
+    workload, target_str = get_workload_key(func), str(arch.target)
+    opt_shapes = (
+        func.attrs["opt_shapes"] if func.attrs is not None and "opt_shapes" in func.attrs else None)
     policy = DefaultPolicy(func=func, arch=arch)
     try:
         specilized_func, tags = get_tensorized_func_and_tags(specilized_func, arch.target)
@@ -318,14 +585,72 @@ def fast_tune(
         tags = None
     if tags:
         policy = TensorCorePolicy(func=specilized_func, arch=arch, tags=tags)
-
-    configs = policy.emit_config(topk)
+        if not allow_split_k:
+            policy.max_split_k_factor = 1
+
+    if configs is not None:
+        for config in configs:
+            config.arch = arch
+            config.opt_shapes = opt_shapes
+        # the configs may be tuned for other shapes or archs, only measure the legal ones
+        configs = policy.legalize_configs(configs, topk)
+    else:
+        configs = policy.emit_config(topk)
+
+        if tuning_log is not None:
+            # warm start from the best hints of the previous tuning runs
+            emitted = {get_hint_key(config.serialize()) for config in configs}
+            for hint in tuning_log.get_best_hints(workload, target_str):
+                if not allow_split_k and hint.get("split_k_factor", 1) > 1:
+                    continue
+                if get_hint_key(hint) not in emitted:
+                    config = Hint.deserialize(hint, arch=arch)
+                    config.opt_shapes = opt_shapes
+                    configs.append(config)
+
+    # the same hint may be emitted or given more than once
+    unique_configs: Dict[str, Hint] = {}
+    for config in configs:
+        unique_configs.setdefault(get_hint_key(config.serialize()), config)
+    configs = list(unique_configs.values())
+
+    if tuning_log is not None:
+        failed_hints = tuning_log.get_failed_hints(workload, target_str)
+        if failed_hints:
+            num_configs = len(configs)
+            configs = [
+                config for config in configs
+                if get_hint_key(config.serialize()) not in failed_hints
+            ]
+            logger.info(f"Skip {num_configs - len(configs)} configs that failed to build before")
+
+    if skip_measured and tuning_log is not None:
+        measured_hints = tuning_log.get_measured_hints(workload, target_str)
+        best_hints = {
+            get_hint_key(hint) for hint in tuning_log.get_best_hints(workload, target_str)
+        }
+        configs = [
+            config for config in configs
+            if get_hint_key(config.serialize()) not in measured_hints - best_hints
+        ]
+
+    if cost_model is not None:
+        configs = cost_model.prune(configs, cost_model_topk)
+
+    if not configs:
+        return [], None
     cpresults, best = apply_and_build(
         func,
         configs,
         arch,
         parallel_build=parallel_build,
         data_distribution=data_distribution,
+        tuning_log=tuning_log,
+        builder=builder,
+        build_cache=get_build_cache(),
+        deadline=deadline,
+        measure_option=measure_option,
+        runner=runner or get_runner(),
     )
 
     return cpresults, best
@@ -374,6 +699,17 @@ def refactor_specialized_func(g_var, func, params, buffers_to_declare):
     return global_symbol, device_func
 
 
+def get_dispatch_bounds(func: tir.PrimFunc) -> Dict[str, int]:
+    """
+    The upper bound of each dynamic symbolic that is dispatched to the specialized func,
+    which is the measured crossover point of "dispatch_bounds" or the opt_shapes.
+    """
+    bounds = {str(k): int(v) for k, v in func.attrs["opt_shapes"].items()}
+    if "dispatch_bounds" in func.attrs:
+        bounds.update({str(k): int(v) for k, v in func.attrs["dispatch_bounds"].items()})
+    return bounds
+
+
 def create_dispatch_func(g_var: str, func: tir.PrimFunc, refactored_funcs: List[str]):
     global_symbol = g_var
     attrs = func.attrs
@@ -394,29 +730,39 @@ def create_dispatch_func(g_var: str, func: tir.PrimFunc, refactored_funcs: List[
         _invoke_params.append(buffer.data)
     _invoke_params += list(dyn_symbolic)
 
-    func_range: List[int] = []
-    global_symbols = []
-    for g_var, refactor_func in refactored_funcs:
-        opt_shapes = refactor_func.attrs["opt_shapes"]
-        func_range.append(list(opt_shapes.values())[0])
-        global_symbols.append(g_var)
-
-    # TODO(lei): general the dispatch function to support multiple dynamic symbolics
-    assert len(dyn_symbolic) == 1, "Only support one dynamic symbolics currently"
+    dispatch_items = [(get_dispatch_bounds(refactor_func), g_var)
+                      for g_var, refactor_func in refactored_funcs]
+
+    def _emit_dispatch(ib, symbolics: List[tvm.tir.Var], items):
+        # dispatch on the first symbolic by the ranges between the upper bounds of its
+        # specializations, and on the remaining symbolics within each range
+        syb = symbolics[0]
+        bounds = sorted({bounds[syb.name] for bounds, _ in items})
+        for i, bound in enumerate(bounds):
+            sub_items = [item for item in items if item[0][syb.name] == bound]
+            if len(bounds) == 1:
+                condition = None
+            elif i == 0:
+                condition = syb <= bound
+            elif i == len(bounds) - 1:
+                # the last specialization is dispatched for the values beyond the range as well
+                condition = syb > bounds[i - 1]
+            else:
+                condition = tvm.tir.all(syb > bounds[i - 1], syb <= bound)
+            if condition is None:
+                _emit_dispatch_body(ib, symbolics, sub_items)
+            else:
+                with ib.if_scope(condition):
+                    _emit_dispatch_body(ib, symbolics, sub_items)
+
+    def _emit_dispatch_body(ib, symbolics: List[tvm.tir.Var], items):
+        if len(symbolics) > 1:
+            _emit_dispatch(ib, symbolics[1:], items)
+        else:
+            ib.emit(tvm.tir.Call(None, items[0][1], _invoke_params))
 
     ib = tvm.tir.ir_builder.create()
-    syb = list(dyn_symbolic)[-1]
-    last_range = 0
-    for i, (_range, g_var) in enumerate(zip(func_range, global_symbols)):
-        if i == 0:
-            with ib.if_scope(syb <= _range):
-                ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
-        else:
-            with ib.if_scope(tvm.tir.all(syb > last_range, syb <= _range)):
-                ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
-        last_range = _range
-    with ib.if_scope(syb > last_range):
-        ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
+    _emit_dispatch(ib, dyn_symbolic, dispatch_items)
     stmt = ib.get()
     dispatch_func = tvm.tir.PrimFunc(params, stmt, ret_type, buffer_map, attrs).with_attrs({
         "tir.is_global_func": True,
@@ -425,12 +771,21 @@ def create_dispatch_func(g_var: str, func: tir.PrimFunc, refactored_funcs: List[
     return dispatch_func
 
 
-def create_dispatch_mod(g_var: str, original_func: tir.PrimFunc,
-                        specialized_funcs: List[tir.PrimFunc]) -> IRModule:
+def create_dispatch_mod(g_var: str,
+                        original_func: tir.PrimFunc,
+                        specialized_funcs: List[tir.PrimFunc],
+                        dispatch_bounds: Optional[List[Dict[str, int]]] = None) -> IRModule:
+    """
+    Creates the module of the specialized funcs and the func that dispatches to them.
+    `dispatch_bounds` are the upper bounds of the dynamic symbolics that are dispatched to
+    each specialized func (see `measure_dispatch_bounds`), defaults to their opt_shapes.
+    """
     dispatch_mod: IRModule = tvm.IRModule()
     g_var_supply = GlobalVarSupply(dispatch_mod)
     refactored_funcs = []
-    for func in specialized_funcs:
+    for i, func in enumerate(specialized_funcs):
+        if dispatch_bounds is not None and dispatch_bounds[i]:
+            func = func.with_attr("dispatch_bounds", dispatch_bounds[i])
         params, buffers_to_declare = collect_buffers_to_declare(func)
         global_symbol, device_func = refactor_specialized_func(g_var, func, params,
                                                                buffers_to_declare)
@@ -442,21 +797,82 @@ def create_dispatch_mod(g_var: str, original_func: tir.PrimFunc,
     return dispatch_mod
 
 
-def fast_tune_with_dynamic_range(
+def measure_dispatch_bounds(func: tir.PrimFunc,
+                            results: List[Tuple[Dict, CompileResult]],
+                            arch: CUDA,
+                            num_probes: int = 4,
+                            data_distribution: str = "uniform") -> Optional[List[Dict[str, int]]]:
+    """
+    Measures the crossover points of the tuned specializations of a single dynamic symbolic.
+
+    The kernels tuned for two adjacent values, e.g. 16 and 64, are measured on the values
+    between them, the values up to the last one on which the kernel of the smaller value is
+    still faster are dispatched to it. Returns the upper bound of each specialization in the
+    order of `results`, or None if there is more than one dynamic symbolic.
+    """
+    if not results or len(results[0][0]) != 1:
+        return None
+    (name,) = results[0][0].keys()
+    order = sorted(range(len(results)), key=lambda i: int(results[i][0][name]))
+    bounds: List[Dict[str, int]] = [{name: int(item[name])} for item, _ in results]
+
+    def _measure(cpresult: CompileResult, value: int) -> float:
+        # the device of a candidate that is measured by a remote runner is remote as well
+        device = cpresult.device if cpresult.device is not None else arch.device
+        profile_tensors = get_dummy_input_arrays(
+            func.with_attr("opt_shapes", {name: value}), device, distribution=data_distribution)
+        return measure_latency(cpresult.mod, profile_tensors, device,
+                               MeasureOption(number=3, repeat=3)).median
+
+    for lower_idx, upper_idx in zip(order[:-1], order[1:]):
+        lower, upper = int(results[lower_idx][0][name]), int(results[upper_idx][0][name])
+        probes = sorted({
+            int(round(lower * (upper / lower)**(p / (num_probes + 1))))
+            for p in range(1, num_probes + 1)
+        } - {lower, upper})
+        for probe in probes:
+            try:
+                faster = _measure(results[lower_idx][1], probe) <= _measure(
+                    results[upper_idx][1], probe)
+            except Exception as e_mesg:  # pylint: disable=broad-except
+                logger.debug(f"Measurement of the crossover at {name}={probe} failed: {e_mesg}")
+                break
+            if not faster:
+                break
+            bounds[lower_idx][name] = probe
+    logger.info(f"Dispatch bounds of {name}: {[bounds[i][name] for i in order]}")
+    return bounds
+
+
+def get_opt_shapes_key(opt_shapes: Dict) -> str:
+    """The key of a specialization, e.g. "m_16" for {"m": 16}, "" for a static func."""
+    return "_".join([f"{k}_{int(v)}" for k, v in opt_shapes.items()])
+
+
+def fast_tune_specializations(
     func: tir.PrimFunc,
     target: tvm.target.Target,
     topk: int = 10,
     parallel_build: bool = True,
-    global_symbol: Optional[str] = None,
     dynamic_range: Optional[Dict[str, List[int]]] = None,
-) -> IRModule:
+    configs: Optional[Dict[str, List[Hint]]] = None,
+    builder: Optional[PopenPoolExecutor] = None,
+    skip_measured: bool = False,
+    deadline: Optional[float] = None,
+    runner: Optional[Runner] = None,
+) -> Tuple[Optional[tir.PrimFunc], Optional[List[Tuple[Dict, CompileResult]]]]:
+    """
+    Tunes the func for each specialization of the dynamic range.
+
+    Returns the func annotated with the opt_shapes, and the specialization (e.g. {"m": 16})
+    with its best compile result for each specialization. `configs` maps the key of a
+    specialization (see `get_opt_shapes_key`) to the configs that are only measured for it.
+    """
     if dynamic_range is None:
         dynamic_range = {}
     if target.kind.name != "cuda":
         logger.error("Only support CUDA target")
-        return None
-    if not global_symbol:
-        global_symbol = func.attrs["global_symbol"]
+        return None, None
 
     # set opt_shapes for the primfunc with dynamic symbolic
     opt_shapes: Dict[str, List[int]] = {}
@@ -472,12 +888,12 @@ def fast_tune_with_dynamic_range(
     if "opt_shapes" not in func.attrs:
         logger.error(
             "[BitBLAS] The primfunc has no opt_shapes, please set opt_shapes for the primfunc")
-        return None
+        return None, None
     else:
         # should be list value
         if not all([isinstance(v, tvm.ir.Array) for v in func.attrs["opt_shapes"].values()]):
             logger.error("The opt_shapes should be list value")
-            return None
+            return None, None
 
     logger.info("Start fast tuning with dynamic range")
     opt_shapes = func.attrs["opt_shapes"]
@@ -488,12 +904,48 @@ def fast_tune_with_dynamic_range(
     # Convert the Cartesian product to a list of dictionaries
     specialize_items: List[Dict] = [dict(zip(opt_shapes.keys(), values)) for values in product_list]
 
-    specilized_tuned_funcs: List[tir.PrimFunc] = []
+    results: List[Tuple[Dict, CompileResult]] = []
     for item in specialize_items:
         func = func.with_attr("opt_shapes", item)
-        _, best = fast_tune(func, target, topk, parallel_build)
+        item_configs = None
+        if configs is not None:
+            item_configs = configs.get(get_opt_shapes_key(item))
+        _, best = fast_tune(
+            func,
+            target,
+            topk,
+            parallel_build,
+            configs=item_configs,
+            builder=builder,
+            skip_measured=skip_measured,
+            deadline=deadline,
+            runner=runner)
         if best is None:
-            return None
-        specilized_tuned_funcs.append(best.sch.mod["main"])
+            return func, None
+        results.append((item, best))
+
+    return func, results
+
+
+def fast_tune_with_dynamic_range(
+    func: tir.PrimFunc,
+    target: tvm.target.Target,
+    topk: int = 10,
+    parallel_build: bool = True,
+    global_symbol: Optional[str] = None,
+    dynamic_range: Optional[Dict[str, List[int]]] = None,
+    configs: Optional[Dict[str, List[Hint]]] = None,
+    measure_crossovers: bool = True,
+) -> IRModule:
+    func, results = fast_tune_specializations(
+        func, target, topk, parallel_build, dynamic_range=dynamic_range, configs=configs)
+    if results is None:
+        return None
+    if not global_symbol:
+        global_symbol = func.attrs["global_symbol"]
 
-    return create_dispatch_mod(global_symbol, func, specilized_tuned_funcs)
+    dispatch_bounds = None
+    if measure_crossovers:
+        dispatch_bounds = measure_dispatch_bounds(func, results, CUDA(target))
+    specilized_tuned_funcs: List[tir.PrimFunc] = [best.sch.mod["main"] for _, best in results]
+    return create_dispatch_mod(global_symbol, func, specilized_tuned_funcs, dispatch_bounds)
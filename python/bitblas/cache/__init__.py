@@ -7,3 +7,8 @@ from .operator import (
     get_database_path,  # noqa: F401
     set_database_path,  # noqa: F401
 )
+from .bundle import (
+    OperatorBundle,  # noqa: F401
+    export_database_bundle,  # noqa: F401
+    import_database_bundle,  # noqa: F401
+)
@@ -0,0 +1,189 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Single-file bundle format of an arch database, used to ship tuned operators for deployment.
+
+Layout of a bundle file:
+
+    header:  magic (8 bytes) | version (uint32) | index offset (uint64) | index size (uint64)
+    payload: the raw bytes of every file of every operator entry
+    index:   json, maps the config hash to the entry metadata and to the
+             (offset, size) of each of its files in the payload
+
+The bundle is memory mapped when it is opened, so that a single operator can be read by
+its offsets without unpacking the whole bundle.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import Dict, List, Optional
+import logging
+
+from .operator import (
+    OperatorCache,
+    BITBLAS_DATABASE_MARKER,
+    BITBLAS_DATABASE_STAGING_PREFIX,
+    _database_lock,
+)
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"BITBLASB"
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct("<8sIQQ")
+
+
+def _get_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def export_database_bundle(database_path: str, arch_str: str, bundle_path: str) -> int:
+    """
+    Packs the completed operator entries of an arch database into a single bundle file.
+
+    Returns the number of packed operators.
+    """
+    arch_path = os.path.join(database_path, arch_str)
+    if not os.path.isdir(arch_path):
+        raise ValueError(f"Target {arch_str} does not exist in the database {database_path}")
+    operator_cache = OperatorCache()
+    index = operator_cache._read_index(arch_path) or operator_cache._build_index(arch_path)
+
+    bundle_dir = os.path.dirname(os.path.abspath(bundle_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=BITBLAS_DATABASE_STAGING_PREFIX, dir=bundle_dir)
+    entries: Dict[str, Dict] = {}
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, 0))
+            for hash_str, entry in index.items():
+                config_path = os.path.join(arch_path, hash_str)
+                if not operator_cache._is_complete_entry(config_path):
+                    continue
+                files = {}
+                for file in sorted(os.listdir(config_path)):
+                    with open(os.path.join(config_path, file), "rb") as src:
+                        data = src.read()
+                    files[file] = [f.tell(), len(data)]
+                    f.write(data)
+                entries[hash_str] = {**entry, "files": files}
+            index_data = json.dumps({"arch": arch_str, "entries": entries}).encode()
+            index_offset = f.tell()
+            f.write(index_data)
+            f.seek(0)
+            f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, index_offset, len(index_data)))
+            # mkstemp creates the file readable by its owner only
+            os.fchmod(f.fileno(), 0o644 & ~_get_umask())
+        os.replace(tmp_path, bundle_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(entries)
+
+
+def import_database_bundle(bundle_path: str, database_path: str) -> int:
+    """
+    Unpacks a bundle into a directory database, entries that already exist are skipped.
+
+    Returns the number of imported operators.
+    """
+    bundle = OperatorBundle(bundle_path)
+    arch_path = os.path.join(database_path, bundle.arch)
+    os.makedirs(arch_path, exist_ok=True)
+    operator_cache = OperatorCache()
+    imported: Dict[str, Dict] = {}
+    dir_mode = 0o755 & ~_get_umask()
+    try:
+        for hash_str in bundle.entries:
+            config_path = os.path.join(arch_path, hash_str)
+            if operator_cache._is_complete_entry(config_path):
+                continue
+            staging_path = tempfile.mkdtemp(prefix=BITBLAS_DATABASE_STAGING_PREFIX, dir=arch_path)
+            try:
+                bundle.extract(hash_str, staging_path)
+                # mkdtemp creates the directory accessible by its owner only
+                os.chmod(staging_path, dir_mode)
+                with _database_lock(arch_path):
+                    if operator_cache._is_complete_entry(config_path):
+                        continue
+                    if os.path.exists(config_path):
+                        operator_cache._quarantine_entry(arch_path, hash_str)
+                    os.rename(staging_path, config_path)
+            finally:
+                # removes the staging directory of a skipped or failed entry
+                shutil.rmtree(staging_path, ignore_errors=True)
+            imported[hash_str] = bundle.get_index_entry(hash_str)
+        if imported:
+            with _database_lock(arch_path):
+                operator_cache._update_index(arch_path, imported)
+    finally:
+        bundle.close()
+    return len(imported)
+
+
+class OperatorBundle:
+    """
+    Read-only view of a bundle file, operators are read by offset from the memory map.
+    """
+
+    def __init__(self, bundle_path: str):
+        self.bundle_path = bundle_path
+        # directory of the extracted operators, created on the first extraction
+        self._extract_dir: Optional[str] = None
+        self._file = open(bundle_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_size = BUNDLE_HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC:
+            self.close()
+            raise ValueError(f"{bundle_path} is not a BitBLAS operator bundle")
+        if version != BUNDLE_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported bundle version {version} of {bundle_path}")
+        index = json.loads(self._mmap[index_offset:index_offset + index_size])
+        self.arch: str = index["arch"]
+        self.entries: Dict[str, Dict] = index["entries"]
+
+    def list_files(self, hash_str: str) -> List[str]:
+        return list(self.entries[hash_str]["files"])
+
+    def read_file(self, hash_str: str, file: str) -> bytes:
+        offset, size = self.entries[hash_str]["files"][file]
+        return self._mmap[offset:offset + size]
+
+    def get_index_entry(self, hash_str: str) -> Dict:
+        return {k: v for k, v in self.entries[hash_str].items() if k != "files"}
+
+    def extract(self, hash_str: str, config_path: Optional[str] = None) -> str:
+        """
+        Writes the files of a single operator into a directory, the runtime module and the
+        wrapper library can only be loaded from files.
+        """
+        if config_path is None:
+            if self._extract_dir is None:
+                self._extract_dir = tempfile.mkdtemp(prefix="bitblas_bundle_")
+            config_path = os.path.join(self._extract_dir, hash_str)
+            if os.path.exists(os.path.join(config_path, BITBLAS_DATABASE_MARKER)):
+                return config_path
+        os.makedirs(config_path, exist_ok=True)
+        for file in self.list_files(hash_str):
+            with open(os.path.join(config_path, file), "wb") as f:
+                f.write(self.read_file(hash_str, file))
+        return config_path
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._extract_dir is not None:
+            shutil.rmtree(self._extract_dir, ignore_errors=True)
+            self._extract_dir = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,386 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Maintenance of the operator database: integrity verification, garbage collection and
+size report of every arch. The cache of the compiled wrapper libraries is reported and
+bounded by the garbage collection as well.
+
+Usage:
+
+    python -m bitblas.cache.maintenance report [--database PATH]
+    python -m bitblas.cache.maintenance verify [--database PATH] [--arch ARCH]
+    python -m bitblas.cache.maintenance gc [--database PATH] [--arch ARCH] [--drop-stale]
+                                           [--wrapper-cache-max-mb MB] [--dry-run]
+"""
+import argparse
+import json
+import os
+import shutil
+import string
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import bitblas
+from bitblas.wrapper.general import BITBLAS_WRAPPER_CACHE_PATH
+from .operator import (
+    OperatorCache,
+    BITBLAS_DATABASE_INDEX,
+    BITBLAS_DATABASE_MARKER,
+    BITBLAS_DATABASE_STAGING_PREFIX,
+    BITBLAS_DATABASE_QUARANTINE,
+    get_database_path,
+    get_config_hash,
+    _database_lock,
+    _file_checksum,
+)
+
+logger = logging.getLogger(__name__)
+
+# staging directories older than this are left by crashed writers
+STALE_STAGING_SECONDS = 3600
+# the wrapper libraries are removed from the least recently used one over this size
+WRAPPER_CACHE_MAX_NBYTES = 1024 * 1024 * 1024
+
+
+def _get_directory_nbytes(path: str) -> int:
+    nbytes = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                nbytes += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return nbytes
+
+
+def _is_arch_path(path: str) -> bool:
+    if os.path.exists(os.path.join(path, BITBLAS_DATABASE_INDEX)):
+        return True
+    return any(
+        os.path.exists(os.path.join(path, directory, "mapping.json"))
+        for directory in os.listdir(path))
+
+
+def list_arch_strs(database_path: str) -> List[str]:
+    """The archs of the database, target tags (e.g. nvidia/nvidia-a100) are nested directories."""
+    arch_strs = []
+    if not os.path.isdir(database_path):
+        return arch_strs
+    for directory in sorted(os.listdir(database_path)):
+        path = os.path.join(database_path, directory)
+        if directory.startswith(".") or not os.path.isdir(path):
+            continue
+        if _is_arch_path(path):
+            arch_strs.append(directory)
+            continue
+        for sub_directory in sorted(os.listdir(path)):
+            if os.path.isdir(os.path.join(path, sub_directory)) and _is_arch_path(
+                    os.path.join(path, sub_directory)):
+                arch_strs.append(f"{directory}/{sub_directory}")
+    return arch_strs
+
+
+def _load_config(mapping: Dict, config: Dict):
+    """Rebuilds the config object, None if it no longer round-trips through its class."""
+    config_cls = getattr(bitblas, mapping["config_type"], None)
+    if config_cls is None:
+        return None
+    try:
+        config_inst = config_cls(**config)
+    except (TypeError, ValueError):
+        return None
+    # fields that were normalized differently by an older version are stale as well
+    if json.loads(json.dumps(asdict(config_inst))) != config:
+        return None
+    return config_inst
+
+
+def verify_entry(config_path: str) -> Optional[str]:
+    """
+    Verifies a single operator entry of the database.
+
+    Returns the reason why the entry is broken, or None if it is valid.
+    """
+    operator_cache = OperatorCache()
+    marker_path = os.path.join(config_path, BITBLAS_DATABASE_MARKER)
+    if not os.path.exists(marker_path):
+        # entries saved by older versions have no marker, they are validated by their files
+        marker = {}
+    else:
+        try:
+            with open(marker_path) as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return "unreadable completion marker"
+    for file in marker.get("files", []):
+        if not os.path.exists(os.path.join(config_path, file)):
+            return f"missing file {file}"
+    # markers written by older versions have no checksums
+    for file, checksum in marker.get("checksums", {}).items():
+        if _file_checksum(os.path.join(config_path, file)) != checksum:
+            return f"checksum mismatch of {file}"
+    if not operator_cache._validate_entry(config_path):
+        return ("missing metadata or runtime module"
+                if os.path.exists(marker_path) else "incomplete entry")
+    mapping, config = operator_cache._load_operator_metadata(config_path)
+    if _load_config(mapping, config) is None:
+        return f"config does not round-trip through {mapping['config_type']}"
+    return None
+
+
+def verify_database(database_path: str = None,
+                    arch_str: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """Returns the broken entries of every arch, mapped to the reason why they are broken."""
+    database_path = database_path or get_database_path()
+    arch_strs = [arch_str] if arch_str else list_arch_strs(database_path)
+    results = {}
+    for arch in arch_strs:
+        arch_path = os.path.join(database_path, arch)
+        broken = {}
+        for hash_str in sorted(os.listdir(arch_path)):
+            config_path = os.path.join(arch_path, hash_str)
+            if hash_str.startswith(".") or not os.path.isdir(config_path):
+                continue
+            reason = verify_entry(config_path)
+            if reason is not None:
+                broken[hash_str] = reason
+        results[arch] = broken
+    return results
+
+
+def _remove(path: str, dry_run: bool):
+    logger.info(f"{'Would remove' if dry_run else 'Remove'} {path}")
+    if dry_run:
+        return
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+def collect_garbage(database_path: str = None,
+                    arch_str: Optional[str] = None,
+                    dry_run: bool = False,
+                    drop_stale: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Compacts the database: removes broken entries, quarantined entries and stale staging
+    directories, and dedupes the entries of the same config. An entry that is saved under
+    the hash of an older config representation is renamed to the current hash of its config,
+    and the index is rebuilt. With `drop_stale`, the entries that are built by another
+    version of BitBLAS or TVM are removed as well.
+
+    Returns the number of removed entries and freed bytes of every arch.
+    """
+    database_path = database_path or get_database_path()
+    arch_strs = [arch_str] if arch_str else list_arch_strs(database_path)
+    operator_cache = OperatorCache()
+    results = {}
+    for arch in arch_strs:
+        arch_path = os.path.join(database_path, arch)
+        nbytes = _get_directory_nbytes(arch_path)
+        removed = 0
+        with _database_lock(arch_path):
+            # the latest complete entry of every config
+            latest: Dict[str, tuple] = {}
+            for directory in sorted(os.listdir(arch_path)):
+                path = os.path.join(arch_path, directory)
+                if directory == BITBLAS_DATABASE_QUARANTINE:
+                    _remove(path, dry_run)
+                    continue
+                if directory.startswith(BITBLAS_DATABASE_STAGING_PREFIX):
+                    # a staging directory may belong to a writer that is still running
+                    if time.time() - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                        _remove(path, dry_run)
+                    continue
+                if directory.startswith(".") or not os.path.isdir(path):
+                    continue
+                reason = verify_entry(path)
+                if reason is not None:
+                    logger.info(f"Entry {directory} of {arch} is broken: {reason}")
+                    _remove(path, dry_run)
+                    removed += 1
+                    continue
+                if drop_stale and operator_cache._is_stale_entry(path):
+                    logger.info(f"Entry {directory} of {arch} is built by another version")
+                    _remove(path, dry_run)
+                    removed += 1
+                    continue
+                marker_path = os.path.join(path, BITBLAS_DATABASE_MARKER)
+                if not os.path.exists(marker_path) and not dry_run:
+                    # a valid entry of an older version is completed, as by a load
+                    operator_cache._write_entry_marker(path)
+                mapping, config = operator_cache._load_operator_metadata(path)
+                hash_str = get_config_hash(_load_config(mapping, config))
+                mtime = os.path.getmtime(
+                    marker_path if os.path.exists(marker_path) else os.path.join(
+                        path, "mapping.json"))
+                if hash_str in latest:
+                    # keep the most recently saved entry of the duplicated config
+                    stale = latest[hash_str] if latest[hash_str][0] < mtime else (mtime, directory)
+                    _remove(os.path.join(arch_path, stale[1]), dry_run)
+                    removed += 1
+                    if stale[1] == directory:
+                        continue
+                latest[hash_str] = (mtime, directory)
+
+            if not dry_run:
+                for hash_str, (_, directory) in latest.items():
+                    if directory != hash_str:
+                        os.rename(
+                            os.path.join(arch_path, directory), os.path.join(arch_path, hash_str))
+                operator_cache._write_index(arch_path, operator_cache._build_index(arch_path))
+        results[arch] = {
+            "removed": removed,
+            "freed_nbytes": 0 if dry_run else nbytes - _get_directory_nbytes(arch_path),
+        }
+    return results
+
+
+def report_database(database_path: str = None) -> Dict[str, Dict[str, int]]:
+    """Returns the number of entries and the size in bytes of every arch."""
+    database_path = database_path or get_database_path()
+    operator_cache = OperatorCache()
+    results = {}
+    for arch in list_arch_strs(database_path):
+        arch_path = os.path.join(database_path, arch)
+        entries = [
+            directory for directory in os.listdir(arch_path)
+            if not directory.startswith(".") and os.path.isdir(os.path.join(arch_path, directory))
+        ]
+        quarantine_path = os.path.join(arch_path, BITBLAS_DATABASE_QUARANTINE)
+        results[arch] = {
+            "entries": len(entries),
+            "complete_entries": sum(
+                operator_cache._is_complete_entry(os.path.join(arch_path, entry)) or
+                operator_cache._validate_entry(os.path.join(arch_path, entry))
+                for entry in entries),
+            "stale_entries": sum(
+                operator_cache._is_stale_entry(os.path.join(arch_path, entry))
+                for entry in entries),
+            "quarantined_entries":
+                len(os.listdir(quarantine_path)) if os.path.isdir(quarantine_path) else 0,
+            "nbytes": _get_directory_nbytes(arch_path),
+        }
+    return results
+
+
+def _list_wrapper_cache(cache_path: str) -> Tuple[Dict[str, List[str]], List[str]]:
+    """The files of every compiled library by its key, and the temporary files."""
+    libraries: Dict[str, List[str]] = {}
+    temporaries = []
+    if not os.path.isdir(cache_path):
+        return libraries, temporaries
+    for file in sorted(os.listdir(cache_path)):
+        key, ext = os.path.splitext(file)
+        if ext in (".cu", ".so") and len(key) == 64 and all(c in string.hexdigits for c in key):
+            libraries.setdefault(key, []).append(os.path.join(cache_path, file))
+        else:
+            # the outputs of a compilation are written into temporary files first
+            temporaries.append(os.path.join(cache_path, file))
+    return libraries, temporaries
+
+
+def report_wrapper_cache(cache_path: str = None) -> Dict[str, int]:
+    """Returns the number of compiled wrapper libraries and their size in bytes."""
+    cache_path = cache_path or BITBLAS_WRAPPER_CACHE_PATH
+    libraries, _ = _list_wrapper_cache(cache_path)
+    return {"libraries": len(libraries), "nbytes": _get_directory_nbytes(cache_path)}
+
+
+def collect_wrapper_cache_garbage(cache_path: str = None,
+                                  max_nbytes: Optional[int] = WRAPPER_CACHE_MAX_NBYTES,
+                                  dry_run: bool = False) -> Dict[str, int]:
+    """
+    Bounds the cache of the compiled wrapper libraries: removes the stale temporary files
+    and the incomplete libraries, and the least recently used libraries over `max_nbytes`.
+    The operators of the database keep a copy of their library, a removed library is only
+    compiled again.
+
+    Returns the number of removed libraries and freed bytes.
+    """
+    cache_path = cache_path or BITBLAS_WRAPPER_CACHE_PATH
+    nbytes = _get_directory_nbytes(cache_path)
+    libraries, temporaries = _list_wrapper_cache(cache_path)
+    removed = 0
+    for path in temporaries:
+        # a temporary file may belong to a compilation that is still running
+        if time.time() - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+            _remove(path, dry_run)
+    complete = []
+    for key, paths in libraries.items():
+        if len(paths) != 2:
+            # the source and the library are renamed into place one after another
+            if time.time() - max(os.path.getmtime(path) for path in paths) > STALE_STAGING_SECONDS:
+                for path in paths:
+                    _remove(path, dry_run)
+                removed += 1
+            continue
+        # the library of a cache hit is touched by the compilation
+        last_used = max(os.path.getmtime(path) for path in paths)
+        complete.append((last_used, sum(os.path.getsize(path) for path in paths), paths))
+    if max_nbytes is not None:
+        remaining = sum(size for _, size, _ in complete)
+        for _, size, paths in sorted(complete, key=lambda library: library[0]):
+            if remaining <= max_nbytes:
+                break
+            for path in paths:
+                _remove(path, dry_run)
+            remaining -= size
+            removed += 1
+    return {
+        "removed": removed,
+        "freed_nbytes": 0 if dry_run else nbytes - _get_directory_nbytes(cache_path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance of the BitBLAS operator database")
+    parser.add_argument("command", choices=["report", "verify", "gc"])
+    parser.add_argument("--database", default=None, help="path of the database")
+    parser.add_argument("--arch", default=None, help="only process this arch, e.g. cuda-sm_80")
+    parser.add_argument(
+        "--drop-stale",
+        action="store_true",
+        help="remove the entries built by another version of BitBLAS or TVM")
+    parser.add_argument(
+        "--wrapper-cache-max-mb",
+        type=float,
+        default=WRAPPER_CACHE_MAX_NBYTES / 1024 / 1024,
+        help="the size of the wrapper cache that is kept by gc, in MiB")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only print the entries that would be removed")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "report":
+        for arch, report in report_database(args.database).items():
+            print(f"{arch}: {report['entries']} entries ({report['complete_entries']} complete, "
+                  f"{report['stale_entries']} stale, {report['quarantined_entries']} quarantined), "
+                  f"{report['nbytes'] / 1024 / 1024:.2f} MiB")
+        report = report_wrapper_cache()
+        print(f"wrapper cache: {report['libraries']} libraries, "
+              f"{report['nbytes'] / 1024 / 1024:.2f} MiB")
+    elif args.command == "verify":
+        num_broken = 0
+        for arch, broken in verify_database(args.database, args.arch).items():
+            for hash_str, reason in broken.items():
+                print(f"{arch}/{hash_str}: {reason}")
+            num_broken += len(broken)
+        print(f"{num_broken} broken entries")
+        return 1 if num_broken else 0
+    else:
+        results = collect_garbage(args.database, args.arch, args.dry_run, args.drop_stale)
+        for arch, result in results.items():
+            print(f"{arch}: removed {result['removed']} entries, "
+                  f"freed {result['freed_nbytes'] / 1024 / 1024:.2f} MiB")
+        result = collect_wrapper_cache_garbage(
+            max_nbytes=int(args.wrapper_cache_max_mb * 1024 * 1024), dry_run=args.dry_run)
+        print(f"wrapper cache: removed {result['removed']} libraries, "
+              f"freed {result['freed_nbytes'] / 1024 / 1024:.2f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
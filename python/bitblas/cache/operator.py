@@ -2,6 +2,8 @@
 # Licensed under the MIT License.
 import bitblas
 from bitblas.ops.operator import OperatorConfig, Operator
+from bitblas.base.roller.hint import Hint
+from bitblas.base.roller.arch.cuda import check_sm_version
 from dataclasses import asdict
 import os
 import json
@@ -10,49 +12,529 @@ from hashlib import sha256
 import shutil
 import tvm
 from tvm.contrib.tar import tar
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import functools
+import math
+import atexit
+import itertools
+import queue
+import threading
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 BITBLAS_DATABASE_PATH = os.path.expanduser("~/.cache/bitblas")
+# name of the per-arch index file, maps the config hash to its metadata
+BITBLAS_DATABASE_INDEX = "index.json"
+# an entry is only complete and loadable when the marker file exists
+BITBLAS_DATABASE_MARKER = ".complete"
+BITBLAS_DATABASE_LOCK = ".lock"
+BITBLAS_DATABASE_STAGING_PREFIX = ".tmp-"
+BITBLAS_DATABASE_QUARANTINE = ".quarantine"
+# the tuned hint of each specialization of an operator
+BITBLAS_DATABASE_HINTS = "hints.json"
+# sources that decide the generated kernels, relative to the bitblas package
+BITBLAS_FINGERPRINT_SOURCES = ("gpu", "ops/impl", "quantization", "wrapper")
+# how the entries built by another version of BitBLAS or TVM are loaded:
+# "prefer" loads them, but an entry that matches the current build wins over a stale one;
+# "invalidate" does not load them, only their tuned hints are kept to seed the re-tuning.
+BITBLAS_DATABASE_VERSION_POLICIES = ("prefer", "invalidate")
+# config fields that are compared by distance in the nearest neighbour lookup,
+# all the other fields (dtypes, layout, quantization flags) must match exactly.
+SHAPE_FIELDS = ("M", "N", "K")
+
+
+@contextmanager
+def _database_lock(arch_path):
+    """Exclusive inter-process lock of an arch directory of the database."""
+    with open(os.path.join(arch_path, BITBLAS_DATABASE_LOCK), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def get_config_hash(config: OperatorConfig) -> str:
+    return sha256(repr(config).encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_build_fingerprint() -> Dict[str, str]:
+    """
+    Fingerprint of the current build, which is the BitBLAS version, the TVM commit and
+    the hash of the schedule rules, intrinsics and operator definitions.
+    """
+    try:
+        tvm_commit = tvm.support.libinfo().get("GIT_COMMIT_HASH", "unknown")
+    except Exception:
+        tvm_commit = "unknown"
+    package_path = os.path.dirname(os.path.abspath(bitblas.__file__))
+    digest = sha256()
+    for source in BITBLAS_FINGERPRINT_SOURCES:
+        for root, dirs, files in os.walk(os.path.join(package_path, source)):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith(".py"):
+                    digest.update(os.path.relpath(os.path.join(root, file), package_path).encode())
+                    digest.update(_file_checksum(os.path.join(root, file)).encode())
+    return {
+        "bitblas": bitblas.__version__,
+        "tvm": str(tvm_commit),
+        "sources": digest.hexdigest(),
+    }
+
+
+def _file_checksum(path: str) -> str:
+    digest = sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_operator_lib_name(op_inst: Operator) -> Optional[str]:
+    # the wrapper library is compiled in the background, its path is only known to the
+    # wrapper until the operator waits for it
+    wrapper = getattr(op_inst, "wrapper", None)
+    if wrapper is not None and wrapper.lib_name is not None:
+        return wrapper.lib_name
+    return getattr(op_inst, "lib_name", None)
+
+
+def _is_lib_pending(op_inst: Operator) -> bool:
+    """Whether the wrapper library of the operator is still being compiled."""
+    wrapper = getattr(op_inst, "wrapper", None)
+    return wrapper is not None and _get_operator_lib_name(op_inst) is None
+
+
+def _estimate_operator_nbytes(op_inst: Operator) -> int:
+    """Approximate host memory held by an operator, used for the cache memory accounting."""
+    nbytes = 0
+    if op_inst.rt_mod is not None:
+        try:
+            nbytes += len(op_inst.rt_mod.imported_modules[0].get_source())
+        except Exception:
+            pass
+    lib_name = _get_operator_lib_name(op_inst)
+    if lib_name is not None and os.path.exists(lib_name):
+        nbytes += os.path.getsize(lib_name)
+    for tensor in getattr(op_inst, "profile_tensors", None) or []:
+        num_elems = 1
+        for dim in tensor.shape:
+            num_elems *= int(dim)
+        nbytes += num_elems * ((tvm.DataType(tensor.dtype).bits + 7) // 8)
+    return nbytes
+
+
+def _config_distance(query: Dict, candidate: Dict) -> Optional[float]:
+    """Log-scale distance between the shapes of two configs, None if they are not comparable."""
+    if query.keys() != candidate.keys():
+        return None
+    distance = 0.0
+    for field, value in query.items():
+        other = candidate[field]
+        if field not in SHAPE_FIELDS:
+            if value != other:
+                return None
+        elif isinstance(value, int) and isinstance(other, int):
+            distance += abs(math.log2(max(value, 1)) - math.log2(max(other, 1)))
+        elif isinstance(value, int) or isinstance(other, int):
+            # static and dynamic shape operators are tuned for different specializations
+            return None
+    return distance
 
 
 class OperatorCache:
     """
     Manages a cache for operator instances (e.g., Matmul, Convolution) based on their configurations.
+
+    Operators found in the database are only registered by their config hash when the
+    database is loaded, and are materialized on the first `get` of their config.
+
+    The in-memory cache can be bounded by the number of operators (`max_size`) and by the
+    approximate bytes they hold (`max_nbytes`). When a bound is exceeded, the least recently
+    used operators are evicted and released, the persisted ones first. The operators that
+    are not persisted yet are written back into the database before they are evicted. An
+    evicted operator is registered again for the lazy materialization, so its next `get`
+    loads it from the database.
     """
 
-    def __init__(self):
-        self.cache = {}
+    def __init__(self,
+                 max_size: Optional[int] = None,
+                 max_nbytes: Optional[int] = None,
+                 version_policy: str = "prefer"):
+        if version_policy not in BITBLAS_DATABASE_VERSION_POLICIES:
+            raise ValueError(f"Unsupported version policy {version_policy}")
+        self.cache: OrderedDict = OrderedDict()
+        # config hash -> metadata of the operators that are not materialized yet
+        self.database_entries: Dict[str, Dict] = {}
+        # config hash -> metadata of the invalidated operators of another build
+        self.stale_entries: Dict[str, Dict] = {}
+        self.version_policy = version_policy
+        self.max_size = max_size
+        self.max_nbytes = max_nbytes
+        self.nbytes = 0
+        self._entry_nbytes: Dict[OperatorConfig, int] = {}
+        # operators that are accounted before their wrapper library is compiled
+        self._lib_pending: Set[OperatorConfig] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # operators that are added or changed since the last flush into the database
+        self._dirty: Dict[OperatorConfig, Operator] = {}
+        self._config_hashes: Dict[OperatorConfig, str] = {}
+        self._lock = threading.RLock()
+        self._writer: Optional[_BackgroundWriter] = None
+        self._bundles: List = []
+        # the database entries of the persisted operators, registered again on eviction
+        self._persisted: Dict[OperatorConfig, Dict] = {}
+        # the database path and target of the last load or flush, used by the write back
+        self._database_path: Optional[str] = None
+        self._database_target = None
 
     def add(self, config: OperatorConfig, op_inst: Operator):
+        with self._lock:
+            self._add(config, op_inst)
+            self._dirty[config] = op_inst
+
+    def _add(self, config: OperatorConfig, op_inst: Operator):
+        if config in self.cache:
+            self.nbytes -= self._entry_nbytes.pop(config, 0)
         self.cache[config] = op_inst
+        self.cache.move_to_end(config)
+        self._account(config, op_inst)
+        self._evict()
+
+    def _account(self, config: OperatorConfig, op_inst: Operator):
+        entry_nbytes = _estimate_operator_nbytes(op_inst)
+        self.nbytes += entry_nbytes - self._entry_nbytes.get(config, 0)
+        self._entry_nbytes[config] = entry_nbytes
+        if _is_lib_pending(op_inst):
+            self._lib_pending.add(config)
+        else:
+            self._lib_pending.discard(config)
+
+    def _reaccount_pending_libs(self):
+        # the libraries that are compiled since the operators are added are accounted now
+        for config in list(self._lib_pending):
+            op_inst = self.cache.get(config)
+            if op_inst is None:
+                self._lib_pending.discard(config)
+            elif not _is_lib_pending(op_inst):
+                self._account(config, op_inst)
 
     def get(self, config: OperatorConfig):
-        return self.cache.get(config)
+        with self._lock:
+            if config in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(config)
+                return self.cache[config]
+            self.misses += 1
+            return self._materialize(config)
 
     def exists(self, config):
-        return config in self.cache
+        return config in self.cache or get_config_hash(config) in self.database_entries
+
+    def remove(self, config: OperatorConfig, release: bool = False):
+        """
+        Removes the operator from the cache. With `release=True` the operator is also
+        released, which must only be asked for when the operator is not used anymore.
+        """
+        with self._lock:
+            op_inst = self.cache.pop(config, None)
+            self.nbytes -= self._entry_nbytes.pop(config, 0)
+            self._lib_pending.discard(config)
+            self._persisted.pop(config, None)
+            self._dirty.pop(config, None)
+            self._config_hashes.pop(config, None)
+            if op_inst is not None and release:
+                op_inst.release()
+            return op_inst
 
     def clear(self):
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
+            self.database_entries.clear()
+            self.stale_entries.clear()
+            self._entry_nbytes.clear()
+            self._lib_pending.clear()
+            self._dirty.clear()
+            self._config_hashes.clear()
+            self._persisted.clear()
+            self.nbytes = 0
+            for bundle in self._bundles:
+                bundle.close()
+            self._bundles.clear()
 
     def size(self):
-        return len(self.cache)
+        return len(self.cache) + len(self.database_entries)
+
+    def get_nearest_hints(self, config: OperatorConfig, topk: int = 3) -> Dict[str, List[Dict]]:
+        """
+        Retrieves the tuned hints of the operators whose config is nearest to the given one,
+        they share its dtypes, layout and quantization flags and only differ in shape.
+
+        Returns the serialized hints of the topk nearest operators for each specialization,
+        see `bitblas.base.utils.get_opt_shapes_key`.
+        """
+        config_type = type(config).__name__
+        candidates = []
+        with self._lock:
+            for cached_config, op_inst in self.cache.items():
+                if type(cached_config).__name__ != config_type or not op_inst.tuned_configs:
+                    continue
+                candidates.append((
+                    json.loads(json.dumps(asdict(cached_config))),
+                    {k: hint.serialize() for k, hint in op_inst.tuned_configs.items()},
+                ))
+            # the hints of invalidated operators are still good candidates
+            for entry in itertools.chain(self.database_entries.values(),
+                                         self.stale_entries.values()):
+                if entry["config_type"] == config_type and entry.get("hints"):
+                    candidates.append((entry["config"], entry["hints"]))
+        return self._rank_nearest_hints(config, candidates, topk)
+
+    def get_transfer_hints(self,
+                           config: OperatorConfig,
+                           database_path,
+                           target,
+                           topk: int = 3) -> Dict[str, List[Dict]]:
+        """
+        Retrieves the hints of the nearest configs tuned on the closest other arch of the
+        database, used to bring up an arch that has no tuned operators yet. The hints
+        should be legalized against the new arch before they are applied, see
+        `bitblas.base.roller.policy.DefaultPolicy.legalize_configs`.
+        """
+        arch_str = self._determine_target_arch_str(target)
+        source_arch_str = self._find_closest_arch_str(database_path, arch_str)
+        if source_arch_str is None:
+            return {}
+        arch_path = os.path.join(database_path, source_arch_str)
+        index = self._read_index(arch_path) or self._build_index(arch_path)
+        config_type = type(config).__name__
+        candidates = [(entry["config"], entry["hints"])
+                      for entry in index.values()
+                      if entry["config_type"] == config_type and entry.get("hints")]
+        hints = self._rank_nearest_hints(config, candidates, topk)
+        if hints:
+            logger.info(f"Transfer the tuned hints of {source_arch_str} to {arch_str}")
+        return hints
+
+    def _parse_arch_str(self, arch_str) -> Optional[Tuple[str, int]]:
+        # the arch string is either the target keys followed by the arch, e.g. cuda-gpu-sm_80,
+        # or a target tag, e.g. nvidia/nvidia-a100. Returns the target keys and sm version.
+        prefix, _, arch = arch_str.rpartition("-")
+        if check_sm_version(arch) >= 0:
+            return prefix, check_sm_version(arch)
+        try:
+            target = tvm.target.Target(arch_str)
+        except Exception:
+            return None
+        if "arch" not in target.attrs or check_sm_version(target.arch) < 0:
+            return None
+        return "-".join(target.keys), check_sm_version(target.arch)
+
+    def _find_closest_arch_str(self, database_path, arch_str) -> Optional[str]:
+        parsed = self._parse_arch_str(arch_str)
+        if parsed is None or not os.path.isdir(database_path):
+            return None
+        prefix, sm_version = parsed
+        arch_strs = {}
+        for directory in os.listdir(database_path):
+            if not os.path.isdir(os.path.join(database_path, directory)):
+                continue
+            parsed = self._parse_arch_str(directory)
+            if parsed is not None:
+                arch_strs[directory] = parsed
+                continue
+            # target tags are saved as nested directories
+            for sub_directory in os.listdir(os.path.join(database_path, directory)):
+                parsed = self._parse_arch_str(f"{directory}/{sub_directory}")
+                if parsed is not None:
+                    arch_strs[f"{directory}/{sub_directory}"] = parsed
+        candidates = []
+        for other_arch_str, other in arch_strs.items():
+            if other_arch_str == arch_str or other[0] != prefix:
+                continue
+            # prefer the newer arch when the distances are the same
+            candidates.append((abs(sm_version - other[1]), -other[1], other_arch_str))
+        if not candidates:
+            return None
+        return min(candidates)[-1]
+
+    def _rank_nearest_hints(self, config, candidates, topk) -> Dict[str, List[Dict]]:
+        # normalize the tuples and enums into their json representations
+        query = json.loads(json.dumps(asdict(config)))
+        ranked = []
+        for candidate, hints in candidates:
+            distance = _config_distance(query, candidate)
+            if distance is not None:
+                ranked.append((distance, hints))
+        ranked.sort(key=lambda item: item[0])
+
+        nearest: Dict[str, List[Dict]] = {}
+        for _, hints in ranked:
+            for key, hint in hints.items():
+                bucket = nearest.setdefault(key, [])
+                if len(bucket) < topk and hint not in bucket:
+                    bucket.append(hint)
+        return nearest
+
+    def set_capacity(self, max_size: Optional[int] = None, max_nbytes: Optional[int] = None):
+        with self._lock:
+            self.max_size = max_size
+            self.max_nbytes = max_nbytes
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._reaccount_pending_libs()
+        return {
+            "size": len(self.cache),
+            "nbytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "dirty": len(self._dirty),
+        }
+
+    def _is_over_capacity(self):
+        if self.max_size is not None and len(self.cache) > self.max_size:
+            return True
+        return self.max_nbytes is not None and self.nbytes > self.max_nbytes
+
+    def _evict(self):
+        self._reaccount_pending_libs()
+        if not self._is_over_capacity():
+            return
+        # always keep the most recently used operator, and walk the others from the least
+        # recently used one, the persisted operators are evicted before the dirty ones.
+        candidates = list(self.cache)[:-1]
+        clean = [config for config in candidates if config not in self._dirty]
+        dirty = [config for config in candidates if config in self._dirty]
+        for config in clean + dirty:
+            if not self._is_over_capacity():
+                break
+            if config in self._dirty and not self._write_back(config):
+                continue
+            self._evict_entry(config)
+
+    def _write_back(self, config: OperatorConfig) -> bool:
+        """Persists a dirty operator before it is evicted, returns whether it is persisted."""
+        database_path = self._database_path or get_database_path()
+        self._save_entries([(config, self.cache[config])],
+                           database_path,
+                           self._database_target,
+                           evict=False)
+        return config not in self._dirty
+
+    def _evict_entry(self, config: OperatorConfig):
+        logger.debug(f"Evicting operator with config {config} from the operator cache")
+        hash_str = self._get_config_hash(config)
+        entry = self._persisted.pop(config, None)
+        self.remove(config, release=True)
+        if entry is not None:
+            # the evicted operator is loaded from the database again by its next get
+            self.database_entries[hash_str] = entry
+        self.evictions += 1
 
     def save_into_database(self, database_path=None, target=None):
+        with self._lock:
+            entries = list(self.cache.items())
+            self._set_database(database_path, target)
+        self._save_entries(entries, database_path, target)
+
+    def flush(self, database_path=None, target=None, background: bool = False) -> int:
+        """
+        Persists the operators that are added since the last flush into the database.
+
+        With `background=True` the flush is handed over to a background writer thread,
+        use `wait_for_flush` to block until the pending writes are done.
+        """
+        if background:
+            if self._writer is None:
+                self._writer = _BackgroundWriter(self)
+            self._writer.submit(database_path, target)
+            return 0
+        with self._lock:
+            entries = list(self._dirty.items())
+            self._set_database(database_path, target)
+        return self._save_entries(entries, database_path, target)
+
+    def wait_for_flush(self):
+        if self._writer is not None:
+            self._writer.join()
+
+    def _set_database(self, database_path, target):
+        if database_path is not None:
+            self._database_path, self._database_target = database_path, target
+
+    def _save_entries(self, entries, database_path=None, target=None, evict=True) -> int:
         database_path = self._ensure_database_path(database_path)
-        for config, op_inst in self.cache.items():
+        num_saved = 0
+        for config, op_inst in entries:
             arch_str = self._determine_arch_str(op_inst, target)
             arch_path = os.path.join(database_path, arch_str)
             self._ensure_directory(arch_path)
-            hash_str = sha256(repr(config).encode()).hexdigest()
-            config_path = os.path.join(arch_path, hash_str)
-            # if the config already exists, skip saving
-            if os.path.exists(config_path):
+            try:
+                if self._save_operator(config, op_inst, arch_path):
+                    num_saved += 1
+            except Exception as e:
+                logger.warning(f"Failed to save operator with config {config}: {e}")
                 continue
-            self._ensure_directory(config_path)
-            self._save_operator_config_and_artifact(config, op_inst, config_path)
+            config_path = os.path.join(arch_path, self._get_config_hash(config))
+            with self._lock:
+                # the operator may be replaced while it is being saved
+                if self.cache.get(config) is op_inst and self._is_complete_entry(config_path):
+                    self._persisted[config] = {
+                        **self._get_index_entry(config, op_inst), "config_path": config_path,
+                        "target": op_inst.target,
+                        "stale": False
+                    }
+                if self._dirty.get(config) is op_inst:
+                    del self._dirty[config]
+        if evict:
+            with self._lock:
+                # persisted operators can be evicted now
+                self._evict()
+        return num_saved
+
+    def _get_config_hash(self, config) -> str:
+        if config not in self._config_hashes:
+            self._config_hashes[config] = get_config_hash(config)
+        return self._config_hashes[config]
+
+    def _save_operator(self, config, op_inst, arch_path) -> bool:
+        hash_str = self._get_config_hash(config)
+        config_path = os.path.join(arch_path, hash_str)
+        # if the config already exists, skip saving unless it is built by another version
+        if self._is_complete_entry(config_path) and not self._is_stale_entry(config_path):
+            return False
+        # stage the entry in a temporary directory, and publish it with an atomic rename
+        # so that concurrent readers never observe a partially written entry.
+        staging_path = tempfile.mkdtemp(prefix=BITBLAS_DATABASE_STAGING_PREFIX, dir=arch_path)
+        try:
+            self._save_operator_config_and_artifact(config, op_inst, staging_path)
+            if not self._validate_entry(staging_path):
+                logger.warning(f"Failed to export operator with config {config}, skip saving")
+                return False
+            self._write_entry_marker(staging_path)
+            with _database_lock(arch_path):
+                if self._is_complete_entry(config_path) and not self._is_stale_entry(config_path):
+                    # another process has published the same entry
+                    return False
+                if os.path.exists(config_path):
+                    self._quarantine_entry(arch_path, hash_str)
+                os.rename(staging_path, config_path)
+                self._update_index(arch_path, {hash_str: self._get_index_entry(config, op_inst)})
+            return True
+        finally:
+            if os.path.exists(staging_path):
+                shutil.rmtree(staging_path, ignore_errors=True)
 
     def load_from_database(self, database_path, target=None):
         if not os.path.exists(database_path):
@@ -67,7 +549,9 @@ class OperatorCache:
                 f"Target {arch_str} does not exist in the database, skipping loading operators from the database"
             )
             return
-        self._load_operators_from_arch_path(arch_path, target)
+        with self._lock:
+            self._set_database(database_path, target)
+        self._load_index_from_arch_path(arch_path, target)
 
     def _ensure_database_path(self, database_path):
         if database_path is None:
@@ -92,7 +576,11 @@ class OperatorCache:
             # library does not support export_library
             export_error = e  # noqa: F841
             pass
-        json_data = {"config_type": config_type, "operator_type": operator_type}
+        json_data = {
+            "config_type": config_type,
+            "operator_type": operator_type,
+            "fingerprint": get_build_fingerprint(),
+        }
         json_file_path = os.path.join(config_path, "mapping.json")
         with open(json_file_path, "w") as json_file:
             json.dump(json_data, json_file)
@@ -106,7 +594,11 @@ class OperatorCache:
         optimized_file_path = os.path.join(config_path, "optimized.py")
         with open(optimized_file_path, "w") as optimized_file:
             optimized_file.write(op_inst.optimized_func.script(show_meta=False))
-        if op_inst.wrapper.lib_name is not None:
+        if op_inst.tuned_configs:
+            with open(os.path.join(config_path, BITBLAS_DATABASE_HINTS), "w") as hints_file:
+                json.dump(self._serialize_hints(op_inst), hints_file)
+        op_inst.wait_for_lib()
+        if op_inst.wrapper is not None and op_inst.wrapper.lib_name is not None:
             # copy lib name to the same directory as the artifact
             src_name = op_inst.wrapper.src_name
             shutil.copy(
@@ -119,39 +611,289 @@ class OperatorCache:
                 os.path.join(config_path, os.path.basename("wrapper_compiled.so")),
             )
 
+    def _serialize_hints(self, op_inst) -> Dict[str, Dict]:
+        return {k: hint.serialize() for k, hint in op_inst.tuned_configs.items()}
+
+    def _get_index_entry(self, config, op_inst):
+        entry = {
+            "config_type": type(config).__name__,
+            "operator_type": type(op_inst).__name__,
+            "config": asdict(config),
+            "fingerprint": get_build_fingerprint(),
+        }
+        if op_inst.tuned_configs:
+            entry["hints"] = self._serialize_hints(op_inst)
+        return entry
+
+    def _load_hints(self, config_path) -> Optional[Dict[str, Dict]]:
+        hints_path = os.path.join(config_path, BITBLAS_DATABASE_HINTS)
+        if not os.path.exists(hints_path):
+            return None
+        with open(hints_path) as f:
+            return json.load(f)
+
+    def _read_index(self, arch_path) -> Dict[str, Dict]:
+        index_path = os.path.join(arch_path, BITBLAS_DATABASE_INDEX)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read database index {index_path}: {e}, rebuilding it")
+            return None
+
+    def _write_index(self, arch_path, index: Dict[str, Dict]):
+        index_path = os.path.join(arch_path, BITBLAS_DATABASE_INDEX)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=BITBLAS_DATABASE_STAGING_PREFIX, suffix=".json", dir=arch_path)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def _is_stale_entry(self, config_path) -> bool:
+        mapping, _ = self._load_operator_metadata(config_path)
+        return mapping is None or mapping.get("fingerprint") != get_build_fingerprint()
+
+    def _register_entry(self, hash_str, entry) -> bool:
+        """Registers an operator for the lazy materialization, returns whether it is stale."""
+        stale = entry.get("fingerprint") != get_build_fingerprint()
+        if stale and self.version_policy == "invalidate":
+            self.stale_entries[hash_str] = entry
+            return stale
+        registered = self.database_entries.get(hash_str)
+        if stale and registered is not None and not registered["stale"]:
+            # prefer the operator that is built by the current version
+            return stale
+        self.database_entries[hash_str] = {**entry, "stale": stale}
+        return stale
+
+    def _report_stale_entries(self, num_stale, source):
+        if num_stale == 0:
+            return
+        action = "not loaded" if self.version_policy == "invalidate" else "loaded"
+        logger.warning(
+            f"{num_stale} operators of {source} are built by another version of BitBLAS or TVM "
+            f"and are {action}, re-tune them to update the database")
+
+    def _is_complete_entry(self, config_path) -> bool:
+        return os.path.exists(os.path.join(config_path, BITBLAS_DATABASE_MARKER))
+
+    def _validate_entry(self, config_path) -> bool:
+        mapping, config = self._load_operator_metadata(config_path)
+        if not (mapping and config):
+            return False
+        artifact_path = os.path.join(config_path, "tvm_rt_mod." + tar.output_format)
+        return os.path.exists(artifact_path) and os.path.getsize(artifact_path) > 0
+
+    def _write_entry_marker(self, config_path):
+        files = sorted(os.listdir(config_path))
+        marker = {
+            "files": files,
+            "checksums": {file: _file_checksum(os.path.join(config_path, file)) for file in files},
+        }
+        with open(os.path.join(config_path, BITBLAS_DATABASE_MARKER), "w") as f:
+            json.dump(marker, f)
+
+    def _quarantine_entry(self, arch_path, hash_str):
+        quarantine_path = os.path.join(arch_path, BITBLAS_DATABASE_QUARANTINE)
+        self._ensure_directory(quarantine_path)
+        target_path = os.path.join(quarantine_path, hash_str)
+        if os.path.exists(target_path):
+            shutil.rmtree(target_path, ignore_errors=True)
+        logger.warning(f"Quarantine database entry {hash_str} in {arch_path}")
+        os.rename(os.path.join(arch_path, hash_str), target_path)
+
+    def _check_entry(self, arch_path, hash_str) -> bool:
+        """Checks an entry without a completed marker, entries that can not be
+        validated are moved into the quarantine directory."""
+        config_path = os.path.join(arch_path, hash_str)
+        if self._is_complete_entry(config_path):
+            return True
+        if self._validate_entry(config_path):
+            self._write_entry_marker(config_path)
+            return True
+        self._quarantine_entry(arch_path, hash_str)
+        return False
+
+    def _update_index(self, arch_path, entries: Dict[str, Dict]):
+        index = self._read_index(arch_path)
+        if index is None:
+            index = self._build_index(arch_path)
+        index.update(entries)
+        self._write_index(arch_path, index)
+
+    def _build_index(self, arch_path) -> Dict[str, Dict]:
+        # scan the metadata of every operator directory, used for databases that
+        # were saved without an index file.
+        index = {}
+        for directory in os.listdir(arch_path):
+            config_path = os.path.join(arch_path, directory)
+            # skip staging, quarantine and other hidden directories
+            if directory.startswith(".") or not os.path.isdir(config_path):
+                continue
+            mapping, config = self._load_operator_metadata(config_path)
+            if mapping and config:
+                index[directory] = {**mapping, "config": config}
+                hints = self._load_hints(config_path)
+                if hints:
+                    index[directory]["hints"] = hints
+        return index
+
     def _determine_target_arch_str(self, target):
         return (target if isinstance(target, str) else "-".join(list(target.keys) + [target.arch]))
 
-    def _load_operators_from_arch_path(self, arch_path, target):
-        for root, dirs, _ in os.walk(arch_path):
-            for directory in dirs:
-                config_path = os.path.join(root, directory)
-                self._load_operator(config_path, target)
+    def _load_index_from_arch_path(self, arch_path, target):
+        index = self._read_index(arch_path)
+        if index is None or not all(
+                self._is_complete_entry(os.path.join(arch_path, hash_str)) for hash_str in index):
+            try:
+                with _database_lock(arch_path):
+                    index = self._read_index(arch_path) or self._build_index(arch_path)
+                    index = {
+                        hash_str: entry
+                        for hash_str, entry in index.items()
+                        if os.path.isdir(os.path.join(arch_path, hash_str)) and
+                        self._check_entry(arch_path, hash_str)
+                    }
+                    self._write_index(arch_path, index)
+            except OSError as e:
+                # the database may be read-only, only load the completed entries
+                logger.debug(f"Failed to validate database entries in {arch_path}: {e}")
+                index = {
+                    hash_str: entry
+                    for hash_str, entry in (index or self._build_index(arch_path)).items()
+                    if self._is_complete_entry(os.path.join(arch_path, hash_str))
+                }
+        num_stale = 0
+        for hash_str, entry in index.items():
+            config_path = os.path.join(arch_path, hash_str)
+            num_stale += self._register_entry(hash_str, {
+                **entry, "config_path": config_path,
+                "target": target
+            })
+        self._report_stale_entries(num_stale, arch_path)
+
+    def load_from_bundle(self, bundle_path, target=None):
+        """Registers the operators of a packed bundle, see `bitblas.cache.bundle`."""
+        from .bundle import OperatorBundle  # pylint: disable=import-outside-toplevel
+
+        if not os.path.exists(bundle_path):
+            logger.info(
+                f"Bundle {bundle_path} does not exist, skipping loading operators from the bundle")
+            return
+        bundle = OperatorBundle(bundle_path)
+        arch_str = self._determine_target_arch_str(target)
+        if bundle.arch != arch_str:
+            logger.info(
+                f"Bundle {bundle_path} is built for {bundle.arch} instead of {arch_str}, skipping loading operators from the bundle"
+            )
+            bundle.close()
+            return
+        # keep the bundle mapped, the operators are read from it on materialization
+        self._bundles.append(bundle)
+        num_stale = 0
+        for hash_str in bundle.entries:
+            num_stale += self._register_entry(hash_str, {
+                **bundle.get_index_entry(hash_str), "bundle": bundle,
+                "target": target
+            })
+        self._report_stale_entries(num_stale, bundle_path)
+
+    def _materialize(self, config):
+        hash_str = get_config_hash(config)
+        entry = self.database_entries.get(hash_str)
+        if entry is None:
+            return None
+        mapping = {k: entry[k] for k in ("config_type", "operator_type")}
+        try:
+            config_path = entry.get("config_path")
+            if config_path is None:
+                config_path = entry["bundle"].extract(hash_str)
+            op_inst = self._load_operator(config_path, entry["target"], mapping, entry["config"])
+        except Exception as e:
+            logger.warning(f"Failed to load operator with config hash {hash_str}: {e}")
+            return None
+        # the entry is kept for another attempt until its operator is loaded
+        if op_inst is not None:
+            self.database_entries.pop(hash_str, None)
+            self._persisted[config] = entry
+        return op_inst
+
+    def _load_operator_metadata(self, config_path):
+        mapping, config = None, None
+        mapping_path = os.path.join(config_path, "mapping.json")
+        if not os.path.exists(mapping_path):
+            return mapping, config
+        with open(mapping_path) as f:
+            mapping = json.load(f)
+        config_file_path = os.path.join(config_path, f"{mapping['config_type']}.json")
+        if os.path.exists(config_file_path):
+            with open(config_file_path) as f:
+                config = json.load(f)
+        return mapping, config
 
-    def _load_operator(self, config_path, target):
-        mapping, config, rt_mod, lib_name = None, None, None, None
+    def _load_operator(self, config_path, target, mapping=None, config=None):
+        if mapping is None or config is None:
+            mapping, config = self._load_operator_metadata(config_path)
+        rt_mod, lib_name = None, None
         for file in os.listdir(config_path):
             full_path = os.path.join(config_path, file)
-            if file == "mapping.json":
-                with open(full_path) as f:
-                    mapping = json.load(f)
-            elif file.endswith(".json"):
-                with open(full_path) as f:
-                    config = json.load(f)
-            elif file.endswith(".tar"):
+            if file.endswith(".tar"):
                 rt_mod = tvm.runtime.load_module(full_path)
             elif file == "wrapper_compiled.so":
                 lib_name = full_path
 
         if mapping and config and rt_mod:
-            self._instantiate_and_add_operator(mapping, config, rt_mod, lib_name, target)
+            op_inst = self._instantiate_and_add_operator(mapping, config, rt_mod, lib_name, target)
+            hints = self._load_hints(config_path)
+            if hints:
+                op_inst.tuned_configs = {
+                    k: Hint.deserialize(hint, arch=op_inst.arch) for k, hint in hints.items()
+                }
+            return op_inst
+        return None
 
     def _instantiate_and_add_operator(self, mapping, config, rt_mod, lib_name, target):
         config_cls = getattr(bitblas, mapping["config_type"])
         operator_cls = getattr(bitblas, mapping["operator_type"])
         op_inst = operator_cls(config=config_cls(**config), target=target, enable_tuning=False)
         op_inst.update_runtime_module(rt_mod, lib_name=lib_name)
-        self.add(config_cls(**config), op_inst)
+        # operators loaded from the database are not dirty
+        self._add(config_cls(**config), op_inst)
+        return op_inst
+
+
+class _BackgroundWriter:
+    """
+    A daemon thread that flushes the dirty operators of an OperatorCache into the database,
+    which takes the database I/O off the critical path of operator creation.
+    """
+
+    def __init__(self, operator_cache: OperatorCache):
+        self.operator_cache = operator_cache
+        self.queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._run, name="bitblas-database-writer", daemon=True)
+        self.thread.start()
+        # pending writes should land before the interpreter exits
+        atexit.register(self.join)
+
+    def submit(self, database_path, target):
+        self.queue.put((database_path, target))
+
+    def join(self):
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            database_path, target = self.queue.get()
+            try:
+                self.operator_cache.flush(database_path, target)
+            except Exception as e:
+                logger.warning(f"Background flush into {database_path} failed: {e}")
+            finally:
+                self.queue.task_done()
 
 
 global_operator_cache = OperatorCache()
@@ -504,6 +504,37 @@ def normalize_to_matmul(sch: tir.Schedule,
     return sch
 
 
+def apply_split_k(sch: tir.Schedule,
+                  main_block: BlockRV,
+                  split_k_factor: int,
+                  num_threads: int = 128) -> BlockRV:
+    """
+    Partitions the reduction of a normalized matmul block C[S, I, J] += A[S, I, K] * B[S, J, K]
+    into `split_k_factor` slices. The returned block computes the partial sums of the slices
+    into a global workspace, whose slices are fused into the batch axis S, so it is scheduled
+    as a batched matmul. The partial sums are summed up by a separate fixup kernel, into which
+    the epilogue of the matmul is inlined.
+    """
+    batch, _, _, k = sch.get_loops(main_block)
+    num_batch = int(sch.get(batch).extent)
+    k_slice, _ = sch.split(k, factors=[split_k_factor, None])
+    partial_block = sch.rfactor(k_slice, factor_axis=0)
+    sch.reorder(k_slice, batch)
+    sch.fuse(k_slice, batch)
+    sch.transform_layout(partial_block, ("write", 0), lambda s, b, i, j: (s * num_batch + b, i, j))
+
+    # the matmul block is rewritten to sum up the partial sums of the workspace
+    fixup_block = main_block
+    fixup_store = sch.cache_write(fixup_block, 0, "local")
+    auto_inline_consumer_chain(sch, fixup_store)
+    *spatial_loops, _ = sch.get_loops(fixup_block)
+    block_idx, thread_idx = sch.split(sch.fuse(*spatial_loops), factors=[None, num_threads])
+    sch.bind(block_idx, "blockIdx.x")
+    sch.bind(thread_idx, "threadIdx.x")
+    sch.reverse_compute_at(fixup_store, thread_idx)
+    return partial_block
+
+
 def get_tensorized_func_and_tags(
     func: tir.PrimFunc,
     target: Target,
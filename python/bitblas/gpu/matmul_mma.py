@@ -24,6 +24,7 @@ from .matmul_analysis import (
     get_reduction_blocks,
     get_dequantize_block,
     normalize_to_matmul,
+    apply_split_k,
     get_propagate_map,
 )
 
@@ -382,6 +383,8 @@ class MatmulTensorizationMMA(GPUScheduleRule):
             conditions.append(sch.get(main_block) not in output_blocks)
             # check if not use async copy
             conditions.append(config.use_async is False)
+            # the partial sums of split-k are stored to the workspace through shared memory
+            conditions.append(config.split_k_factor > 1)
             return any(conditions)
 
         cache_write_required = check_require_cache(func, config=config)
@@ -451,7 +454,8 @@ class MatmulTensorizationMMA(GPUScheduleRule):
         y_pad_factor = j_factors[2] * j_factors[3]
         k_pad_factor = k_factors[1]
 
-        # Step 2. Padding for dynamic shape kernels
+        # Step 2. Padding for dynamic shape kernels, and for the static shapes that do not
+        # divide the block, then partitioning the reduction of the split-k configs
         sch.pad_einsum(
             main_block,
             [
@@ -461,6 +465,8 @@ class MatmulTensorizationMMA(GPUScheduleRule):
                 micro_size_k * k_pad_factor,
             ],
         )
+        if config.split_k_factor > 1:
+            main_block = apply_split_k(sch, main_block, config.split_k_factor)
 
         # Step 3. Schedule matmul to use tensor core
         block = main_block
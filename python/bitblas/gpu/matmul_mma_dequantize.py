@@ -19,6 +19,7 @@ from .matmul_analysis import (
     auto_inline_producers,
     get_reduction_blocks,
     normalize_to_matmul,
+    apply_split_k,
     get_propagate_map,
     layout_propagate_chain,
     find_last_producer_from_buffer,
@@ -752,7 +753,8 @@ class MatmulTensorizationMMAWithDequantizeInfo(GPUScheduleRule):
         if not (func.attrs is not None and "dlight.tensorcore_prenormlized" in func.attrs.keys()):
             sch = normalize_to_matmul(sch, main_block, ["a", "a", "a"])
 
-        # Step 2. Padding for dynamic shape kernels
+        # Step 2. Padding for dynamic shape kernels, and for the static shapes that do not
+        # divide the block, then partitioning the reduction of the split-k configs
         sch.pad_einsum(
             main_block,
             [
@@ -762,6 +764,8 @@ class MatmulTensorizationMMAWithDequantizeInfo(GPUScheduleRule):
                 micro_size_k * k_pad_factor,
             ],
         )
+        if config.split_k_factor > 1:
+            main_block = apply_split_k(sch, main_block, config.split_k_factor)
 
         # Step 3. Schedule matmul to use tensor core
         block = main_block
@@ -1294,7 +1298,8 @@ class MatmulTensorizationMMAWithDequantizeInfo(GPUScheduleRule):
         if not (func.attrs is not None and "dlight.tensorcore_prenormlized" in func.attrs.keys()):
             sch = normalize_to_matmul(sch, main_block, ["a", "a", "a"])
 
-        # Step 2. Padding for dynamic shape kernels
+        # Step 2. Padding for dynamic shape kernels, and for the static shapes that do not
+        # divide the block, then partitioning the reduction of the split-k configs
         sch.pad_einsum(
             main_block,
             [
@@ -1304,6 +1309,8 @@ class MatmulTensorizationMMAWithDequantizeInfo(GPUScheduleRule):
                 micro_size_k * k_pad_factor,
             ],
         )
+        if config.split_k_factor > 1:
+            main_block = apply_split_k(sch, main_block, config.split_k_factor)
 
         # Step 3. Schedule matmul to use tensor core
         block = main_block
@@ -11,10 +11,12 @@ import torch.nn as nn
 
 logger = getLogger(__name__)
 
-from typing import List, Union
+from typing import Dict, List, Union
 
 from bitblas.cache import global_operator_cache, get_database_path
 from bitblas import Matmul, MatmulConfig
+from bitblas.base.roller.hint import Hint
+from bitblas.base.bucketing import select_dynamic_buckets
 from bitblas.quantization.utils import general_compress
 from bitblas import auto_detect_nvidia_target
 
@@ -64,7 +66,7 @@ class Linear(nn.Module):
         with_scaling: bool = None,
         with_zeros: bool = False,
         zeros_mode: str = None,
-        opt_M: Union[int, List[int]] = opt_M,
+        opt_M: Union[int, List[int], Dict[int, int]] = opt_M,
         # performance related configs
         enable_tuning: bool = True,
         fast_decoding: bool = True,
@@ -74,11 +76,15 @@ class Linear(nn.Module):
         @opt_M: optimize range of the input shape for dynamic symbolic
         if the input shape is a range, we will optimize the matmul with dynamic symbolic.
         if the input shape is int, we will optimize the matmul with static symbolic.
+        if the input shape is a histogram of the observed M, e.g. {1: 900, 512: 100}, the
+        specialized M are selected from it, see `bitblas.base.bucketing`.
         """
         super().__init__()
 
         self.in_features = in_features
         self.out_features = out_features
+        if isinstance(opt_M, dict):
+            opt_M = select_dynamic_buckets(opt_M, max_buckets=len(Linear.opt_M))
         self.opt_M = opt_M
         self.group_size = self._set_group_size(group_size, in_features)
         self.torch_dtype = getattr(torch, A_dtype)
@@ -106,6 +112,7 @@ class Linear(nn.Module):
             param_list = [self.weight]
             if self.bitblas_matmul.config.with_bias:
                 param_list.append(self.bias)
+            self.q_tensors = param_list
             self.q_params = [ctypes.c_void_p(arr.data_ptr()) for arr in param_list]
         else:
             param_list = [self.qweight]
@@ -115,6 +122,7 @@ class Linear(nn.Module):
                 param_list.append(self.zeros)
             if self.bitblas_matmul.config.with_bias:
                 param_list.append(self.bias)
+            self.q_tensors = param_list
             self.q_params = [ctypes.c_void_p(arr.data_ptr()) for arr in param_list]
 
     def _validate_parameters(self, group_size, in_features, out_features):
@@ -214,9 +222,11 @@ class Linear(nn.Module):
             # should disable tuning for the first time because we may require loading bitblas operator from database.
             bitblas_matmul = Matmul(config, target=BITBLAS_TARGET, enable_tuning=False)
             if enable_tuning:
-                bitblas_matmul.hardware_aware_finetune(topk=20)
+                self._tune_bitblas_operator(bitblas_matmul, config)
                 global_operator_cache.add(config, bitblas_matmul)
-                global_operator_cache.save_into_database(BITBLAS_DATABASE_PATH, BITBLAS_TARGET)
+                # only persist the new operator, and keep the I/O off the model loading path
+                global_operator_cache.flush(
+                    BITBLAS_DATABASE_PATH, BITBLAS_TARGET, background=True)
                 print("BitBLAS Tuning done, appended operator to global_operator_cache.")
             else:
                 print("BitBLAS Operator created.")
@@ -224,6 +234,25 @@ class Linear(nn.Module):
             print("BitBLAS Operator found in global_operator_cache.")
         return bitblas_matmul
 
+    def _tune_bitblas_operator(self, bitblas_matmul, config, topk=20):
+        # re-apply the tuned hints of the nearest cached shapes first, or the hints tuned on the
+        # closest arch when this arch has no tuned operators, the full tuning is only required
+        # when none of them can be applied.
+        nearest_hints = global_operator_cache.get_nearest_hints(config, topk=3)
+        if not nearest_hints:
+            nearest_hints = global_operator_cache.get_transfer_hints(
+                config, BITBLAS_DATABASE_PATH, BITBLAS_TARGET, topk=3)
+        if nearest_hints:
+            configs = {
+                key: [Hint.deserialize(hint) for hint in hints]
+                for key, hints in nearest_hints.items()
+            }
+            bitblas_matmul.hardware_aware_finetune(topk=topk, configs=configs)
+            if bitblas_matmul.optimized_func is not None:
+                logger.info("Tuned operator with the hints of the nearest tuned operators.")
+                return
+        bitblas_matmul.hardware_aware_finetune(topk=topk)
+
     def warmup(self, topk=20):
         self.bitblas_matmul.hardware_aware_finetune(topk=topk)
 
@@ -237,7 +266,16 @@ class Linear(nn.Module):
             output = torch.empty(
                 A.shape[:-1] + (self.out_features,), dtype=A.dtype, device=A.device)
         m = ctypes.c_int32(reduce(operator.mul, A.shape[:-1], 1))
+        if self.bitblas_matmul.rt_mod is None:
+            # the operator is released on its eviction from the cache, load it again
+            self.bitblas_matmul = self._get_or_create_bitblas_operator(
+                self.bitblas_matmul.config, enable_tuning=False)
         A = self.bitblas_matmul.transform_input(A)
+        if self.bitblas_matmul.lib is None:
+            # the operator has no C wrapper library, e.g. its compilation failed
+            self.bitblas_matmul._forward_from_torch_func(
+                A.view(-1, A.shape[-1]), *self.q_tensors, output.view(-1, self.out_features))
+            return output
         A_void = ctypes.c_void_p(A.data_ptr())
         # m is the product of the last n - 1 dimensions of A
         self.bitblas_matmul.lib.call(A_void, *self.q_params, ctypes.c_void_p(output.data_ptr()), m)
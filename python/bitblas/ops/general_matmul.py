@@ -428,12 +428,12 @@ class Matmul(Operator):
             args.append(bias)
         args.append(output)
 
-        m = reduce(operator.mul, A.shape[:-1], 1)
-        args.append(m)
-
         if self.lib is None:
+            # the dynamic symbolics are bound from the shapes of the tensors
             self._forward_from_torch_func(*args)
-        self._forward_from_prebuild_lib(*args)
+        else:
+            m = reduce(operator.mul, A.shape[:-1], 1)
+            self._forward_from_prebuild_lib(*args, m)
 
         return output
 
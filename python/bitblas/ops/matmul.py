@@ -6,6 +6,7 @@ from tvm.target import Target
 from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
 from typing import List, Union, Optional, Any, Tuple
 from .operator import Operator, TransformKind
+from bitblas.base.measure import measure_latency
 from .impl.matmul_impl import select_implementation
 from bitblas.utils import tensor_replace_dp4a
 from dataclasses import dataclass
@@ -205,14 +206,14 @@ class Matmul(Operator):
                         device=device,
                     ))
             self.profile_tensors = profile_tensors
-            latency = self.time_evaluator(*profile_tensors).mean * 1e3
+            latency = measure_latency(self.rt_mod, profile_tensors, device).median
             benchmark_latencies.append({"m": m, "latency": latency})
         # ms
         return benchmark_latencies
 
     def forward(self, *args) -> Any:
         if self.lib is None:
-            self._forward_from_torch_func(*args)
+            return self._forward_from_torch_func(*args)
         dynamic_symbolic = []
         if self.dynamic_range is not None:
             # assume we only have one dynamic range
@@ -235,7 +235,7 @@ class MatmulWeightOnlyDequantize(Operator):
 
     def forward(self, *args) -> Any:
         if self.lib is None:
-            self._forward_from_torch_func(*args)
+            return self._forward_from_torch_func(*args)
         dynamic_symbolic = []
         if self.dynamic_range is not None:
             # assume we only have one dynamic range
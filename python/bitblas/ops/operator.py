@@ -10,14 +10,21 @@ from tvm._ffi.base import _LIB, raise_last_ffi_error
 from tvm._ffi._ctypes.types import TVMValue, ArgTypeCode
 import bitblas
 import ctypes
+import _ctypes
+import threading
 from typing import List, Dict, Any, Optional
 import numpy as np
-from ..base import fast_tune, fast_tune_with_dynamic_range
+from ..base import fast_tune, fast_tune_specializations
+from ..base.utils import create_dispatch_mod, get_opt_shapes_key, measure_dispatch_bounds
+from ..base.roller.hint import Hint
+from ..base.measure import MeasureOption, MeasureResult, measure_latency
+from tvm.contrib.popen_pool import PopenPoolExecutor
 from copy import deepcopy
 from bitblas.base.roller.arch import get_arch
 from bitblas.wrapper import CUDASourceWrapper, CUDASourceWrapperWithDynamic
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import IntEnum
+from concurrent.futures import Future
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,6 +46,11 @@ class OperatorConfig:
 class Operator(ABC):
 
     def __init__(self, name, config: OperatorConfig, target: Target = None):
+        # the wrapper library is compiled in the background, see `wait_for_lib`
+        self._lib = None
+        self._lib_future: Optional[Future] = None
+        # the library is waited for by the forward and the background flush of the cache
+        self._lib_lock = threading.Lock()
         if isinstance(target, str):
             target = Target(target)
         self.name = name
@@ -60,6 +72,8 @@ class Operator(ABC):
         self.wrapper = None
         self.lib_name = None
         self.lib = None
+        # the best hint of each tuned specialization, keyed by `get_opt_shapes_key`
+        self.tuned_configs: Dict[str, Hint] = {}
 
     def get_source(self, target: Target = None) -> str:
         if target is None:
@@ -117,8 +131,9 @@ class Operator(ABC):
         if rt_mod:
             self.rt_mod = rt_mod
             # Initialize a time evaluator with the built module, specifying the device and the number of runs
-            self.time_evaluator = rt_mod.time_evaluator(
-                rt_mod.entry_name, self.arch.device, number=10)
+            if self.arch.device is not None:
+                self.time_evaluator = rt_mod.time_evaluator(
+                    rt_mod.entry_name, self.arch.device, number=10)
             self.function_handle = rt_mod.get_function(rt_mod.entry_name).handle
             self.torch_func = to_pytorch_func(rt_mod)
             if self.arch.platform == "CUDA":
@@ -129,11 +144,10 @@ class Operator(ABC):
                     else:
                         wrapper = CUDASourceWrapper(self.optimized_func, self.get_source(target),
                                                     self.arch)
-                    wrapper.compile_lib()
+                    # the operators that are built one after another compile their wrapper
+                    # libraries concurrently, the library is only waited for when it is used
                     self.wrapper = wrapper
-                    self.lib_name = self.wrapper.lib_name
-                    self.lib = self.wrapper.load_lib()
-                    self.lib.init()
+                    self._lib_future = wrapper.compile_lib_async()
                 except Exception as e:
                     build_runtime_library_error = e
                     logger.debug(
@@ -141,6 +155,37 @@ class Operator(ABC):
 
         return rt_mod
 
+    def wait_for_lib(self):
+        """Waits for the wrapper library that is compiled in the background, and loads it."""
+        # the future is only cleared once the library is loaded, so a concurrent caller
+        # waits for the load instead of observing the library before it is set
+        with self._lib_lock:
+            if self._lib_future is None:
+                return
+            try:
+                self._lib_future.result()
+                self.lib_name = self.wrapper.lib_name
+                if self.lib_name is None:
+                    raise RuntimeError("Compilation of the wrapper library failed")
+                self._lib = self.wrapper.load_lib()
+                self._lib.init()
+            except Exception as e:
+                self.wrapper = None
+                self.lib_name = None
+                self._lib = None
+                logger.debug("Failed to build runtime library {}".format(e))
+            finally:
+                self._lib_future = None
+
+    @property
+    def lib(self):
+        self.wait_for_lib()
+        return self._lib
+
+    @lib.setter
+    def lib(self, lib):
+        self._lib = lib
+
     def apply_default_schedule(self, func_mod: IRModule, target: Target) -> IRModule:
         mod_for_opt = deepcopy(func_mod)
         with target:
@@ -164,11 +209,26 @@ class Operator(ABC):
                           func: PrimFunc,
                           target: Target,
                           topk: int = 20,
-                          parallel_build=True) -> IRModule:
-        _, best = fast_tune(func, target, topk=topk, parallel_build=parallel_build)
+                          parallel_build=True,
+                          configs: Optional[List[Hint]] = None,
+                          builder: Optional[PopenPoolExecutor] = None,
+                          skip_measured: bool = False,
+                          deadline: Optional[float] = None) -> IRModule:
+        _, best = fast_tune(
+            func,
+            target,
+            topk=topk,
+            parallel_build=parallel_build,
+            configs=configs,
+            builder=builder,
+            skip_measured=skip_measured,
+            deadline=deadline,
+            # the operators are launched by the C wrapper, which launches a single kernel
+            allow_split_k=False)
         if best is not None:
+            self.pass_context = best.config.pass_context
+            self.tuned_configs = {"": best.config}
             return best.sch.mod
-        self.pass_context = best.config.pass_context
         return None
 
     def apply_fast_tuning_with_dynamic_range(
@@ -177,27 +237,69 @@ class Operator(ABC):
         target: Target,
         topk: int = 20,
         dynamic_range: Dict[str, List[int]] = None,
+        configs: Optional[Dict[str, List[Hint]]] = None,
+        builder: Optional[PopenPoolExecutor] = None,
+        skip_measured: bool = False,
+        deadline: Optional[float] = None,
     ):
-        optimized_mod = fast_tune_with_dynamic_range(
-            func, target, topk=topk, parallel_build=True, dynamic_range=dynamic_range)
-        if optimized_mod is not None:
-            return optimized_mod
-        return None
+        func, results = fast_tune_specializations(
+            func,
+            target,
+            topk=topk,
+            parallel_build=True,
+            dynamic_range=dynamic_range,
+            configs=configs,
+            builder=builder,
+            skip_measured=skip_measured,
+            deadline=deadline)
+        if results is None:
+            return None
+        self.tuned_configs = {get_opt_shapes_key(item): best.config for item, best in results}
+        # dispatch by the measured crossover points of the specializations
+        dispatch_bounds = measure_dispatch_bounds(func, results, get_arch(target))
+        return create_dispatch_mod(func.attrs["global_symbol"], func,
+                                   [best.sch.mod["main"] for _, best in results],
+                                   dispatch_bounds)
 
     def hardware_aware_finetune(self,
                                 topk: int = 20,
                                 target: tvm.target.Target = None,
-                                parallel_build=True):
+                                parallel_build=True,
+                                configs: Optional[Dict[str, List[Hint]]] = None,
+                                builder: Optional[PopenPoolExecutor] = None,
+                                skip_measured: bool = False,
+                                deadline: Optional[float] = None):
+        """
+        Tunes the operator for the target. `configs` maps the key of each specialization
+        ("" for a static shape operator) to the hints that are only measured, instead of
+        the topk candidates emitted by the roller policy. `builder` is the build pool that
+        is shared by a tuning session, `skip_measured` and `deadline` resume and bound the
+        tuning (see `fast_tune`).
+        """
         if target is None:
             target = self.target
         dynamic_range = self.dynamic_range
         func = self.prim_func
         if dynamic_range is not None:
             self.optimized_func = self.apply_fast_tuning_with_dynamic_range(
-                func, target, topk, dynamic_range)
+                func,
+                target,
+                topk,
+                dynamic_range,
+                configs=configs,
+                builder=builder,
+                skip_measured=skip_measured,
+                deadline=deadline)
         else:
             self.optimized_func = self.apply_fast_tuning(
-                func, target, topk, parallel_build=parallel_build)
+                func,
+                target,
+                topk,
+                parallel_build=parallel_build,
+                configs=configs.get("") if configs is not None else None,
+                builder=builder,
+                skip_measured=skip_measured,
+                deadline=deadline)
         self._build_runtime_module(self.target)
 
     def get_profile_tensors(self, dynamic_symbolic_constrains: Optional[Dict] = None):
@@ -232,12 +334,26 @@ class Operator(ABC):
         self.profile_tensors = profile_tensors
         return profile_tensors
 
-    def profile_latency(self, dynamic_symbolic_constrains: Optional[Dict] = None) -> str:
+    def measure(self,
+                dynamic_symbolic_constrains: Optional[Dict] = None,
+                measure_option: Optional[MeasureOption] = None) -> MeasureResult:
+        """Measures the latency samples of the operator on the profile tensors."""
+        if self.arch.device is None:
+            raise RuntimeError(f"Cannot measure the operator without a device of {self.target}")
         if dynamic_symbolic_constrains is None:
             dynamic_symbolic_constrains = {}
         profile_tensors = self.get_profile_tensors(dynamic_symbolic_constrains)
-        latency = self.time_evaluator(*profile_tensors).mean * 1e3
-        return latency
+        measure_option = measure_option or MeasureOption()
+        if measure_option.l2_cache_bytes is None:
+            measure_option = replace(
+                measure_option, l2_cache_bytes=getattr(self.arch, "l2_cache_size_bytes", None))
+        return measure_latency(self.rt_mod, profile_tensors, self.arch.device, measure_option)
+
+    def profile_latency(self,
+                        dynamic_symbolic_constrains: Optional[Dict] = None,
+                        measure_option: Optional[MeasureOption] = None) -> float:
+        """The median latency of the operator in ms."""
+        return self.measure(dynamic_symbolic_constrains, measure_option).median
 
     def _tensor_adapter(self, tensor, device):
         import torch
@@ -293,14 +409,35 @@ class Operator(ABC):
 
     def update_runtime_module(self, rt_mod, lib_name=None):
         self.rt_mod = rt_mod
-        self.time_evaluator = rt_mod.time_evaluator(rt_mod.entry_name, self.arch.device, number=10)
+        if self.arch.device is not None:
+            self.time_evaluator = rt_mod.time_evaluator(
+                rt_mod.entry_name, self.arch.device, number=10)
         self.function_handle = rt_mod.get_function(rt_mod.entry_name).handle
         self.torch_func = to_pytorch_func(rt_mod)
         if lib_name is not None:
+            self._lib_future = None
             self.lib_name = lib_name
             self.lib = ctypes.CDLL(lib_name)
             self.lib.init()
 
+    def release(self):
+        """
+        Unloads the runtime module and the prebuilt wrapper library of the operator.
+
+        The operator can not be called anymore after it is released, it is used by
+        the operator cache to free the host memory and dlopen handles of evicted operators.
+        """
+        self.wait_for_lib()
+        if self._lib is not None:
+            _ctypes.dlclose(self._lib._handle)
+        self.lib = None
+        self.wrapper = None
+        self.rt_mod = None
+        self.time_evaluator = None
+        self.function_handle = None
+        self.torch_func = None
+        self.profile_tensors = None
+
     @abstractmethod
     def _select_implementation(self) -> IRModule:
         pass
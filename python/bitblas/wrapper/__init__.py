@@ -1,4 +1,4 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from .general import CUDASourceWrapper, CUDASourceWrapperWithDynamic  # noqa: F401
+from .general import CUDASourceWrapper, CUDASourceWrapperWithDynamic, compile_libs  # noqa: F401
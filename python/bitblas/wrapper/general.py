@@ -12,11 +12,19 @@ import os
 import tempfile
 import subprocess
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from hashlib import sha256
 from tvm.driver import lower
 from tvm.target import Target
 
 logger = logging.getLogger(__name__)
 
+# compiled wrapper libraries, keyed by the hash of the source and the compiler flags
+BITBLAS_WRAPPER_CACHE_PATH = os.path.expanduser("~/.cache/bitblas/wrapper_cache")
+
+# the nvcc processes are launched from threads, so the wrappers are compiled concurrently
+_compile_pool: Optional[ThreadPoolExecutor] = None
+
 _TYPE_MAP = {
     "float32": "float",
     "float16": "half",
@@ -118,7 +126,87 @@ def get_thread_block_information(mod: IRModule):
     return block_dims, grid_dims
 
 
+def get_nvcc_flags(compute_version: str) -> List[str]:
+    return [
+        "-std=c++17",
+        "-Xcudafe",
+        "--diag_suppress=177",
+        "--compiler-options",
+        "'-fPIC'",
+        "-lineinfo",
+        "--shared",
+        f"-gencode=arch=compute_{compute_version},code=compute_{compute_version}",
+    ]
+
+
+def compile_cuda_source(code: str,
+                        flags: List[str],
+                        timeout: float = None,
+                        compiler: str = "nvcc",
+                        cache_path: Optional[str] = BITBLAS_WRAPPER_CACHE_PATH):
+    """
+    Compiles the source into a shared library, the library of the same source and flags is
+    only compiled once and is shared by processes through `cache_path`.
+
+    Returns the (source path, library path), or None if the compilation failed.
+    """
+    if cache_path is None:
+        work_dir = tempfile.mkdtemp()
+        src_name = os.path.join(work_dir, "wrapper.cu")
+        lib_name = os.path.join(work_dir, "wrapper.so")
+    else:
+        key = sha256("\0".join([code, compiler] + flags).encode()).hexdigest()
+        os.makedirs(cache_path, exist_ok=True)
+        src_name = os.path.join(cache_path, f"{key}.cu")
+        lib_name = os.path.join(cache_path, f"{key}.so")
+        if os.path.exists(src_name) and os.path.exists(lib_name):
+            try:
+                # the least recently used libraries are removed by the database maintenance
+                os.utime(lib_name)
+            except OSError:
+                pass
+            return src_name, lib_name
+    # the outputs are renamed into place, so a concurrent reader never sees a partial file
+    fd, tmp_src_name = tempfile.mkstemp(suffix=".cu", dir=os.path.dirname(src_name))
+    with os.fdopen(fd, "w") as src:
+        src.write(code)
+    tmp_lib_name = os.path.splitext(tmp_src_name)[0] + ".so"
+    command = [compiler, *flags, tmp_src_name, "-lcuda", "-o", tmp_lib_name]
+    try:
+        ret = subprocess.run(command, timeout=timeout)
+        if ret.returncode != 0 or not os.path.exists(tmp_lib_name):
+            logger.warning(f"Compilation Failed! {command}")
+            return None
+        os.replace(tmp_lib_name, lib_name)
+        os.replace(tmp_src_name, src_name)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Compilation Timeout! {command}")
+        return None
+    finally:
+        for tmp_name in (tmp_src_name, tmp_lib_name):
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+    return src_name, lib_name
+
+
+def _get_compile_pool() -> ThreadPoolExecutor:
+    global _compile_pool
+    if _compile_pool is None:
+        _compile_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return _compile_pool
+
+
+def compile_libs(wrappers: List["CUDASourceWrapper"], timeout: float = None):
+    """Compiles the libraries of the wrappers concurrently, and waits for all of them."""
+    futures = [wrapper.compile_lib_async(timeout) for wrapper in wrappers]
+    for future in futures:
+        future.result()
+
+
 class CUDASourceWrapper(object):
+    # the command of the cuda compiler, and the cache of the compiled libraries
+    compiler: str = "nvcc"
+    cache_path: Optional[str] = BITBLAS_WRAPPER_CACHE_PATH
 
     def __init__(self, optimized_mod: IRModule, source: str, arch: TileDevice):
         self.mod = optimized_mod
@@ -142,38 +230,19 @@ class CUDASourceWrapper(object):
         self.lib_name = None
 
     def compile_lib(self, timeout: float = None):
-        arch = self.arch
-        src = tempfile.NamedTemporaryFile(mode="w", suffix=".cu", delete=False)
-        compute_version = arch.compute_capability
-        lib_name = src.name.replace(".cu", ".so")
-
-        command = [
-            "nvcc",
-            "-std=c++17",
-            "-Xcudafe",
-            "--diag_suppress=177",
-            "--compiler-options",
-            "'-fPIC'",
-            "-lineinfo",
-            "--shared",
-            src.name,
-            "-lcuda",
-            f"-gencode=arch=compute_{compute_version},code=compute_{compute_version}",
-            "-o",
-            lib_name,
-        ]
-        src.write(self.lib_code)
-        src.flush()
-        try:
-            ret = subprocess.run(command, timeout=timeout)
-        except subprocess.TimeoutExpired:
-            logger.warning(f"Compilation Timeout! {command}")
-            return None
-        if ret.returncode != 0:
-            logger.warning(f"Compilation Failed! {command}")
+        result = compile_cuda_source(
+            self.lib_code,
+            get_nvcc_flags(self.arch.compute_capability),
+            timeout=timeout,
+            compiler=self.compiler,
+            cache_path=self.cache_path)
+        if result is None:
             return None
-        self.src_name = src.name
-        self.lib_name = lib_name
+        self.src_name, self.lib_name = result
+
+    def compile_lib_async(self, timeout: float = None) -> Future:
+        """Compiles the library in the background, the library is ready once the future is."""
+        return _get_compile_pool().submit(self.compile_lib, timeout)
 
     def parse_source_information(self):
         device_mod = get_annotated_device_mod(self.mod, self.arch.target)
@@ -193,13 +262,14 @@ class CUDASourceWrapper(object):
                         self.grid_info["xyz".index(tag[-1])] = extent
 
     def get_dynamic_symbolic_set(self, prim_func):
-        # Determine the set of dynamic symbols used in the function
-        dynamic_symbolic_set = set()
+        # Determine the dynamic symbols used in the function, in the order of their first
+        # appearance, which is also the order of the symbolic arguments of the call
+        dynamic_symbolic_set = []
         for param in prim_func.params:
             buffer = prim_func.buffer_map[param]
             for dim in buffer.shape:
-                if isinstance(dim, tvm.tir.Var):
-                    dynamic_symbolic_set.add(dim.name)
+                if isinstance(dim, tvm.tir.Var) and dim.name not in dynamic_symbolic_set:
+                    dynamic_symbolic_set.append(dim.name)
         return dynamic_symbolic_set
 
     def get_cuda_init_func(self):
@@ -378,9 +448,7 @@ extern "C" void init() {{
                 p = int(p)
             return str(p).replace("//", "/")
 
-        last_range = 0
-        num_items = len(function_informations)
-        _call_str = """"""
+        launches = []
         for function_name, info in function_informations.items():
             # Prepare block and grid configurations for kernel launches
             block_info, grid_info = info["block_info"], info["grid_info"]
@@ -396,35 +464,16 @@ extern "C" void init() {{
             )
             # Handle dynamic shared memory specification
             smem_str = (0 if info["dynamic_smem_buf"] is None else info["dynamic_smem_buf"])
-            opt_shapes = info["opt_shapes"]
-            # Generate conditional kernel launch code based on dynamic symbolic ranges
-            (symbolic,) = list(dynamic_symbolic_set)
-            range_str = opt_shapes[symbolic]
-            if last_range == 0:
-                call_str = "if ({} <= {}) {{\n\t\t\t {}<<<{}, {}, {}>>>({}); \n\t\t}}\n".format(
-                    symbolic,
-                    range_str,
-                    function_name,
-                    grid_str,
-                    block_str,
-                    smem_str,
-                    call_args,
-                )
-            else:
-                call_str = "\t\telse if ({} <= {}) {{\n\t\t\t {}<<<{}, {}, {}>>>({}); \n\t\t}}\n".format(
-                    symbolic,
-                    range_str,
-                    function_name,
-                    grid_str,
-                    block_str,
-                    smem_str,
-                    call_args,
-                )
-            if last_range == num_items - 1:
-                call_str += ("\t\telse {{\n\t\t\t {}<<<{}, {}, {}>>>({}); \n\t\t}}\n".format(
-                    function_name, grid_str, block_str, smem_str, call_args))
-            last_range += 1
-            _call_str += call_str
+            launch_str = "{}<<<{}, {}, {}>>>({});".format(function_name, grid_str, block_str,
+                                                          smem_str, call_args)
+            # the upper bounds of the symbolics that are dispatched to the kernel
+            bounds = {str(k): int(v) for k, v in info["opt_shapes"].items()}
+            if info.get("dispatch_bounds") is not None:
+                bounds.update({str(k): int(v) for k, v in info["dispatch_bounds"].items()})
+            launches.append((bounds, launch_str))
+
+        # Generate a decision tree of the dynamic symbolic ranges, one level per symbol
+        _call_str = self.create_dispatch_tree(list(dynamic_symbolic_set), launches, 2)
 
         # Wrap the kernel dispatch logic in an external C function
         host_func = """
@@ -434,6 +483,38 @@ extern "C" void call({}) {{
         """.format(def_args, _call_str)
         return host_func
 
+    def create_dispatch_tree(self, symbols: List[str], launches: List, depth: int) -> str:
+        """
+        Dispatches on the first symbol by the ranges between the upper bounds of its
+        specializations, e.g. `m <= 16`, `16 < m <= 32` and `m > 32` for the bounds
+        [16, 32, 64], and dispatches on the other symbols within each range. A launch is
+        (upper bound of each symbol, launch statement).
+        """
+        indent = "\t" * depth
+        symbol = symbols[0]
+        values = sorted({int(opt_shapes[symbol]) for opt_shapes, _ in launches})
+        # a single specialization of the symbol is launched for any value without a branch
+        body_depth = depth if len(values) == 1 else depth + 1
+        dispatch_str = ""
+        for i, value in enumerate(values):
+            sub_launches = [item for item in launches if int(item[0][symbol]) == value]
+            if len(symbols) > 1:
+                body = self.create_dispatch_tree(symbols[1:], sub_launches, body_depth)
+            else:
+                body = "{}{}\n".format("\t" * body_depth, sub_launches[0][1])
+            if len(values) == 1:
+                dispatch_str += body
+                continue
+            if i == 0:
+                condition = "if ({} <= {})".format(symbol, value)
+            elif i == len(values) - 1:
+                # the last specialization is launched for the values beyond the range as well
+                condition = "else"
+            else:
+                condition = "else if ({} <= {})".format(symbol, value)
+            dispatch_str += "{}{} {{\n{}{}}}\n".format(indent, condition, body, indent)
+        return dispatch_str
+
     def parse_source_information(self):
         # Parse device module to extract execution configurations for each function
         device_mod = get_annotated_device_mod(self.mod, self.arch.target)
@@ -482,6 +563,7 @@ extern "C" void call({}) {{
                 "block_info": self.block_info[function_name],
                 "grid_info": self.grid_info[function_name],
                 "dynamic_smem_buf": self.dynamic_smem_buf[function_name],
+                "dispatch_bounds": attrs["dispatch_bounds"] if "dispatch_bounds" in attrs else None,
             }
 
         def compare_map_objects(map_obj):
@@ -493,6 +575,11 @@ extern "C" void call({}) {{
                 function_informations.items(),
                 key=lambda item: compare_map_objects(item[1]["opt_shapes"])))
 
+        # every specialization is launched as one kernel, the dispatch can not launch the
+        # other kernels of a specialization (e.g. the fixup kernel of split-k)
+        assert len(function_informations) == len(self.block_info), (
+            "Only support one kernel for each specialization of a dynamic shape kernel.")
+
         self.lib_code = code
 
         # Generate the initialization and dispatch functions
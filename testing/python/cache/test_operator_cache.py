@@ -2,6 +2,7 @@
 # Licensed under the MIT License.
 import pytest
 import os
+import shutil
 import torch
 import bitblas
 from bitblas.ops.matmul import Matmul, MatmulConfig
@@ -285,6 +286,404 @@ def test_global_cache_save_to_database(
     torch.testing.assert_close(permuted_inputs[-1], ref_result, rtol=1e-2, atol=1e-2)
 
 
+@pytest.mark.parametrize(
+    "M,N,K,in_dtype,out_dtype,accum_dtype,with_bias,propagate_a,propagate_b,layout",
+    [
+        (1, 1024, 1024, "float16", "float16", "float16", False, False, False, "nt"),
+    ],
+)
+def test_global_cache_lazy_load_from_database(
+    M,
+    N,
+    K,
+    in_dtype,
+    out_dtype,
+    accum_dtype,
+    with_bias,
+    propagate_a,
+    propagate_b,
+    layout,
+):
+
+    matmul_config = MatmulConfig(
+        M=M,
+        N=N,
+        K=K,
+        in_dtype=in_dtype,
+        out_dtype=out_dtype,
+        accum_dtype=accum_dtype,
+        with_bias=with_bias,
+        propagate_a=propagate_a,
+        propagate_b=propagate_b,
+        layout=layout,
+    )
+    matmul = Matmul(
+        config=matmul_config,
+        target=target,
+    )
+    global_operator_cache.add(matmul.config, matmul)
+    database_path = "debug/test_database"
+    global_operator_cache.save_into_database(database_path, target=target)
+    global_operator_cache.clear()
+
+    global_operator_cache.load_from_database(database_path, target=target)
+    # operators are only registered by the index, nothing is materialized yet
+    assert global_operator_cache.size() > 0
+    assert len(global_operator_cache.cache) == 0
+    assert global_operator_cache.exists(matmul.config)
+
+    matmul = global_operator_cache.get(matmul.config)
+    assert matmul is not None
+    assert len(global_operator_cache.cache) == 1
+
+
+def test_lazy_load_retried_after_failure():
+    from bitblas.cache.operator import OperatorCache
+
+    matmul_config = MatmulConfig(
+        M=1,
+        N=1024,
+        K=1024,
+        in_dtype="float16",
+        out_dtype="float16",
+        accum_dtype="float16",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    matmul = Matmul(config=matmul_config, target=target)
+    database_path = "debug/test_database_lazy_retry"
+    operator_cache = OperatorCache()
+    operator_cache.add(matmul.config, matmul)
+    operator_cache.save_into_database(database_path, target=target)
+
+    operator_cache = OperatorCache()
+    operator_cache.load_from_database(database_path, target=target)
+    load_operator = operator_cache._load_operator
+
+    def failing_load_operator(*args, **kwargs):
+        raise OSError("transient failure")
+
+    operator_cache._load_operator = failing_load_operator
+    assert operator_cache.get(matmul.config) is None
+    # the failed load keeps the entry registered for another attempt
+    assert operator_cache.exists(matmul.config)
+    operator_cache._load_operator = load_operator
+    assert operator_cache.get(matmul.config) is not None
+    assert len(operator_cache.database_entries) == 0
+
+
+def test_bounded_cache_lru_eviction():
+    from bitblas.cache.operator import OperatorCache
+
+    operator_cache = OperatorCache(max_size=2)
+    database_path = "debug/test_database_eviction"
+    matmuls = []
+    for N in [1024, 2048, 4096]:
+        matmul_config = MatmulConfig(
+            M=1,
+            N=N,
+            K=1024,
+            in_dtype="float16",
+            out_dtype="float16",
+            accum_dtype="float16",
+            with_bias=False,
+            propagate_a=False,
+            propagate_b=False,
+            layout="nt",
+        )
+        matmul = Matmul(config=matmul_config, target=target)
+        matmuls.append(matmul)
+        operator_cache.add(matmul.config, matmul)
+        if N == 1024:
+            # only the first operator is persisted, the others are written back on eviction
+            operator_cache.flush(database_path, target=target)
+        if N == 2048:
+            # touch the first operator, the second one becomes the least recently used
+            assert operator_cache.get(matmuls[0].config) is not None
+
+    # the persisted operator is evicted and released before the least recently used one
+    assert operator_cache.stats()["evictions"] == 1
+    assert matmuls[0].rt_mod is None
+    assert matmuls[1].rt_mod is not None
+    assert operator_cache.exists(matmuls[0].config)
+    # the evicted operator is loaded again from the database
+    reloaded = operator_cache.get(matmuls[0].config)
+    assert reloaded is not None and reloaded is not matmuls[0]
+    assert reloaded.rt_mod is not None
+    assert operator_cache.stats()["misses"] == 1
+    # the dirty operators are written back into the database before they are evicted
+    assert operator_cache.stats()["evictions"] == 2
+    assert matmuls[1].rt_mod is None
+    assert operator_cache.exists(matmuls[1].config)
+    assert operator_cache.get(matmuls[1].config) is not None
+    # the library that is compiled in the background is accounted
+    matmuls[2].wait_for_lib()
+    operator_cache.get(matmuls[2].config)
+    assert operator_cache.stats()["nbytes"] >= os.path.getsize(matmuls[2].lib_name)
+
+    operator_cache.remove(matmuls[2].config, release=True)
+    assert matmuls[2].rt_mod is None
+
+
+def test_global_cache_load_from_bundle():
+    from bitblas.cache import export_database_bundle, import_database_bundle
+    from bitblas.cache.operator import OperatorCache, BITBLAS_DATABASE_STAGING_PREFIX
+
+    matmul_config = MatmulConfig(
+        M=1,
+        N=1024,
+        K=1024,
+        in_dtype="float16",
+        out_dtype="float16",
+        accum_dtype="float16",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    matmul = Matmul(config=matmul_config, target=target)
+    operator_cache = OperatorCache()
+    operator_cache.add(matmul.config, matmul)
+    database_path = "debug/test_database"
+    operator_cache.flush(database_path, target=target)
+
+    arch_str = operator_cache._determine_arch_str(matmul, target)
+    bundle_path = "debug/test_database.bundle"
+    assert export_database_bundle(database_path, arch_str, bundle_path) > 0
+    # the bundle is readable by the other users, as a file created by open
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(bundle_path).st_mode & 0o777 == 0o644 & ~umask
+
+    operator_cache = OperatorCache()
+    operator_cache.load_from_bundle(bundle_path, target=target)
+    assert operator_cache.size() > 0
+    assert operator_cache.get(matmul.config) is not None
+
+    import_path = "debug/test_database_import"
+    shutil.rmtree(import_path, ignore_errors=True)
+    assert import_database_bundle(bundle_path, import_path) > 0
+    arch_path = os.path.join(import_path, arch_str)
+    # the staging directories are moved into place or removed
+    assert not any(
+        name.startswith(BITBLAS_DATABASE_STAGING_PREFIX) for name in os.listdir(arch_path))
+
+
+def test_nearest_hints_lookup():
+    from bitblas.cache.operator import OperatorCache
+    from bitblas.base.roller.hint import Hint
+
+    def get_matmul_config(N, K):
+        return MatmulConfig(
+            M=16,
+            N=N,
+            K=K,
+            in_dtype="float16",
+            out_dtype="float16",
+            accum_dtype="float16",
+            with_bias=False,
+            propagate_a=False,
+            propagate_b=False,
+            layout="nt",
+        )
+
+    operator_cache = OperatorCache()
+    matmul = Matmul(config=get_matmul_config(1024, 1024), target=target, enable_tuning=False)
+    matmul.hardware_aware_finetune(topk=10)
+    operator_cache.add(matmul.config, matmul)
+
+    # different dtypes are not comparable
+    other_config = MatmulConfig(
+        M=16,
+        N=2048,
+        K=1024,
+        in_dtype="int8",
+        out_dtype="int32",
+        accum_dtype="int32",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    assert operator_cache.get_nearest_hints(other_config) == {}
+
+    nearest_hints = operator_cache.get_nearest_hints(get_matmul_config(2048, 1024), topk=3)
+    assert len(nearest_hints[""]) == 1
+    configs = {k: [Hint.deserialize(hint) for hint in hints] for k, hints in nearest_hints.items()}
+    matmul = Matmul(config=get_matmul_config(2048, 1024), target=target, enable_tuning=False)
+    matmul.hardware_aware_finetune(configs=configs)
+    assert matmul.optimized_func is not None
+    assert matmul.tuned_configs[""].serialize()["block"] == nearest_hints[""][0]["block"]
+
+
+def test_stale_entries_of_another_build():
+    import json
+    import tempfile
+    from bitblas.cache.operator import OperatorCache, BITBLAS_DATABASE_INDEX
+
+    matmul_config = MatmulConfig(
+        M=1,
+        N=1024,
+        K=1024,
+        in_dtype="float16",
+        out_dtype="float16",
+        accum_dtype="float16",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    matmul = Matmul(config=matmul_config, target=target)
+    operator_cache = OperatorCache()
+    operator_cache.add(matmul.config, matmul)
+    database_path = tempfile.mkdtemp()
+    operator_cache.flush(database_path, target=target)
+
+    operator_cache = OperatorCache(version_policy="invalidate")
+    operator_cache.load_from_database(database_path, target=target)
+    assert operator_cache.exists(matmul.config)
+
+    # pretend the entry is built by an older version
+    index_path = os.path.join(database_path, operator_cache._determine_arch_str(matmul, target),
+                              BITBLAS_DATABASE_INDEX)
+    with open(index_path) as f:
+        index = json.load(f)
+    for entry in index.values():
+        entry["fingerprint"] = {"bitblas": "0.0.0"}
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+
+    operator_cache = OperatorCache(version_policy="invalidate")
+    operator_cache.load_from_database(database_path, target=target)
+    assert not operator_cache.exists(matmul.config)
+    assert len(operator_cache.stale_entries) == 1
+
+    operator_cache = OperatorCache(version_policy="prefer")
+    operator_cache.load_from_database(database_path, target=target)
+    assert operator_cache.get(matmul.config) is not None
+
+
+def test_transfer_hints_from_closest_arch():
+    import tempfile
+    from dataclasses import asdict
+    from bitblas.cache.operator import OperatorCache, get_config_hash
+
+    matmul_config = MatmulConfig(
+        M=16,
+        N=1024,
+        K=1024,
+        in_dtype="float16",
+        out_dtype="float16",
+        accum_dtype="float16",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    operator_cache = OperatorCache()
+    database_path = tempfile.mkdtemp()
+    for arch_str, block in [("cuda-gpu-sm_70", [32, 32]), ("cuda-gpu-sm_86", [64, 64]),
+                            ("llvm-cpu-sm_80", [16, 16])]:
+        arch_path = os.path.join(database_path, arch_str)
+        os.makedirs(arch_path)
+        operator_cache._write_index(
+            arch_path, {
+                get_config_hash(matmul_config): {
+                    "config_type": "MatmulConfig",
+                    "operator_type": "Matmul",
+                    "config": asdict(matmul_config),
+                    "hints": {
+                        "": {
+                            "block": block
+                        }
+                    },
+                }
+            })
+
+    hints = operator_cache.get_transfer_hints(matmul_config, database_path, "cuda-gpu-sm_80")
+    assert hints == {"": [{"block": [64, 64]}]}
+    assert operator_cache.get_transfer_hints(matmul_config, database_path, "cuda-gpu-sm_86") == {
+        "": [{
+            "block": [32, 32]
+        }]
+    }
+
+
+def test_database_maintenance():
+    import tempfile
+    from bitblas.cache.operator import OperatorCache, BITBLAS_DATABASE_MARKER
+    from bitblas.cache.maintenance import verify_database, collect_garbage, report_database
+
+    operator_cache = OperatorCache()
+    for N in [1024, 2048]:
+        matmul_config = MatmulConfig(
+            M=1,
+            N=N,
+            K=1024,
+            in_dtype="float16",
+            out_dtype="float16",
+            accum_dtype="float16",
+            with_bias=False,
+            propagate_a=False,
+            propagate_b=False,
+            layout="nt",
+        )
+        matmul = Matmul(config=matmul_config, target=target)
+        operator_cache.add(matmul.config, matmul)
+    database_path = tempfile.mkdtemp()
+    operator_cache.flush(database_path, target=target)
+    arch_str = operator_cache._determine_arch_str(matmul, target)
+    assert report_database(database_path)[arch_str]["entries"] == 2
+    assert verify_database(database_path) == {arch_str: {}}
+
+    # corrupt the source of an entry
+    hash_str = next(iter(operator_cache._read_index(os.path.join(database_path, arch_str))))
+    with open(os.path.join(database_path, arch_str, hash_str, "source.cu"), "a") as f:
+        f.write("// corrupted")
+    assert hash_str in verify_database(database_path)[arch_str]
+    assert collect_garbage(database_path)[arch_str]["removed"] == 1
+    assert report_database(database_path)[arch_str]["entries"] == 1
+    assert verify_database(database_path) == {arch_str: {}}
+
+    # an entry saved by an older version has no completion marker, it is still valid
+    legacy_path = next(
+        path for path in (os.path.join(database_path, arch_str, directory)
+                          for directory in os.listdir(os.path.join(database_path, arch_str)))
+        if os.path.isdir(path) and not os.path.basename(path).startswith("."))
+    os.remove(os.path.join(legacy_path, BITBLAS_DATABASE_MARKER))
+    assert verify_database(database_path) == {arch_str: {}}
+    assert report_database(database_path)[arch_str]["complete_entries"] == 1
+    assert collect_garbage(database_path)[arch_str]["removed"] == 0
+    # the garbage collection completes the legacy entry
+    assert os.path.exists(os.path.join(legacy_path, BITBLAS_DATABASE_MARKER))
+
+
+
+def test_wrapper_cache_maintenance():
+    import tempfile
+    import time
+    from hashlib import sha256
+    from bitblas.cache.maintenance import report_wrapper_cache, collect_wrapper_cache_garbage
+
+    cache_path = tempfile.mkdtemp()
+    keys = [sha256(str(i).encode()).hexdigest() for i in range(3)]
+    for i, key in enumerate(keys):
+        for ext in (".cu", ".so"):
+            path = os.path.join(cache_path, key + ext)
+            with open(path, "wb") as f:
+                f.write(b"x" * 1024)
+            # the first library is the least recently used one
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+    assert report_wrapper_cache(cache_path) == {"libraries": 3, "nbytes": 6 * 1024}
+
+    result = collect_wrapper_cache_garbage(cache_path, max_nbytes=4 * 1024)
+    assert result == {"removed": 1, "freed_nbytes": 2 * 1024}
+    assert not os.path.exists(os.path.join(cache_path, keys[0] + ".so"))
+    assert os.path.exists(os.path.join(cache_path, keys[1] + ".so"))
+
+
 @pytest.mark.parametrize(
     "M,N,K,in_dtype,out_dtype,accum_dtype,bit,storage_dtype,source_format,with_scaling,with_zeros,group_size,fast_decoding,with_bias,propagate_a,propagate_b,layout",
     [
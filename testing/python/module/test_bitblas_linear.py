@@ -48,6 +48,22 @@ def test_correctness_consistent(m, in_features, out_features, bias):
     torch.testing.assert_close(output_torch, output_bitblas, rtol=1e-1, atol=1e-2)
 
 
+def test_correctness_without_lib():
+    linear_torch = (nn.Linear(512, 1024, bias=False).to(torch.float16).cuda())
+    linear_bitblas = BitBLASLinear(512, 1024, bias=False, opt_M=1).cuda()
+    with torch.no_grad():
+        linear_bitblas.load_and_transform_weight(linear_torch.weight.clone())
+    # the operators without the C wrapper library fall back to the runtime module
+    assert linear_bitblas.bitblas_matmul.lib is not None
+    linear_bitblas.bitblas_matmul.lib = None
+
+    with torch.no_grad():
+        input_data = torch.randn(1, 1, 512, dtype=torch.float16).cuda()
+        output_torch = linear_torch(input_data)
+        output_bitblas = linear_bitblas(input_data)
+    torch.testing.assert_close(output_torch, output_bitblas, rtol=1e-1, atol=1e-2)
+
+
 @pytest.mark.parametrize(
     "m, in_features, out_features, bias, W_dtype, group_size, with_scaling, with_zeros, zeros_mode",
     [
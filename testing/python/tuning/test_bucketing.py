@@ -0,0 +1,26 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import bitblas
+from bitblas.base.bucketing import select_dynamic_buckets
+
+
+def test_select_dynamic_buckets():
+    # decoding traffic of M in 1-8, and prefill traffic of M in 300-2000
+    histogram = {1: 50, 2: 30, 4: 10, 8: 20}
+    histogram.update({m: 2 for m in range(300, 2001, 50)})
+
+    buckets = select_dynamic_buckets(histogram, max_buckets=4)
+    assert len(buckets) <= 4
+    # the decoding traffic gets its own small bucket, and the largest M is always covered
+    assert buckets[0] <= 8
+    assert buckets[-1] == 2000
+
+    # the tuning budget only allows two buckets
+    assert len(
+        select_dynamic_buckets(histogram, max_buckets=7, time_budget=100,
+                               tuning_time_per_bucket=40)) == 2
+    assert select_dynamic_buckets({16: 1}) == [16]
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+import tvm
+import bitblas
+from bitblas.base.build_cache import BuildCache, get_build_key
+
+
+def test_build_cache_round_trip():
+    build_cache = BuildCache(tempfile.mkdtemp())
+    key = "ab" * 32
+    assert build_cache.get(key) is None
+
+    artifact_path = os.path.join(tempfile.mkdtemp(), "tvm_tmp_mod.tar")
+    with open(artifact_path, "wb") as f:
+        f.write(b"artifact")
+    cached_path = build_cache.put(key, artifact_path, "__global__ void main_kernel() {}", 1.5)
+    assert cached_path != artifact_path
+
+    # another process sees the same entry
+    cached_path, source, build_time = BuildCache(build_cache.path).get(key)
+    with open(cached_path, "rb") as f:
+        assert f.read() == b"artifact"
+    assert source == "__global__ void main_kernel() {}"
+    assert build_time == 1.5
+    # the first stored artifact is kept
+    assert build_cache.put(key, artifact_path, "", 2.0) == cached_path
+
+
+def test_build_key_of_another_build(monkeypatch):
+    from tvm import te
+    from bitblas.cache import operator
+
+    A = te.placeholder((128,), name="A")
+    B = te.compute((128,), lambda i: A[i] + 1, name="B")
+    mod = tvm.IRModule.from_expr(te.create_prim_func([A, B]))
+    key = get_build_key(mod, "cuda", {"tir.use_async_copy": True})
+    assert get_build_key(mod, "cuda", {"tir.use_async_copy": True}) == key
+
+    # the artifacts of another BitBLAS, TVM or schedule rules source are not reused
+    fingerprint = {**operator.get_build_fingerprint(), "sources": "another build"}
+    monkeypatch.setattr(operator, "get_build_fingerprint", lambda: fingerprint)
+    assert get_build_key(mod, "cuda", {"tir.use_async_copy": True}) != key
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+import random
+import bitblas
+from bitblas.base.cost_model import HintCostModel
+from bitblas.base.tuning_log import TuningRecord, TUNING_BUILD_ERROR
+
+
+def _synthetic_hint(block_m, block_n, rstep):
+    return {
+        "use_tc": True,
+        "block": [block_m, block_n],
+        "warp": [block_m // 2, block_n // 2],
+        "rstep": [rstep],
+        "pipeline_stage": 2,
+    }
+
+
+def _synthetic_latency(hint):
+    # larger tiles are faster until they run out of shared memory
+    block_m, block_n = hint["block"]
+    smem = (block_m + block_n) * hint["rstep"][0]
+    return 1.0 / (block_m * block_n) + (1.0 if smem > 8192 else 0.0)
+
+
+def test_cost_model_ranking():
+    random.seed(0)
+    records = []
+    for workload in ["w0", "w1"]:
+        for block_m in [16, 32, 64, 128]:
+            for block_n in [16, 32, 64, 128]:
+                for rstep in [16, 32, 64]:
+                    hint = _synthetic_hint(block_m, block_n, rstep)
+                    latency = _synthetic_latency(hint) * random.uniform(0.95, 1.05)
+                    records.append(
+                        TuningRecord(workload=workload, target="cuda", hint=hint, latency=latency))
+    records.append(
+        TuningRecord(
+            workload="w0",
+            target="cuda",
+            hint=_synthetic_hint(256, 256, 64),
+            status=TUNING_BUILD_ERROR))
+
+    model = HintCostModel().fit_records(records)
+    assert model.is_fitted
+    candidates = [_synthetic_hint(128, 128, 64), _synthetic_hint(16, 16, 16),
+                  _synthetic_hint(64, 64, 32)]
+    # the tiles that run out of shared memory and the smallest tiles are pruned
+    assert model.prune(candidates, 1) == [candidates[2]]
+
+    path = os.path.join(tempfile.mkdtemp(), "cost_model.json")
+    model.save(path)
+    loaded = HintCostModel.load(path)
+    assert (loaded.predict(candidates) == model.predict(candidates)).all()
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,37 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+import tvm
+import bitblas
+from bitblas.base.roller.arch import CUDA, DeviceProfile, get_device_profile
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.ops.impl.matmul_impl import matmul_nt
+
+
+def test_get_device_profile():
+    a100 = get_device_profile(tvm.target.Target("nvidia/nvidia-a100"))
+    assert a100.sm_version == 80 and a100.compute_max_core == 108
+    # the targets without a known tag fall back to their SM version
+    assert get_device_profile("cuda -arch=sm_80", sm_version=80) is a100
+    assert get_device_profile("cuda", sm_version=-1) is None
+
+
+def test_offline_arch_from_json():
+    profile = DeviceProfile(
+        "my-gpu", sm_version=80, compute_max_core=64, l2_cache_size_bytes=8 * 1024 * 1024,
+        memory_bandwidth_gbps=1000)
+    path = os.path.join(tempfile.mkdtemp(), "my-gpu.json")
+    profile.to_json(path)
+    arch = CUDA.from_json(path)
+    assert arch.sm_version == 80
+    assert arch.compute_max_core == 64
+    assert arch.l2_cache_size_bytes == 8 * 1024 * 1024
+    # the roller plans with the profile, only the measurement needs the device
+    func = matmul_nt(1024, 1024, 1024, "float16", "float16")["main"]
+    configs = DefaultPolicy(func=func, arch=arch).emit_config(5)
+    assert len(configs) > 0
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import bitblas
+from tvm.script import tir as T
+from bitblas.base.utils import create_dispatch_mod
+
+
+@T.prim_func
+def add_one(a: T.handle, b: T.handle):
+    T.func_attr({"global_symbol": "add_one"})
+    m = T.int32()
+    n = T.int32()
+    A = T.match_buffer(a, (m, n), "float16")
+    B = T.match_buffer(b, (m, n), "float16")
+    for i, j in T.grid(m, n):
+        with T.block("B"):
+            vi, vj = T.axis.remap("SS", [i, j])
+            B[vi, vj] = A[vi, vj] + T.float16(1)
+
+
+def test_multi_dim_dispatch():
+    specialized_funcs = [
+        add_one.with_attr("opt_shapes", {
+            "m": m,
+            "n": n
+        }) for m in [16, 64] for n in [128, 256, 1024]
+    ]
+    dispatch_mod = create_dispatch_mod("add_one", add_one, specialized_funcs)
+    # one kernel of each (m, n) bucket and the dispatch function
+    assert len(dispatch_mod.functions) == 7
+    script = dispatch_mod["add_one"].script()
+    assert "m <= 16" in script
+    assert "n <= 128" in script
+    assert "128 < n and n <= 256" in script or "n > 128 and n <= 256" in script
+
+
+def test_wrapper_multi_dim_dispatch():
+    import re
+    from tvm import IRModule
+    from bitblas.wrapper.general import CUDASourceWrapperWithDynamic
+
+    # only the dispatch function is rendered, nothing is lowered or compiled
+    wrapper = CUDASourceWrapperWithDynamic.__new__(CUDASourceWrapperWithDynamic)
+    wrapper.mod = IRModule({"main": add_one})
+    wrapper.function_name = None
+    code = "".join(
+        f"extern \"C\" __global__ void __launch_bounds__(128) kernel_{i}"
+        "(half* __restrict__ A, half* __restrict__ B, int m, int n) {\n  int tx = 0;\n}\n"
+        for i in range(4))
+    function_informations = {}
+    for m, n, dispatch_bounds in [(16, 128, {"m": 32, "n": 256}), (16, 1024, {"m": 32}),
+                                  (64, 128, {"n": 256}), (64, 1024, None)]:
+        function_informations[f"kernel_m{m}_n{n}"] = {
+            "opt_shapes": {
+                "m": m,
+                "n": n
+            },
+            "block_info": [128, 1, 1],
+            "grid_info": [1024, 1, 1],
+            "dynamic_smem_buf": None,
+            "dispatch_bounds": dispatch_bounds,
+        }
+    host_func = wrapper.create_dispatch_func(code, function_informations)
+    assert "void call(half* __restrict__ A, half* __restrict__ B, int m, int n)" in host_func
+    # the branches are dispatched at the measured crossover points, m first and n within
+    branches = re.findall(r"if \(\w+ <= \d+\)|else|\w+(?=<<<)", host_func)
+    assert branches == [
+        "if (m <= 32)", "if (n <= 256)", "kernel_m16_n128", "else", "kernel_m16_n1024",
+        "else", "if (n <= 256)", "kernel_m64_n128", "else", "kernel_m64_n1024"
+    ]
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
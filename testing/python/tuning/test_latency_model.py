@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+from dataclasses import replace
+import bitblas
+from bitblas.base.roller.arch import CUDA, DEVICE_PROFILES
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.base.roller.latency_model import KernelCost, LatencyModel, LatencyModelParams
+from bitblas.ops.impl.matmul_impl import matmul_nt
+
+
+def _get_arch():
+    return CUDA("cuda -arch=sm_80", profile=DEVICE_PROFILES["nvidia/nvidia-a100"])
+
+
+def test_predict_waves_and_roofline():
+    model = LatencyModel(_get_arch())
+    gemv = KernelCost(grid_size=432, block_per_SM=4, flops=2 * 16384, traffic_bytes=32768)
+    # the tail of one more block is another wave
+    assert model.predict(replace(gemv, grid_size=433)) > model.predict(gemv)
+    # a memory bound kernel scales with its traffic, not its flops
+    assert model.predict(replace(gemv, traffic_bytes=65536)) > 1.5 * model.predict(gemv)
+    assert model.predict(replace(gemv, flops=4 * 16384)) < 1.1 * model.predict(gemv)
+    # the decode of the weights is not free
+    assert model.predict(replace(gemv, decode_elements=16384)) > model.predict(gemv)
+
+
+def test_fit_and_save():
+    arch = _get_arch()
+    truth = LatencyModel(arch)
+    truth.params = replace(
+        truth.params,
+        memory_bandwidth_gbps=truth.params.memory_bandwidth_gbps / 2,
+        launch_overhead_us=8.0)
+    costs = [
+        KernelCost(grid_size=g, block_per_SM=2, flops=2 * 64 * 4096, traffic_bytes=t)
+        for g in (16, 216, 1024) for t in (1 << 16, 1 << 20)
+    ]
+    samples = [(cost, truth.predict(cost)) for cost in costs]
+    model = LatencyModel(arch).fit(samples)
+    for cost, latency in samples:
+        assert abs(model.predict(cost) - latency) / latency < 0.1
+
+    path = os.path.join(tempfile.mkdtemp(), "model.json")
+    model.save(path)
+    assert LatencyModel.load(path, arch).params == model.params
+    assert isinstance(model.params, LatencyModelParams)
+
+
+def test_policy_ranks_by_predicted_latency():
+    func = matmul_nt(1024, 1024, 1024, "float16", "float16")["main"]
+    policy = DefaultPolicy(func=func, arch=_get_arch())
+    configs = policy.emit_config(5)
+    assert len(configs) > 0
+    latencies = [policy.estimate_latency(config) for config in configs]
+    assert all(0 < latency < float("inf") for latency in latencies)
+    # the legalized hints are ranked by the predicted latency
+    legalized = policy.legalize_configs(configs, topk=5)
+    ranked = [policy.estimate_latency(config) for config in legalized]
+    assert ranked == sorted(ranked)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,39 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import numpy as np
+import tvm
+import bitblas
+from bitblas.base.measure import (
+    MeasureResult,
+    get_num_rotating_buffers,
+    get_rotating_buffers,
+)
+
+
+def test_measure_result_statistics():
+    result = MeasureResult([1.0, 1.1, 0.9, 5.0])
+    # the median is not skewed by the outlier
+    assert abs(result.median - 1.05) < 1e-9
+    assert result.min == 0.9
+    assert result.percentile(100) == 5.0
+    assert MeasureResult([1.0]).cv == 0.0
+    assert MeasureResult([1.0, 1.0, 1.0]).cv == 0.0
+
+
+def test_rotating_buffers():
+    args = [
+        tvm.nd.array(np.random.uniform(0, 1, [1024, 1024]).astype("float16")),
+        tvm.nd.array(np.zeros([1024], dtype="float16")),
+    ]
+    # the 2 MiB of args overflow twice of a 4 MiB cache with 4 sets
+    assert get_num_rotating_buffers(args, 4 * 1024 * 1024) == 4
+    assert get_num_rotating_buffers(args, 1) == 1
+    buffers = get_rotating_buffers(args, 3)
+    assert len(buffers) == 3
+    assert buffers[0][0] is args[0]
+    np.testing.assert_equal(buffers[2][0].numpy(), args[0].numpy())
+    assert buffers[2][0] is not args[0]
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
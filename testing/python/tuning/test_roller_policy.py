@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import bitblas
+from bitblas.base.roller import Hint
+from bitblas.base.roller.arch import CUDA, DEVICE_PROFILES
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.ops.impl.matmul_impl import matmul_nt
+
+
+def test_compute_tile_dicts_batch():
+    func = matmul_nt(1, 16384, 16384, "float16", "float16")["main"]
+    arch = CUDA("cuda -arch=sm_80", profile=DEVICE_PROFILES["nvidia/nvidia-a100"])
+    policy = DefaultPolicy(func=func, arch=arch)
+    rstep_map = {"k": 128}
+    tiles = [[1, 64], [1, 128], [1, 16384]]
+    batch = policy.compute_tile_dicts(tiles, rstep_map)
+    # the values of the per tile implementation, A and B are read with the full K, and
+    # their tiles of the reduction step are cached in the shared memory
+    expected = [
+        (True, 32768 + 64 * 16384 * 2 + 128, 128 * 2 + 64 * 128 * 2, 256, 4, 1),
+        (True, 32768 + 128 * 16384 * 2 + 256, 128 * 2 + 128 * 128 * 2, 128, 2, 1),
+        # the cached tile of B exceeds the shared memory of a block
+        (False, None, None, None, None, None),
+    ]
+    for td, (valid, traffic, smem_cost, grid_size, block_per_SM, num_wave) in zip(
+            batch, expected):
+        assert td.valid == valid
+        if td.valid:
+            assert (td.traffic, td.smem_cost, td.grid_size, td.block_per_SM,
+                    td.num_wave) == (traffic, smem_cost, grid_size, block_per_SM, num_wave)
+    # the batch agrees with the single tile entry point
+    single = policy.compute_tile_dict(tiles[0], rstep_map)
+    assert (single.traffic, single.smem_cost, single.num_wave) == (batch[0].traffic,
+                                                                   batch[0].smem_cost,
+                                                                   batch[0].num_wave)
+
+
+def test_emit_config_memoized():
+    func = matmul_nt(1, 1024, 1024, "float16", "float16")["main"]
+    arch = CUDA("cuda -arch=sm_80", profile=DEVICE_PROFILES["nvidia/nvidia-a100"])
+    policy = DefaultPolicy(func=func, arch=arch)
+    configs = policy.emit_config(10)
+    num_cached = len(policy.prim_func_node._propagate_cache)
+    assert num_cached > 0
+    # the shape inference of the same tiles is not run again
+    assert [c.block for c in policy.emit_config(10)] == [c.block for c in configs]
+    assert len(policy.prim_func_node._propagate_cache) == num_cached
+
+
+def test_legalize_configs():
+    func = matmul_nt(1, 1024, 1024, "float16", "float16")["main"]
+    arch = CUDA("cuda -arch=sm_80", profile=DEVICE_PROFILES["nvidia/nvidia-a100"])
+    policy = DefaultPolicy(func=func, arch=arch)
+    config = policy.emit_config(1)[0]
+    assert len(policy.legalize_configs([Hint.deserialize(config.serialize())])) == 1
+    # the tensor core hints can not be scheduled by the default policy
+    tc_config = Hint.deserialize({**config.serialize(), "use_tc": True})
+    assert policy.legalize_configs([tc_config]) == []
+    # the hints that exceed the thread limit of the arch are dropped
+    large_config = Hint.deserialize({**config.serialize(), "thread": [1, 2048]})
+    assert policy.legalize_configs([large_config]) == []
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
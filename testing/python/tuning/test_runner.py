@@ -0,0 +1,35 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+import numpy as np
+import tvm
+from tvm import te, rpc
+from tvm.contrib.tar import tar
+import bitblas
+from bitblas.base.measure import MeasureOption, measure_latency
+from bitblas.base.runner import RPCRunner
+
+
+def test_rpc_runner_local_session():
+    A = te.placeholder((1024,), name="A")
+    B = te.compute((1024,), lambda i: A[i] + 1.0, name="B")
+    rt_mod = tvm.build(te.create_prim_func([A, B]), target="llvm")
+    artifact_path = os.path.join(tempfile.mkdtemp(), "mod.tar")
+    rt_mod.export_library(artifact_path, fcompile=tar)
+
+    # the local session stands in for the RPC server of a GPU node
+    runner = RPCRunner(session=rpc.LocalSession(), device_type="cpu")
+    remote_mod = runner.load_module(artifact_path)
+    # the uploaded artifact is removed from the remote once it is loaded
+    assert not any(name.endswith("mod.tar") for name in runner.session.listdir("."))
+    a = tvm.nd.array(np.zeros(1024, dtype="float32"), device=runner.device)
+    b = tvm.nd.array(np.zeros(1024, dtype="float32"), device=runner.device)
+    remote_mod(a, b)
+    np.testing.assert_allclose(b.numpy(), np.ones(1024))
+    result = measure_latency(remote_mod, [a, b], runner.device, MeasureOption(repeat=2))
+    assert len(result.samples) == 2 and result.median > 0
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
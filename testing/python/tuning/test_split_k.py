@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import numpy as np
+import pytest
+import tvm
+import bitblas
+from bitblas.base.roller import Hint
+from bitblas.base.roller.arch import CUDA, DEVICE_PROFILES
+from bitblas.base.roller.policy import TensorCorePolicy
+from bitblas.gpu import MatmulTensorizationMMA, MatmulTensorizationMMAWithDequantizeInfo
+from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
+from bitblas.ops.impl.matmul_impl import matmul_nt
+from bitblas.ops.impl.matmul_dequantize_impl import matmul_nt_dequantize_b
+from bitblas.quantization.utils import general_compress
+
+
+def _get_policy(M, N, K, arch):
+    func = matmul_nt(M, N, K, "float16", "float16", "float32")["main"]
+    tensorized_func, tags = get_tensorized_func_and_tags(func, arch.target)
+    return func, TensorCorePolicy(func=tensorized_func, arch=arch, tags=tags)
+
+
+def test_split_k_hint_serialize():
+    hint = Hint.deserialize({"use_tc": True, "block": [16, 128], "rstep": [32]})
+    assert hint.split_k_factor == 1
+    # the hints without split-k keep their serialized keys
+    assert "split_k_factor" not in hint.serialize()
+    hint.split_k_factor = 4
+    assert Hint.deserialize(hint.serialize()).split_k_factor == 4
+
+
+def test_emit_split_k_configs():
+    arch = CUDA("cuda -arch=sm_80", profile=DEVICE_PROFILES["nvidia/nvidia-a100"])
+    # the few blocks of a decode shape can not occupy the 108 SMs
+    _, policy = _get_policy(16, 1024, 8192, arch)
+    configs = policy.emit_config(20)
+    split_k_configs = [config for config in configs if config.split_k_factor > 1]
+    assert len(split_k_configs) > 0
+    for config in split_k_configs:
+        assert config.split_k_factor in policy.get_split_k_factors(config)
+    # the operators that are launched by the single kernel C wrapper do not use split-k
+    _, policy = _get_policy(16, 1024, 8192, arch)
+    policy.max_split_k_factor = 1
+    assert all(config.split_k_factor == 1 for config in policy.emit_config(20))
+    assert policy.legalize_configs(split_k_configs) == []
+    # a large matmul occupies the SMs without split-k
+    _, policy = _get_policy(4096, 4096, 4096, arch)
+    assert all(config.split_k_factor == 1 for config in policy.emit_config(20))
+
+
+@pytest.mark.parametrize("M", [16, 20])
+def test_split_k_schedule_correctness(M):
+    arch = CUDA("nvidia/nvidia-a100")
+    _, policy = _get_policy(16, 1024, 8192, arch)
+    config = next(config for config in policy.emit_config(20) if config.split_k_factor > 1)
+    # an M that does not divide the block is padded before the reduction is partitioned
+    func = matmul_nt(M, 1024, 8192, "float16", "float16", "float32")["main"]
+    sch = MatmulTensorizationMMA().apply_config(func, config)
+    assert sch is not None
+    with tvm.transform.PassContext(config={"tir.use_async_copy": True}):
+        rt_mod = tvm.build(sch.mod["main"], target=arch.target)
+
+    a = np.random.uniform(-1, 1, (M, 8192)).astype("float16")
+    b = np.random.uniform(-1, 1, (1024, 8192)).astype("float16")
+    args = [tvm.nd.array(x, arch.device) for x in (a, b, np.zeros((M, 1024), "float16"))]
+    rt_mod(*args)
+    ref = a.astype("float32") @ b.astype("float32").T
+    np.testing.assert_allclose(args[2].numpy(), ref, rtol=1e-2, atol=1e-1)
+
+
+def test_split_k_dequantize_schedule_correctness():
+    arch = CUDA("nvidia/nvidia-a100")
+    M, N, K = 16, 1024, 8192
+    func = matmul_nt_dequantize_b(
+        M, N, K, "float16", "float16", "float32", bit=4, storage_dtype="int8")["main"]
+    tensorized_func, tags = get_tensorized_func_and_tags(func, arch.target)
+    policy = TensorCorePolicy(func=tensorized_func, arch=arch, tags=tags)
+    config = next(config for config in policy.emit_config(20) if config.split_k_factor > 1)
+    sch = MatmulTensorizationMMAWithDequantizeInfo().apply_config(func, config)
+    assert sch is not None
+    with tvm.transform.PassContext(config={"tir.use_async_copy": True}):
+        rt_mod = tvm.build(sch.mod["main"], target=arch.target)
+
+    a = np.random.uniform(-1, 1, (M, K)).astype("float16")
+    w = np.random.randint(0, 16, (N, K)).astype("int8")
+    args = [
+        tvm.nd.array(x, arch.device)
+        for x in (a, general_compress(w, source_bits=4), np.zeros((M, N), "float16"))
+    ]
+    rt_mod(*args)
+    ref = a.astype("float32") @ w.astype("float32").T
+    np.testing.assert_allclose(args[2].numpy(), ref, rtol=1e-2, atol=1e-1)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
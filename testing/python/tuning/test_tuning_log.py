@@ -0,0 +1,88 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import tempfile
+import bitblas
+from bitblas.base.tuning_log import (
+    TuningLog,
+    TuningRecord,
+    TUNING_SUCCESS,
+    TUNING_BUILD_ERROR,
+    TUNING_RUNTIME_ERROR,
+    get_hint_key,
+)
+
+
+def test_tuning_log_query():
+    tuning_log = TuningLog(os.path.join(tempfile.mkdtemp(), "tuning_log.jsonl"))
+    hints = [{"block": [128, 128], "rstep": [32]}, {"block": [64, 128], "rstep": [32]}]
+    tuning_log.append([
+        TuningRecord(workload="w0", target="cuda", hint=hints[0], latency=0.2),
+        TuningRecord(workload="w0", target="cuda", hint=hints[1], latency=0.1),
+        TuningRecord(workload="w1", target="cuda", hint=hints[0], latency=0.05),
+        TuningRecord(
+            workload="w0",
+            target="cuda",
+            hint={"block": [256, 256]},
+            status=TUNING_BUILD_ERROR,
+            error="out of shared memory"),
+        TuningRecord(
+            workload="w0", target="cuda", hint={"block": [16, 16]}, status=TUNING_RUNTIME_ERROR),
+    ])
+    # a truncated line of an interrupted writer is skipped
+    with open(tuning_log.path, "a") as f:
+        f.write('{"workload": "w0", "targ')
+
+    assert len(tuning_log.load("w0", "cuda")) == 4
+    assert tuning_log.get_best_hints("w0", "cuda") == [hints[1], hints[0]]
+    assert tuning_log.get_best_hints("w0", "cuda", topk=1) == [hints[1]]
+    # only the build failures are skipped, runtime errors may be transient
+    assert tuning_log.get_failed_hints("w0", "cuda") == {get_hint_key({"block": [256, 256]})}
+    assert tuning_log.get_failed_hints("w0", "llvm") == set()
+
+
+def test_tuning_log_failed_hints_of_another_build():
+    tuning_log = TuningLog(os.path.join(tempfile.mkdtemp(), "tuning_log.jsonl"))
+    hints = [{"block": [256, 256]}, {"block": [128, 256]}, {"block": [64, 256]}]
+    tuning_log.append([
+        TuningRecord(
+            workload="w0",
+            target="cuda",
+            hint=hints[0],
+            status=TUNING_BUILD_ERROR,
+            fingerprint={"tvm": "another commit"}),
+        TuningRecord(workload="w0", target="cuda", hint=hints[1], status=TUNING_BUILD_ERROR),
+        TuningRecord(workload="w0", target="cuda", hint=hints[2], status=TUNING_BUILD_ERROR),
+    ])
+    # the candidate that fails no longer is not skipped anymore
+    tuning_log.append(
+        [TuningRecord(workload="w0", target="cuda", hint=hints[2], status=TUNING_SUCCESS)])
+    assert tuning_log.get_failed_hints("w0", "cuda") == {get_hint_key(hints[1])}
+
+
+def test_tuning_log_incremental_index_and_compaction():
+    path = os.path.join(tempfile.mkdtemp(), "tuning_log.jsonl")
+    tuning_log = TuningLog(path, max_bytes=None)
+    hint = {"block": [128, 128]}
+    tuning_log.append([TuningRecord(workload="w0", target="cuda", hint=hint, latency=0.2)])
+    assert len(tuning_log.load("w0", "cuda")) == 1
+    # the records appended by another process are indexed by the next query
+    TuningLog(path).append([TuningRecord(workload="w0", target="cuda", hint=hint, latency=0.1)])
+    assert len(tuning_log.load("w0", "cuda")) == 2
+
+    tuning_log.compact()
+    records = tuning_log.load("w0", "cuda")
+    assert len(records) == 1 and records[0].latency == 0.1
+
+    # the log is compacted when it grows over its size cap
+    tuning_log.max_bytes = 4096
+    for i in range(64):
+        tuning_log.append(
+            [TuningRecord(workload="w1", target="cuda", hint={"block": [i]}, latency=i)])
+    assert os.path.getsize(path) <= tuning_log.max_bytes
+    latencies = [record.latency for record in tuning_log.load("w1", "cuda")]
+    assert 63 in latencies and 0 not in latencies
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+from types import SimpleNamespace
+import bitblas
+from bitblas import MatmulConfig
+from bitblas.base import TuningSession
+from bitblas.base.roller import Hint
+
+
+def test_tuning_session_dedupe():
+    session = TuningSession("cuda", topk=10, show_progress=False)
+    configs = [
+        MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", W_dtype="int4"),
+        MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", W_dtype="int4"),
+        MatmulConfig(M=128, N=1024, K=1024, A_dtype="float16", W_dtype="int4"),
+    ]
+    indices = [session.add(config) for config in configs]
+    assert indices == [0, 1, 2]
+    # the identical workloads are only tuned once
+    assert len(session) == 2
+    # the build pool is only created when it is used
+    assert session._builder is None
+    session.close()
+
+
+def test_tuning_session_budget(tmp_path):
+    checkpoint_path = str(tmp_path / "session.json")
+    session = TuningSession(
+        "cuda", topk=20, show_progress=False, candidate_budget=12, checkpoint_path=checkpoint_path)
+    small = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", W_dtype="int4")
+    large = MatmulConfig(M=1, N=1024, K=1024 * 3, A_dtype="float16", W_dtype="int4")
+    session.add(small)
+    session.add(large)
+    keys = list(session._tasks)
+    # the candidates are distributed by the flops of the workloads
+    assert session._get_budget(keys[0], keys, 0.0)[0] == 3
+    assert session._get_budget(keys[1], keys, 0.0)[0] == 9
+
+    # a failed workload is not finished, and is tuned again with its budget on resume
+    hint = Hint.deserialize({"block": [1, 128], "rstep": [128]})
+    calls = []
+
+    def tune_config(config, topk, deadline, configs):
+        calls.append((config, topk, configs))
+        if config is large:
+            raise RuntimeError("failed to build")
+        return SimpleNamespace(tuned_configs={"": hint})
+
+    session._tune_config = tune_config
+    session.run()
+    assert session._get_checkpoint_key(keys[0]) in session._finished
+    assert session._get_checkpoint_key(keys[1]) not in session._finished
+    assert session._used_candidates == 3
+
+    # the finished workloads are restored from the checkpoint
+    resumed = TuningSession(
+        "cuda", topk=20, show_progress=False, candidate_budget=12, checkpoint_path=checkpoint_path)
+    resumed.add(small)
+    resumed.add(large)
+    assert resumed._used_candidates == 3
+    calls.clear()
+    resumed._tune_config = tune_config
+    resumed.run()
+    assert [(topk, configs is None) for _, topk, configs in calls] == [(1, False), (9, True)]
+    assert calls[0][2][""][0].serialize() == hint.serialize()
+
+
+def test_tuning_session_registers_tuned_operators():
+    from bitblas.cache import global_operator_cache
+
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", W_dtype="int4")
+    with TuningSession("cuda", topk=1, show_progress=False) as session:
+        session.add(config)
+        operator = session.run()[0]
+    assert operator is not None
+    # the tuned operator is reused by the global cache
+    assert global_operator_cache.get(config) is operator
+    assert config not in global_operator_cache._dirty
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import stat
+import tempfile
+import bitblas
+from bitblas.wrapper.general import compile_cuda_source, get_nvcc_flags
+
+
+def _make_stub_compiler(work_dir):
+    # copies the source to the output, and counts the invocations
+    compiler = os.path.join(work_dir, "stub_nvcc")
+    with open(compiler, "w") as f:
+        f.write("#!/bin/sh\n"
+                f"echo x >> {work_dir}/invocations\n"
+                "while [ $# -gt 0 ]; do\n"
+                "  case $1 in *.cu) src=$1;; -o) shift; out=$1;; esac; shift\n"
+                "done\n"
+                "cp $src $out\n")
+    os.chmod(compiler, os.stat(compiler).st_mode | stat.S_IEXEC)
+    return compiler
+
+
+def _num_invocations(work_dir):
+    with open(os.path.join(work_dir, "invocations")) as f:
+        return len(f.readlines())
+
+
+def test_compile_cache():
+    work_dir = tempfile.mkdtemp()
+    compiler = _make_stub_compiler(work_dir)
+    cache_path = os.path.join(work_dir, "cache")
+    flags = get_nvcc_flags("80")
+
+    src_name, lib_name = compile_cuda_source(
+        "// kernel a", flags, compiler=compiler, cache_path=cache_path)
+    with open(lib_name) as f:
+        assert f.read() == "// kernel a"
+    # the same source and flags are only compiled once
+    assert compile_cuda_source(
+        "// kernel a", flags, compiler=compiler, cache_path=cache_path) == (src_name, lib_name)
+    assert _num_invocations(work_dir) == 1
+    # a different source or different flags are compiled again
+    compile_cuda_source("// kernel b", flags, compiler=compiler, cache_path=cache_path)
+    compile_cuda_source(
+        "// kernel a", get_nvcc_flags("86"), compiler=compiler, cache_path=cache_path)
+    assert _num_invocations(work_dir) == 3
+    # failures are not cached
+    assert compile_cuda_source(
+        "// kernel c", flags, compiler="false", cache_path=cache_path) is None
+    # only the extension of the source is replaced, not a ".cu" in the directory name
+    cache_path = os.path.join(work_dir, ".cuda_cache")
+    _, lib_name = compile_cuda_source(
+        "// kernel a", flags, compiler=compiler, cache_path=cache_path)
+    assert os.path.dirname(lib_name) == cache_path and os.path.exists(lib_name)
+
+
+def test_concurrent_wait_for_lib():
+    from concurrent.futures import ThreadPoolExecutor
+    from bitblas.ops.matmul import Matmul, MatmulConfig
+
+    matmul_config = MatmulConfig(
+        M=1,
+        N=1024,
+        K=1024,
+        in_dtype="float16",
+        out_dtype="float16",
+        accum_dtype="float16",
+        with_bias=False,
+        propagate_a=False,
+        propagate_b=False,
+        layout="nt",
+    )
+    target = bitblas.utils.auto_detect_nvidia_target()
+    matmul = Matmul(config=matmul_config, target=target)
+    # the forward and the background flush wait for the library at the same time
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        libs = list(pool.map(lambda _: matmul.lib, range(8)))
+    assert all(lib is not None and lib is libs[0] for lib in libs)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()